@@ -1,11 +1,23 @@
-"""LangGraph agents package."""
+"""LangGraph agents package.
 
-from backend.agents.graph import city_information_agent, create_agent
-from backend.agents.state import CityInformationState
-
-__all__ = ["CityInformationState", "create_agent", "city_information_agent"]
+Exports are resolved on first access, so importing a subpackage (e.g.
+backend.agents.city_information) neither loads LangGraph nor compiles the graph.
+"""
 
+import importlib
+from typing import Any
 
+_EXPORTS = {
+    "CityInformationState": "backend.agents.state",
+    "create_agent": "backend.agents.graph",
+    "get_graph": "backend.agents.graph",
+}
 
+__all__ = list(_EXPORTS)
 
 
+def __getattr__(name: str) -> Any:
+    """Import exported names lazily (PEP 562)."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
@@ -0,0 +1,86 @@
+"""LangChain callbacks feeding the application metrics (see backend.utils.metrics)."""
+
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from backend.config import settings
+from backend.utils.metrics import metrics
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Time the model calls and tool calls (web searches) of an agent, and count its tokens.
+
+    Records llm_request_seconds and tool_call_seconds (labelled with the agent, and the
+    tool name), their *_errors_total counters, and llm_tokens_total by token type.
+    """
+
+    # Called in the agent's own thread or event loop instead of an executor
+    run_inline = True
+
+    def __init__(self, agent: str):
+        """
+        Initialize the handler.
+
+        Args:
+            agent: Name of the agent, used as the "agent" label
+        """
+        self.agent = agent
+        # Start time (and tool name) of each running call, by run id
+        self._started: dict[UUID, tuple[float, str | None]] = {}
+
+    def _start(self, run_id: UUID, tool: str | None = None) -> None:
+        if settings.metrics_enabled:
+            self._started[run_id] = (time.perf_counter(), tool)
+
+    def _finish(self, run_id: UUID, name: str, error: BaseException | None = None) -> None:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, tool = started
+        labels = {"agent": self.agent} if tool is None else {"agent": self.agent, "tool": tool}
+        metrics.observe(name, time.perf_counter() - start, **labels)
+        if error is not None:
+            metrics.increment(f"{name}_errors", error=type(error).__name__, **labels)
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: list, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id)
+
+    def on_llm_start(
+        self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "llm_request")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                for token_type in ("input", "output"):
+                    if usage and usage.get(f"{token_type}_tokens"):
+                        metrics.increment(
+                            "llm_tokens",
+                            usage[f"{token_type}_tokens"],
+                            agent=self.agent,
+                            type=token_type,
+                        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "llm_request", error)
+
+    def on_tool_start(
+        self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id, (serialized or {}).get("name") or "tool")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "tool_call")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "tool_call", error)
@@ -1,5 +1,9 @@
 """City information agent package."""
 
-from backend.agents.city_information.agent import get_city_information
+from backend.agents.city_information.agent import (
+    aget_city_information,
+    astream_city_information,
+    get_city_information,
+)
 
-__all__ = ["get_city_information"]
+__all__ = ["aget_city_information", "astream_city_information", "get_city_information"]
@@ -1,27 +1,198 @@
-from langchain.agents import create_agent
-from langchain_community.tools import DuckDuckGoSearchRun
+"""City information sub-agents: one small ReAct agent per CityInformation block.
+
+The situation, political colour and presentation blocks are asked to three independent
+agents running concurrently, each under its own deadline, so an answer takes as long as
+the slowest block instead of the sum of one long agent loop. A block that fails or
+times out is answered with BLOCK_FALLBACK; when every block fails the error is raised.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import AsyncIterator, Awaitable
+from typing import Any
+
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from backend.agents.city_information.prompt import PROMPT_CITY_INFORMATION
-from backend.agents.city_information.state import CityInformation
+from backend.agents.callbacks import MetricsCallbackHandler
+from backend.agents.city_information.prompt import PROMPTS
+from backend.agents.city_information.state import BLOCK_FORMATS
 from backend.agents.state import CityInformationState
+from backend.config import settings
+from backend.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+BLOCKS = ("situation", "politique_color", "qualitative_presentation")
+
+# Text of a block whose sub-agent failed or timed out
+BLOCK_FALLBACK = "Information indisponible pour le moment."
+
+# Built per block on first use by get_agent (tests and benchmarks may assign fake agents)
+city_information_agents: dict[str, Any] = {}
+_agent_lock = threading.Lock()
+
+
+def _block_timeout(block: str) -> float:
+    """Return the configured deadline (in seconds) of a block's sub-agent."""
+    return {
+        "situation": settings.city_situation_timeout,
+        "politique_color": settings.city_politics_timeout,
+        "qualitative_presentation": settings.city_presentation_timeout,
+    }[block]
+
+
+def get_agent(block: str) -> Any:
+    """
+    Return the sub-agent of a block, building it on first use.
+
+    Building an agent imports langchain's agent runtime and the web search tool and
+    instantiates the Mistral client, which workers that never answer a city
+    information request should not pay for. Model calls, web searches and token usage
+    are recorded in the application metrics (see MetricsCallbackHandler).
+
+    Args:
+        block: CityInformation field, one of BLOCKS
+    """
+    with _agent_lock:
+        agent = city_information_agents.get(block)
+        if agent is None:
+            from langchain.agents import create_agent
+            from langchain_community.tools import DuckDuckGoSearchRun
+
+            agent = city_information_agents[block] = create_agent(
+                "mistral-small-latest",
+                system_prompt=SystemMessage(PROMPTS[block]),
+                tools=[DuckDuckGoSearchRun()],
+                response_format=BLOCK_FORMATS[block],
+            ).with_config(callbacks=[MetricsCallbackHandler(f"city_information.{block}")])
+        return agent
+
+
+def _blocks(situation: str | None) -> tuple[str, ...]:
+    """Blocks to ask the sub-agents for (the situation is skipped when given)."""
+    return BLOCKS if situation is None else BLOCKS[1:]
+
+
+async def _guarded_block(block: str, answer: Awaitable[str]) -> str | Exception:
+    """Await one block under its deadline, returning its error instead of raising."""
+    timeout = _block_timeout(block)
+    try:
+        async with timed("agent_block", agent="city_information", block=block):
+            return await asyncio.wait_for(answer, timeout)
+    except asyncio.TimeoutError:
+        error: Exception = TimeoutError(f"Délai dépassé ({timeout:g} s) pour le bloc {block}")
+    except Exception as e:
+        error = e
+    logger.warning("City information: block %s unavailable (%s)", block, error)
+    return error
+
+
+def _merge(answers: dict[str, str | Exception], situation: str | None) -> CityInformationState:
+    """
+    Merge the block answers into CityInformation, with BLOCK_FALLBACK for failed blocks.
+
+    Raises:
+        Exception: The first block error, when no block was answered
+    """
+    errors = [answer for answer in answers.values() if isinstance(answer, Exception)]
+    if errors and len(errors) == len(answers):
+        raise errors[0]
+    information = {
+        block: BLOCK_FALLBACK if isinstance(answer, Exception) else answer
+        for block, answer in answers.items()
+    }
+    if situation is not None:
+        information["situation"] = situation
+    return {block: information[block] for block in BLOCKS}
+
+
+def _block_text(block: str, structured_response: Any) -> str:
+    """Extract the text of a block from a sub-agent's structured response."""
+    if not structured_response or not structured_response.get(block):
+        raise ValueError(f"Réponse vide pour le bloc {block}")
+    return structured_response[block]
+
+
+def get_city_information(city_name: str, situation: str | None = None) -> CityInformationState:
+    """Blocking variant of aget_city_information (not callable from a running event loop)."""
+    return asyncio.run(aget_city_information(city_name, situation))
+
+
+async def aget_city_information(
+    city_name: str, situation: str | None = None
+) -> CityInformationState:
+    """
+    Ask the block sub-agents about a commune concurrently and merge their answers.
+
+    Args:
+        city_name: Commune name
+        situation: Reference "Situation" block (see backend.utils.communes); when given,
+            it is used as is and no sub-agent is asked for the situation
+
+    Returns:
+        CityInformation, with BLOCK_FALLBACK for the blocks that failed
+
+    Raises:
+        Exception: The first block error, when every sub-agent failed
+    """
+
+    async def ask(block: str) -> str:
+        response = await get_agent(block).ainvoke({"messages": [HumanMessage(city_name)]})
+        return _block_text(block, response.get("structured_response"))
+
+    blocks = _blocks(situation)
+    async with timed("agent_run", agent="city_information"):
+        answers = await asyncio.gather(*(_guarded_block(block, ask(block)) for block in blocks))
+
+    return _merge(dict(zip(blocks, answers)), situation)
+
 
-city_information_agent = create_agent(
-    "mistral-small-latest",
-    system_prompt=SystemMessage(PROMPT_CITY_INFORMATION),
-    tools=[DuckDuckGoSearchRun()],
-    response_format=CityInformation,
-)
+async def astream_city_information(
+    city_name: str, situation: str | None = None
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Run the block sub-agents concurrently and yield their progress as it happens.
 
+    Args:
+        city_name: Commune name
+        situation: Reference "Situation" block (see aget_city_information)
 
-def get_city_information(city_name: str) -> CityInformationState:
-    messages = [HumanMessage(city_name)]
+    Yields:
+        ("node", "<block>:<node_name>") after each step of a sub-agent (model call, web
+        search...), then ("result", city_information) with the merged answer
 
-    ai_response = city_information_agent.invoke({"messages": messages})
+    Raises:
+        Exception: The first block error, when every sub-agent failed
+    """
+    steps: asyncio.Queue = asyncio.Queue()
 
-    # ai_messages = ai_response["messages"]
-    # print(ai_messages)
+    async def ask(block: str) -> str:
+        structured_response = None
+        payload = {"messages": [HumanMessage(city_name)]}
+        async for update in get_agent(block).astream(payload, stream_mode="updates"):
+            for node, state in update.items():
+                steps.put_nowait(("node", f"{block}:{node}"))
+                if isinstance(state, dict) and state.get("structured_response") is not None:
+                    structured_response = state["structured_response"]
+        return _block_text(block, structured_response)
 
-    city_information: CityInformationState = ai_response["structured_response"]
+    blocks = _blocks(situation)
+    async with timed("agent_run", agent="city_information"):
+        run = asyncio.ensure_future(
+            asyncio.gather(*(_guarded_block(block, ask(block)) for block in blocks))
+        )
+        try:
+            while not run.done():
+                step = asyncio.ensure_future(steps.get())
+                await asyncio.wait({run, step}, return_when=asyncio.FIRST_COMPLETED)
+                if step.done():
+                    yield step.result()
+                else:
+                    step.cancel()
+            while not steps.empty():
+                yield steps.get_nowait()
+        finally:
+            run.cancel()
 
-    return city_information
+    yield "result", _merge(dict(zip(blocks, run.result())), situation)
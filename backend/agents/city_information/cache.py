@@ -0,0 +1,283 @@
+"""Commune-keyed cache of city information answers, with request coalescing."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+
+from backend.agents.city_information.agent import (
+    BLOCK_FALLBACK,
+    BLOCKS,
+    aget_city_information,
+    astream_city_information,
+)
+from backend.agents.city_information.state import CityInformation
+from backend.config import settings
+from backend.utils.cache import TTLCache, normalize_address
+from backend.utils.cadastre import geocode_address, geocode_addresses
+from backend.utils.communes import commune_index
+
+# Blocks that change rarely; politique_color follows the (shorter) answer TTL
+PROFILE_FIELDS = ("situation", "qualitative_presentation")
+
+# Whole answers, expiring with the political block. Both caches can be invalidated from
+# the admin endpoint of any worker, so memory hits honour invalidations made elsewhere.
+city_information_cache = TTLCache(
+    "city_information", settings.city_politics_ttl, shared_invalidation=True
+)
+# Situation and presentation, kept across refreshes of the political block
+city_profile_cache = TTLCache(
+    "city_profile", settings.city_information_ttl, shared_invalidation=True
+)
+
+
+class PartialAnswerError(Exception):
+    """
+    Carries an answer with fallback blocks (see BLOCK_FALLBACK) out of the caches.
+
+    Raised from inside get_or_fetch so that the answer reaches every waiter without
+    being cached: the next request for the commune asks the sub-agents again.
+    """
+
+    def __init__(self, information: CityInformation):
+        """Wrap the degraded answer."""
+        super().__init__("Réponse partielle")
+        self.information = information
+
+
+async def resolve_commune(
+    adress_in: str, client: httpx.AsyncClient | None = None
+) -> tuple[str, str]:
+    """
+    Resolve an address (or commune name) to its commune.
+
+    Args:
+        adress_in: Address or commune name
+        client: Optional HTTP client for the API Adresse
+
+    Returns:
+        Tuple (cache key, commune name): the key is "insee:<code>" when the address
+        geocodes to a commune, "nom:<normalised input>" otherwise
+    """
+    try:
+        address = await geocode_address(adress_in, client=client)
+    except (httpx.HTTPError, ValueError):
+        address = None
+    return _commune_of(adress_in, address)
+
+
+def _commune_of(adress_in: str, address: dict[str, Any] | None) -> tuple[str, str]:
+    """Build the (cache key, commune name) of an address from its geocoding result."""
+    if address is None:
+        return f"nom:{normalize_address(adress_in)}", adress_in
+
+    commune = address.get("city") or adress_in
+    if address.get("citycode"):
+        return f"insee:{address['citycode']}", commune
+    return f"nom:{normalize_address(commune)}", commune
+
+
+async def get_cached_city_information(
+    adress_in: str, client: httpx.AsyncClient | None = None
+) -> CityInformation:
+    """
+    Return the city information of the commune of an address, running the agent on a miss.
+
+    Answers are cached per commune, so every address of a town shares one agent run,
+    and concurrent requests for the same commune wait for the same run. The sub-agents
+    still answer every block; when the political block expires before the others,
+    the cached situation and presentation are kept so the answer stays stable. When
+    the local commune index is built, the situation comes from it (see
+    reference_situation) and is used as is, so no sub-agent is asked for it. An answer
+    with a failed block (BLOCK_FALLBACK) is returned but not cached.
+
+    Args:
+        adress_in: Address or commune name
+        client: Optional HTTP client for the API Adresse
+
+    Returns:
+        CityInformation with situation, politique_color and qualitative_presentation
+    """
+    key, commune = await resolve_commune(adress_in, client)
+    try:
+        return await city_information_cache.get_or_fetch(key, lambda: _fetch(key, commune))
+    except PartialAnswerError as degraded:
+        return degraded.information
+
+
+async def get_cached_city_information_batch(
+    addresses: list[str], client: httpx.AsyncClient | None = None
+) -> list[dict[str, Any]]:
+    """
+    Return the city information of many addresses, running the agent once per commune.
+
+    Addresses are geocoded in bulk and grouped by commune. Distinct communes are looked
+    up concurrently, at most settings.city_information_batch_concurrency agent runs at a
+    time, through the same cache as get_cached_city_information.
+
+    Args:
+        addresses: Addresses or commune names
+        client: Optional HTTP client for the API Adresse
+
+    Returns:
+        One dictionary per input address, in input order, with keys:
+        - adress_in: str
+        - commune_key: str (cache key, shared by the addresses of a commune)
+        - commune: str
+        - city_information: CityInformation | None
+        - error: str | None (why city_information is missing)
+    """
+    try:
+        geocoded = await geocode_addresses(addresses, client=client)
+    except httpx.HTTPError:
+        geocoded = [None] * len(addresses)
+    communes = [_commune_of(adress_in, address) for adress_in, address in zip(addresses, geocoded)]
+
+    # First address of each commune names it for the agent
+    distinct: dict[str, str] = {}
+    for key, commune in communes:
+        distinct.setdefault(key, commune)
+    semaphore = asyncio.Semaphore(settings.city_information_batch_concurrency)
+
+    async def lookup(key: str, commune: str) -> CityInformation:
+        async with semaphore:
+            return await city_information_cache.get_or_fetch(key, lambda: _fetch(key, commune))
+
+    answers = await asyncio.gather(
+        *(lookup(key, commune) for key, commune in distinct.items()), return_exceptions=True
+    )
+    by_key = dict(zip(distinct, answers))
+
+    results = []
+    for adress_in, (key, commune) in zip(addresses, communes):
+        answer = by_key[key]
+        if isinstance(answer, PartialAnswerError):
+            answer = answer.information
+        failed = isinstance(answer, Exception)
+        results.append(
+            {
+                "adress_in": adress_in,
+                "commune_key": key,
+                "commune": commune,
+                "city_information": None if failed else answer,
+                "error": str(answer) if failed else None,
+            }
+        )
+    return results
+
+
+def reference_situation(key: str, commune: str) -> str | None:
+    """
+    Compute the "Situation" block from the local commune index.
+
+    Returns:
+        The block text, or None if the index is not built or the commune is unknown
+    """
+    if not commune_index.exists():
+        return None
+    if key.startswith("insee:"):
+        facts = commune_index.get(key.removeprefix("insee:"))
+    else:
+        facts = commune_index.find(commune)
+    return None if facts is None else facts.situation()
+
+
+async def _fetch(key: str, commune: str) -> CityInformation:
+    """Run the agent for a commune and merge the cached long-lived blocks."""
+    situation = reference_situation(key, commune)
+    information = dict(await aget_city_information(commune, situation))
+    return await _with_reference(key, information, situation)
+
+
+async def _with_reference(
+    key: str, information: dict[str, Any], situation: str | None
+) -> CityInformation:
+    """
+    Merge the cached profile, then enforce the reference situation when known.
+
+    Raises:
+        PartialAnswerError: If a block is still a fallback (the answer must not be cached)
+    """
+    information = await _merge_profile(key, information)
+    if situation is not None:
+        information["situation"] = situation
+    if any(information[block] == BLOCK_FALLBACK for block in BLOCKS):
+        raise PartialAnswerError(information)
+    return information
+
+
+async def _merge_profile(key: str, information: dict[str, Any]) -> CityInformation:
+    """Keep the cached situation and presentation, or cache them on first sight."""
+    if not settings.cache_enabled:
+        return information
+
+    profile = await city_profile_cache.get(key)
+    if profile is not None:
+        information.update(profile)
+    elif all(information[field] != BLOCK_FALLBACK for field in PROFILE_FIELDS):
+        await city_profile_cache.set(key, {field: information[field] for field in PROFILE_FIELDS})
+    return information
+
+
+async def stream_city_information(
+    adress_in: str, client: httpx.AsyncClient | None = None
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Streaming variant of get_cached_city_information.
+
+    The lookup goes through the same coalescing cache: a cached answer is yielded at
+    once, a stream arriving while the commune's agent run is in flight (streamed or
+    not) waits for that run, and otherwise the agent steps of the new run are yielded
+    as they happen. A client disconnecting does not stop the run, whose answer is
+    cached for the other waiters.
+
+    Yields:
+        ("commune", {"key", "commune"}), then ("node", node_name) for each agent step
+        when this stream started the run, then ("result", city_information)
+
+    Raises:
+        Exception: The first sub-agent error, when no block was answered
+    """
+    key, commune = await resolve_commune(adress_in, client)
+    yield "commune", {"key": key, "commune": commune}
+
+    steps: asyncio.Queue = asyncio.Queue()
+
+    async def fetch() -> CityInformation:
+        situation = reference_situation(key, commune)
+        information = None
+        async for event, data in astream_city_information(commune, situation):
+            if event == "result":
+                information = data
+            else:
+                steps.put_nowait((event, data))
+        if information is None:
+            raise ValueError(f"Aucune information obtenue pour {commune}")
+        return await _with_reference(key, dict(information), situation)
+
+    run = asyncio.ensure_future(city_information_cache.get_or_fetch(key, fetch))
+    try:
+        while not run.done():
+            step = asyncio.ensure_future(steps.get())
+            await asyncio.wait({run, step}, return_when=asyncio.FIRST_COMPLETED)
+            if step.done():
+                yield step.result()
+            else:
+                step.cancel()
+        while not steps.empty():
+            yield steps.get_nowait()
+        try:
+            information = run.result()
+        except PartialAnswerError as degraded:
+            information = degraded.information
+        yield "result", information
+    finally:
+        # Only stops waiting: the fetch itself belongs to the cache
+        run.cancel()
+
+
+async def invalidate_city_information(key: str | None = None) -> None:
+    """Drop the cached answer of one commune key, or of every commune when key is None."""
+    await city_information_cache.invalidate(key)
+    await city_profile_cache.invalidate(key)
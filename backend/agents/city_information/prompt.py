@@ -1,34 +1,55 @@
-PROMPT_CITY_INFORMATION = """
-Tu reçois en entrée le nom d’une commune française.
-À partir de ce nom, produis les trois blocs d’information suivants :
+# One prompt per block of CityInformation, each answered by its own sub-agent (see agent.py)
+
+_FOOTER = """
+Toujours répondre en français. Si une donnée est incertaine ou absente, le préciser explicitement.
+Entrée : {nom_de_la_commune}
+"""
 
-1. Situation :
+PROMPT_SITUATION = (
+    """
+Tu reçois en entrée le nom d’une commune française.
+Rédige le bloc « Situation » de cette commune :
 - Localisation géographique précise (département, région, appartenance à une
 agglomération si pertinent).
 - Distance approximative aux grandes villes les plus proches.
 - Toujours rester factuel.
 
-2. Couleur politique :
+Format de sortie JSON strict : {"situation": "…"}
+"""
+    + _FOOTER
+)
+
+PROMPT_POLITIQUE_COLOR = (
+    """
+Tu reçois en entrée le nom d’une commune française.
+Rédige le bloc « Couleur politique » de cette commune :
 - ATTENTION!!!!!!! : Cette information doit etre à jour. Utilise la recherche web pour trouver les
 informations les plus récentes, sois vraiment sur de ta réponse.
 - Nom du/de la maire actuel·le.
 - Appartenance politique (sigle).
 - Année de début du mandat en cours.
 
-3. Présentation qualitative de la commune :
+Format de sortie JSON strict : {"politique_color": "…"}
+"""
+    + _FOOTER
+)
+
+PROMPT_QUALITATIVE_PRESENTATION = (
+    """
+Tu reçois en entrée le nom d’une commune française.
+Rédige la présentation qualitative de cette commune :
 - Description synthétique du caractère de la commune (5–7 lignes).
 - Mention d’au moins un élément patrimonial, culturel ou historique notable.
 - Présenter clairement les points caractéristiques du territoire.
 
-Format de sortie JSON strict :
+Format de sortie JSON strict : {"qualitative_presentation": "…"}
+"""
+    + _FOOTER
+)
 
-{
-  "situation": "…",
-  "politique_color": "…",
-  "qualitative_presentation": "…"
+# Prompt of each CityInformation block
+PROMPTS = {
+    "situation": PROMPT_SITUATION,
+    "politique_color": PROMPT_POLITIQUE_COLOR,
+    "qualitative_presentation": PROMPT_QUALITATIVE_PRESENTATION,
 }
-
-Toujours répondre en français. Si une donnée est incertaine ou absente, le préciser explicitement.
-Entrée : {nom_de_la_commune}
-Sortie : l’objet JSON ci-dessus complété.
-"""
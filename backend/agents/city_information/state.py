@@ -5,3 +5,25 @@ class CityInformation(TypedDict):
     situation: str
     politique_color: str
     qualitative_presentation: str
+
+
+# Structured answers of the block sub-agents, merged into CityInformation
+
+
+class SituationBlock(TypedDict):
+    situation: str
+
+
+class PolitiqueColorBlock(TypedDict):
+    politique_color: str
+
+
+class QualitativePresentationBlock(TypedDict):
+    qualitative_presentation: str
+
+
+BLOCK_FORMATS = {
+    "situation": SituationBlock,
+    "politique_color": PolitiqueColorBlock,
+    "qualitative_presentation": QualitativePresentationBlock,
+}
@@ -1,20 +1,170 @@
+"""LangGraph pipeline of the full address analysis.
+
+    resolve_address ─┬─ parcel ──────────────────────────┬─ report
+                     ├─ dvf ── indicators ── charts ─────┤
+                     └─ city_information ────────────────┘
+
+The parcel, DVF and city information branches run in parallel once the address is
+geocoded; the report waits for all three. Like get_location_bundle, each branch has
+its own deadline and a failing branch is recorded in "errors" instead of failing the
+analysis (without DVF data the indicators are empty). Runs are checkpointed per thread
+(the workflow id), so re-running a failed workflow resumes from the nodes that did not
+complete instead of starting over. Each node is timed as a workflow_node (see
+backend.utils.metrics), labelled with its name.
+"""
+
+import functools
+import threading
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 
-from backend.agents.city_information.agent import get_city_information
+from backend.agents.city_information.cache import get_cached_city_information
 from backend.agents.state import CityInformationState
+from backend.config import settings
+from backend.utils.cadastre import geocode_address, get_cadastral_parcel
+from backend.utils.dvf import get_dvf_transactions
+from backend.utils.dvf_table import DVFTable
+from backend.utils.indicators import compute_price_indicators
+from backend.utils.location import guarded
+from backend.utils.metrics import timed_function
+from backend.utils.pdf_generator import generate_pdf_report
+from backend.utils.plotting import render_charts
+from backend.utils.process_pool import run_in_process
+
+DVF_RADIUS_METERS = 200
+
+# Workflow status reported while each node runs, in execution order
+NODE_STATUSES = {
+    "resolve_address": "collecting",
+    "parcel": "collecting",
+    "dvf": "collecting",
+    "city_information": "collecting",
+    "indicators": "analyzing",
+    "charts": "visualizing",
+    "report": "building_report",
+}
+
+# State key written by each node
+NODE_OUTPUTS = {
+    "resolve_address": "address",
+    "parcel": "parcel",
+    "dvf": "dvf",
+    "city_information": "city_information",
+    "indicators": "indicators",
+    "charts": "images",
+    "report": "report",
+}
+
+# State keys published as workflow results (raw DVF rows and PNGs stay in the checkpoint)
+RESULT_KEYS = ("address", "parcel", "city_information", "indicators", "report", "errors")
+
+
+async def resolve_address(state: CityInformationState) -> dict[str, Any]:
+    """Geocode the input address."""
+    return {"address": await geocode_address(state["adress_in"])}
+
+
+async def parcel(state: CityInformationState) -> dict[str, Any]:
+    """Fetch the cadastral parcel at the address (None if unavailable)."""
+    address = state["address"]
+    errors: dict[str, str] = {}
+    result = await guarded(
+        "parcel",
+        get_cadastral_parcel(address["latitude"], address["longitude"]),
+        settings.location_parcel_timeout,
+        errors,
+    )
+    return {"parcel": result, "errors": errors}
+
 
+async def dvf(state: CityInformationState) -> dict[str, Any]:
+    """Fetch the DVF transactions around the address, as a columnar table (None if unavailable)."""
+    address = state["address"]
+    errors: dict[str, str] = {}
+    result = await guarded(
+        "dvf",
+        get_dvf_transactions(
+            address["latitude"], address["longitude"], DVF_RADIUS_METERS, as_table=True
+        ),
+        settings.location_dvf_timeout,
+        errors,
+    )
+    return {"dvf": result.to_dict() if result is not None else None, "errors": errors}
 
-# memory = InMemorySaver()
-def create_agent() -> StateGraph:
+
+async def city_information(state: CityInformationState) -> dict[str, Any]:
+    """Describe the commune of the address, cached per commune (None if unavailable)."""
+    errors: dict[str, str] = {}
+    result = await guarded(
+        "city_information",
+        get_cached_city_information(state["adress_in"]),
+        settings.city_information_timeout,
+        errors,
+    )
+    return {"city_information": result, "errors": errors}
+
+
+def indicators(state: CityInformationState) -> dict[str, Any]:
+    """Compute the price indicators of the DVF transactions (empty without DVF data)."""
+    dvf_result = state.get("dvf")
+    table = DVFTable.from_columns(dvf_result["table"]) if dvf_result else DVFTable.from_rows([])
+    return {"indicators": compute_price_indicators(table)}
+
+
+async def charts(state: CityInformationState) -> dict[str, Any]:
+    """Render the price and trend charts (process pool, cached by content)."""
+    return {"images": await render_charts(state["indicators"])}
+
+
+async def report(state: CityInformationState, config: RunnableConfig) -> dict[str, Any]:
+    """Write the PDF report of the workflow (named after the run's thread id)."""
+    # Resolved here: the spawned pool worker has its own settings, without overrides
+    generate = functools.partial(
+        generate_pdf_report,
+        workflow_id=config["configurable"]["thread_id"],
+        output_dir=settings.reports_dir,
+        title=state["address"].get("full_address") or state["adress_in"],
+    )
+    pdf_path = await run_in_process(generate, state["indicators"], state["images"])
+    return {"report": {"pdf_path": pdf_path}}
+
+
+def create_agent(checkpointer: BaseCheckpointSaver | None = None) -> CompiledStateGraph:
+    """
+    Compile the analysis graph.
+
+    Args:
+        checkpointer: Checkpoint saver enabling resumption (None compiles without one)
+    """
     builder = StateGraph(CityInformationState)
 
-    builder.add_node("city_information", get_city_information)
-    builder.add_edge(START, "city_information")
+    for node in (resolve_address, parcel, dvf, city_information, indicators, charts, report):
+        builder.add_node(node.__name__, timed_function("workflow_node", node=node.__name__)(node))
+
+    builder.add_edge(START, "resolve_address")
+    for branch in ("parcel", "dvf", "city_information"):
+        builder.add_edge("resolve_address", branch)
+    builder.add_edge("dvf", "indicators")
+    builder.add_edge("indicators", "charts")
+    builder.add_edge(["parcel", "charts", "city_information"], "report")
+    builder.add_edge("report", END)
+
+    return builder.compile(checkpointer=checkpointer)
 
-    builder.add_edge("city_information", END)
 
-    agent = builder.compile()
-    return agent
+_graph: CompiledStateGraph | None = None
+_graph_lock = threading.Lock()
 
 
-city_information_agent = create_agent()
+def get_graph() -> CompiledStateGraph:
+    """Return the application graph, compiled on first use with an in-memory checkpointer."""
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            _graph = create_agent(InMemorySaver())
+        return _graph
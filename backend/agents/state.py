@@ -1,11 +1,38 @@
-from typing import TypedDict
+from typing import Annotated, Any, TypedDict
 
 from langchain_core.messages import BaseMessage
 
 from backend.agents.city_information.state import CityInformation
 
 
-class CityInformationState(TypedDict):
+def merge_errors(left: dict[str, str] | None, right: dict[str, str] | None) -> dict[str, str]:
+    """Reducer merging the errors reported by parallel branches."""
+    return {**(left or {}), **(right or {})}
+
+
+class CityInformationState(TypedDict, total=False):
+    """
+    State of the analysis graph (see backend.agents.graph).
+
+    Each node writes its own keys, so parallel branches never write the same key, except
+    errors which is merged (see merge_errors).
+    Values stay JSON/msgpack-friendly so the state can be checkpointed.
+    """
+
     adress_in: str
     messages: list[BaseMessage]
     city_information: CityInformation
+    # Geocoding result of adress_in (see geocode_address)
+    address: dict[str, Any]
+    # Cadastral parcel at the address (see get_cadastral_parcel)
+    parcel: dict[str, Any]
+    # DVF transactions around the address, table in columnar form (see DVFResult.to_dict)
+    dvf: dict[str, Any]
+    # Price indicators (see compute_price_indicators)
+    indicators: dict[str, Any]
+    # PNG charts keyed by kind (see render_charts)
+    images: dict[str, bytes]
+    # Generated report: {"pdf_path": str}
+    report: dict[str, Any]
+    # Error message per optional source that failed (parcel, dvf, city_information)
+    errors: Annotated[dict[str, str], merge_errors]
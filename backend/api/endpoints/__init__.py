@@ -1,5 +1,5 @@
 """API endpoints package."""
 
-from backend.api.endpoints import city_information
+from backend.api.endpoints import admin, city_information, workflows
 
-__all__ = ["city_information"]
+__all__ = ["admin", "city_information", "workflows"]
@@ -0,0 +1,42 @@
+"""Administration endpoints (protected by settings.admin_token)."""
+
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from backend.agents.city_information.cache import invalidate_city_information, resolve_commune
+from backend.config import settings
+
+
+def require_admin(x_admin_token: str = Header("")) -> None:
+    """
+    Check the X-Admin-Token header.
+
+    Raises:
+        HTTPException: 403 if no admin token is configured or the header does not match
+    """
+    if not settings.admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Accès administrateur refusé")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.delete("/city-information")
+async def invalidate_city_information_cache(adresse: str | None = None) -> dict[str, str]:
+    """
+    Invalidate cached city information.
+
+    Args:
+        adresse: Address or commune name whose commune entry is dropped (all if omitted)
+
+    Returns:
+        Dictionary with the invalidated cache key ("*" for every commune)
+    """
+    if adresse is None:
+        await invalidate_city_information()
+        return {"invalidated": "*"}
+
+    key, _ = await resolve_commune(adresse)
+    await invalidate_city_information(key)
+    return {"invalidated": key}
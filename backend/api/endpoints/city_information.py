@@ -1,10 +1,19 @@
 """City information endpoint for executing city information agent."""
 
+from collections.abc import AsyncIterator
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
-from backend.agents.city_information import get_city_information
-from backend.api.models.request import CityInformationRequest
-from backend.api.models.response import CityInformationResponse
+from backend.agents.city_information.cache import (
+    get_cached_city_information,
+    get_cached_city_information_batch,
+    stream_city_information,
+)
+from backend.api.models.request import CityInformationBatchRequest, CityInformationRequest
+from backend.api.models.response import CityInformationBatchResponse, CityInformationResponse
+from backend.api.sse import event_stream, format_event, with_keepalive
+from backend.config import settings
 
 router = APIRouter()
 
@@ -12,7 +21,7 @@ router = APIRouter()
 @router.post("/city-information", response_model=CityInformationResponse)
 async def city_information(request: CityInformationRequest) -> CityInformationResponse:
     """
-    Execute city information agent for an address.
+    Execute city information agent for an address (cached per commune).
 
     Args:
         request: CityInformationRequest containing the address
@@ -20,10 +29,61 @@ async def city_information(request: CityInformationRequest) -> CityInformationRe
     Returns:
         CityInformationResponse with complete city information state
     """
-    city_info_response = get_city_information(request.adress_in)
+    city_info_response = await get_cached_city_information(request.adress_in)
 
     return CityInformationResponse(
         adress_in=request.adress_in,
         messages=[],
         city_information=city_info_response,
     )
+
+
+@router.post("/city-information/batch", response_model=CityInformationBatchResponse)
+async def city_information_batch(
+    request: CityInformationBatchRequest,
+) -> CityInformationBatchResponse:
+    """
+    Execute city information agent for many addresses, once per distinct commune.
+
+    Args:
+        request: CityInformationBatchRequest containing the addresses
+
+    Returns:
+        CityInformationBatchResponse with one item per address, in input order
+        (items whose commune could not be described carry an error instead)
+    """
+    items = await get_cached_city_information_batch([item.adress_in for item in request.items])
+    return CityInformationBatchResponse(
+        items=items, nb_communes=len({item["commune_key"] for item in items})
+    )
+
+
+@router.post("/city-information/stream")
+async def city_information_stream(request: CityInformationRequest) -> StreamingResponse:
+    """
+    Execute city information agent for an address, streaming its progress as SSE.
+
+    Events: "start", "commune", one "node" per agent step, then "result" (the city
+    information) or "error". A keepalive comment is sent every settings.sse_poll_interval
+    seconds without events.
+
+    Args:
+        request: CityInformationRequest containing the address
+
+    Returns:
+        text/event-stream response
+    """
+    return event_stream(
+        with_keepalive(_city_information_events(request.adress_in), settings.sse_poll_interval)
+    )
+
+
+async def _city_information_events(adress_in: str) -> AsyncIterator[str]:
+    """Format the city information progress as SSE messages."""
+    # Sent before any lookup so the client gets its first bytes immediately
+    yield format_event("start", {"adress_in": adress_in})
+    try:
+        async for event, data in stream_city_information(adress_in):
+            yield format_event(event, data)
+    except Exception as e:
+        yield format_event("error", {"detail": str(e)})
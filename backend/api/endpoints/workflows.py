@@ -0,0 +1,242 @@
+"""Analysis workflow endpoints: submission with backpressure, status, cancellation, resumption
+and reports."""
+
+import asyncio
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from backend.api.models.request import AnalyzeRequest
+from backend.api.models.response import AnalyzeResponse, WorkflowStatusResponse
+from backend.api.sse import KEEPALIVE, event_stream, format_event
+from backend.config import settings
+from backend.utils.pdf_generator import render_pdf_report
+from backend.utils.plotting import render_charts
+from backend.workflow_scheduler import QueueFullError, WorkflowScheduler, get_scheduler
+from backend.workflow_store import FINISHED_STATUSES, WorkflowStore, get_workflow_store
+
+router = APIRouter()
+
+RETRY_AFTER_SECONDS = 30
+REPORT_CHUNK_SIZE = 64 * 1024
+
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze(
+    request: AnalyzeRequest, scheduler: WorkflowScheduler = Depends(get_scheduler)
+) -> AnalyzeResponse:
+    """
+    Queue an analysis workflow for an address.
+
+    Args:
+        request: AnalyzeRequest containing the address and an optional priority
+
+    Returns:
+        AnalyzeResponse with the workflow id
+
+    Raises:
+        HTTPException: 429 if the queue is full
+    """
+    if scheduler.is_full():
+        raise HTTPException(
+            status_code=429,
+            detail="Trop d'analyses en attente, réessayez plus tard",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+    workflow = await asyncio.to_thread(scheduler.store.create, str(uuid.uuid4()), request.adresse)
+    try:
+        scheduler.submit(workflow["workflow_id"], priority=request.priority)
+    except QueueFullError as e:
+        await asyncio.to_thread(
+            scheduler.store.update, workflow["workflow_id"], status="cancelled", error=str(e)
+        )
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        ) from e
+
+    return AnalyzeResponse(workflow_id=workflow["workflow_id"], status=workflow["status"])
+
+
+@router.get("/status/{workflow_id}", response_model=WorkflowStatusResponse)
+async def status(
+    workflow_id: str, store: WorkflowStore = Depends(get_workflow_store)
+) -> WorkflowStatusResponse:
+    """
+    Return the state of a workflow.
+
+    Raises:
+        HTTPException: 404 if the workflow does not exist
+    """
+    workflow = await asyncio.to_thread(store.get, workflow_id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow introuvable")
+    return WorkflowStatusResponse(**workflow)
+
+
+@router.get("/status/{workflow_id}/stream")
+async def status_stream(
+    workflow_id: str, store: WorkflowStore = Depends(get_workflow_store)
+) -> StreamingResponse:
+    """
+    Stream the stage and progress transitions of a workflow as SSE.
+
+    Events: "progress" with the current state on connection and after every change,
+    then "end" with the final state once the workflow is completed, failed or cancelled.
+
+    Raises:
+        HTTPException: 404 if the workflow does not exist
+    """
+    if await asyncio.to_thread(store.get, workflow_id) is None:
+        raise HTTPException(status_code=404, detail="Workflow introuvable")
+    return event_stream(_workflow_events(store, workflow_id))
+
+
+def _progress(workflow: dict[str, Any]) -> dict[str, Any]:
+    """Summarise a workflow for progress events (result keys only, not their content)."""
+    return {
+        "workflow_id": workflow["workflow_id"],
+        "status": workflow["status"],
+        "progress": workflow["progress"],
+        "error": workflow["error"],
+        "results": sorted(workflow["results"]),
+    }
+
+
+async def _workflow_events(store: WorkflowStore, workflow_id: str) -> AsyncIterator[str]:
+    """
+    Format the transitions of a workflow as SSE messages.
+
+    Changes made in this process wake the stream through the store subscription; the
+    store is also re-read every settings.sse_poll_interval seconds to pick up changes
+    made by other workers (shared PostgreSQL store), in a thread so that many open
+    streams never block the event loop.
+    """
+    # Subscribe before the first read so no transition is missed
+    changes = store.subscribe(workflow_id)
+    try:
+        last_update = None
+        while True:
+            workflow = await asyncio.to_thread(store.get, workflow_id)
+            if workflow is None:
+                yield format_event("error", {"detail": "Workflow introuvable"})
+                return
+            if workflow["status"] in FINISHED_STATUSES:
+                yield format_event("end", _progress(workflow))
+                return
+            if workflow["updated_at"] != last_update:
+                last_update = workflow["updated_at"]
+                yield format_event("progress", _progress(workflow))
+
+            try:
+                await asyncio.wait_for(changes.get(), timeout=settings.sse_poll_interval)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+    finally:
+        store.unsubscribe(workflow_id, changes)
+
+
+@router.delete("/workflows/{workflow_id}", response_model=WorkflowStatusResponse)
+async def cancel(
+    workflow_id: str, scheduler: WorkflowScheduler = Depends(get_scheduler)
+) -> WorkflowStatusResponse:
+    """
+    Cancel a queued or running workflow.
+
+    A workflow running on another worker is answered with status "cancelling" and is
+    stopped by that worker shortly after.
+
+    Raises:
+        HTTPException: 404 if the workflow does not exist, 409 if it already finished
+    """
+    workflow = await asyncio.to_thread(scheduler.store.get, workflow_id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow introuvable")
+    if not await scheduler.cancel(workflow_id):
+        raise HTTPException(status_code=409, detail="Workflow déjà terminé")
+    return WorkflowStatusResponse(**await asyncio.to_thread(scheduler.store.get, workflow_id))
+
+
+@router.post("/workflows/{workflow_id}/resume", response_model=WorkflowStatusResponse)
+async def resume(
+    workflow_id: str, scheduler: WorkflowScheduler = Depends(get_scheduler)
+) -> WorkflowStatusResponse:
+    """
+    Queue a failed workflow again; it resumes from the graph nodes that did not complete.
+
+    Raises:
+        HTTPException: 404 if the workflow does not exist, 409 if it did not fail,
+            429 if the queue is full
+    """
+    workflow = await asyncio.to_thread(scheduler.store.get, workflow_id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow introuvable")
+    if workflow["status"] != "failed":
+        raise HTTPException(status_code=409, detail="Seul un workflow en échec peut être repris")
+    if scheduler.is_full():
+        raise HTTPException(
+            status_code=429,
+            detail="Trop d'analyses en attente, réessayez plus tard",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+    await asyncio.to_thread(scheduler.store.update, workflow_id, status="pending", error=None)
+    scheduler.submit(workflow_id)
+    return WorkflowStatusResponse(**await asyncio.to_thread(scheduler.store.get, workflow_id))
+
+
+@router.get("/reports/{workflow_id}")
+async def report(
+    workflow_id: str, store: WorkflowStore = Depends(get_workflow_store)
+) -> StreamingResponse:
+    """
+    Stream the PDF report of a workflow, with its price and trend charts embedded.
+
+    The report written by the workflow is served when this worker has it. Otherwise
+    (report not built yet, pruned, or written by another worker) it is built in memory
+    from the workflow indicators: charts come from the chart cache (or are rendered in
+    the process pool) and the PDF is laid out in the pool too, so concurrent downloads
+    neither block the event loop nor share a file.
+
+    Raises:
+        HTTPException: 404 if the workflow does not exist, 409 if it has no indicators yet
+    """
+    workflow = await asyncio.to_thread(store.get, workflow_id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow introuvable")
+    indicators = workflow["results"].get("indicators")
+    if not isinstance(indicators, dict):
+        raise HTTPException(status_code=409, detail="Indicateurs pas encore disponibles")
+
+    pdf = await asyncio.to_thread(_read_report, workflow)
+    if pdf is None:
+        images = await render_charts(indicators)
+        pdf = await render_pdf_report(indicators, images, workflow["adresse"])
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for start in range(0, len(pdf), REPORT_CHUNK_SIZE):
+            yield pdf[start : start + REPORT_CHUNK_SIZE]
+
+    return StreamingResponse(
+        chunks(),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="rapport_{workflow_id}.pdf"',
+            "Content-Length": str(len(pdf)),
+        },
+    )
+
+
+def _read_report(workflow: dict[str, Any]) -> bytes | None:
+    """Read the report file written by the workflow, or None if it is not on this worker."""
+    pdf_path = (workflow["results"].get("report") or {}).get("pdf_path")
+    if not pdf_path:
+        return None
+    try:
+        with open(pdf_path, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
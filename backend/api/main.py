@@ -1,19 +1,41 @@
 """Main FastAPI application."""
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from backend.api.endpoints import city_information
+from backend.api.endpoints import admin, city_information, workflows
 from backend.config import settings
+from backend.utils.http_client import http_clients
 from backend.utils.langsmith_init import init_langsmith
+from backend.utils.metrics import metrics
+from backend.utils.process_pool import shutdown_process_pool
+from backend.workflow_scheduler import close_scheduler
 
 # Initialize LangSmith
 init_langsmith()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Open shared resources on startup and release them on shutdown."""
+    http_clients.open()
+    try:
+        yield
+    finally:
+        await close_scheduler()
+        await http_clients.aclose()
+        shutdown_process_pool()
+
+
 app = FastAPI(
     title="AgentImmo API",
     description="API pour l'analyse immobilière avec agents LangGraph",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -27,6 +49,8 @@ app.add_middleware(
 
 # Include routers
 app.include_router(city_information.router, tags=["city-information"])
+app.include_router(workflows.router, tags=["workflows"])
+app.include_router(admin.router, tags=["admin"])
 
 
 @app.get("/")
@@ -41,6 +65,16 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint() -> PlainTextResponse:
+    """
+    Latency histograms, error counts, cache and token counters of this worker.
+
+    Prometheus text exposition format (see backend.utils.metrics).
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,7 +1,13 @@
 """Pydantic models package."""
 
-from backend.api.models.request import CityInformationRequest
+from backend.api.models.request import (
+    AnalyzeRequest,
+    CityInformationBatchRequest,
+    CityInformationRequest,
+)
 
 __all__ = [
+    "AnalyzeRequest",
+    "CityInformationBatchRequest",
     "CityInformationRequest",
 ]
@@ -2,8 +2,28 @@
 
 from pydantic import BaseModel, Field
 
+from backend.config import settings
+
 
 class CityInformationRequest(BaseModel):
     """Request model for city information endpoint."""
 
     adress_in: str = Field(..., description="Adresse à analyser", min_length=1)
+
+
+class CityInformationBatchRequest(BaseModel):
+    """Request model for the batch city information endpoint."""
+
+    items: list[CityInformationRequest] = Field(
+        ...,
+        description="Adresses à analyser",
+        min_length=1,
+        max_length=settings.city_information_batch_max,
+    )
+
+
+class AnalyzeRequest(BaseModel):
+    """Request model for the analysis workflow endpoint."""
+
+    adresse: str = Field(..., description="Adresse à analyser", min_length=1)
+    priority: int = Field(0, description="Priorité (les plus élevées passent en premier)")
@@ -19,3 +19,38 @@ class CityInformationResponse(BaseModel):
     adress_in: str = Field(..., description="Adresse analysée")
     messages: list[dict[str, Any]] = Field(default_factory=list, description="Messages de l'agent")
     city_information: CityInfoData | None = Field(None, description="Informations sur la ville")
+
+
+class CityInformationBatchItem(BaseModel):
+    """City information of one address of a batch."""
+
+    adress_in: str = Field(..., description="Adresse analysée")
+    commune_key: str = Field(..., description="Code INSEE ou nom normalisé de la commune")
+    commune: str = Field(..., description="Commune de l'adresse")
+    city_information: CityInfoData | None = Field(None, description="Informations sur la ville")
+    error: str | None = Field(None, description="Erreur si les informations manquent")
+
+
+class CityInformationBatchResponse(BaseModel):
+    """Response model for the batch city information endpoint."""
+
+    items: list[CityInformationBatchItem] = Field(..., description="Résultats dans l'ordre")
+    nb_communes: int = Field(..., description="Nombre de communes distinctes")
+
+
+class AnalyzeResponse(BaseModel):
+    """Response model for the analysis workflow endpoint."""
+
+    workflow_id: str = Field(..., description="Identifiant du workflow")
+    status: str = Field(..., description="Statut du workflow")
+
+
+class WorkflowStatusResponse(BaseModel):
+    """Response model for the workflow status endpoint."""
+
+    workflow_id: str = Field(..., description="Identifiant du workflow")
+    adresse: str = Field(..., description="Adresse analysée")
+    status: str = Field(..., description="Statut du workflow")
+    progress: float = Field(..., description="Avancement entre 0 et 1")
+    results: dict[str, Any] = Field(default_factory=dict, description="Résultats des étapes")
+    error: str | None = Field(None, description="Erreur en cas d'échec")
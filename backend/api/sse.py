@@ -0,0 +1,54 @@
+"""Server-Sent Events helpers."""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+
+# Keep proxies (nginx) from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+KEEPALIVE = ": keepalive\n\n"
+
+
+def format_event(event: str, data: Any) -> str:
+    """Format one SSE message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap formatted SSE messages in a text/event-stream response."""
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def with_keepalive(messages: AsyncIterator[str], interval: float) -> AsyncIterator[str]:
+    """
+    Relay formatted SSE messages, sending KEEPALIVE whenever none came for `interval` seconds.
+
+    Keeps proxies and clients from timing out a stream while a long step (an agent run)
+    produces nothing.
+    """
+    iterator = aiter(messages)
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(iterator))
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield KEEPALIVE
+                continue
+            try:
+                message = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield message
+    finally:
+        # Stop the source, whether it is waiting for its next message or suspended
+        if pending is not None:
+            pending.cancel()
+        elif hasattr(iterator, "aclose"):
+            await iterator.aclose()
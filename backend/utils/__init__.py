@@ -1,17 +1,42 @@
-"""Utility modules package."""
-
-from backend.utils.cadastre import geocode_address, get_cadastral_parcel, get_parcel_from_address
-from backend.utils.dvf import get_dvf_transactions
-from backend.utils.pdf_generator import generate_pdf_report
-from backend.utils.plotting import generate_map, generate_price_chart, generate_trend_chart
-
-__all__ = [
-    "geocode_address",
-    "get_cadastral_parcel",
-    "get_parcel_from_address",
-    "get_dvf_transactions",
-    "generate_pdf_report",
-    "generate_price_chart",
-    "generate_trend_chart",
-    "generate_map",
-]
+"""Utility modules package.
+
+The helpers below are imported from their module on first access, so importing one
+submodule (e.g. backend.utils.cache) does not load matplotlib, plotly or reportlab.
+"""
+
+import importlib
+from typing import Any
+
+_EXPORTS = {
+    "geocode_address": "backend.utils.cadastre",
+    "geocode_addresses": "backend.utils.cadastre",
+    "get_cadastral_parcel": "backend.utils.cadastre",
+    "get_parcel_from_address": "backend.utils.cadastre",
+    "get_dvf_transactions": "backend.utils.dvf",
+    "get_location_bundle": "backend.utils.location",
+    "compute_price_indicators": "backend.utils.indicators",
+    "build_pdf_report": "backend.utils.pdf_generator",
+    "generate_pdf_report": "backend.utils.pdf_generator",
+    "render_pdf_report": "backend.utils.pdf_generator",
+    "generate_price_chart": "backend.utils.plotting",
+    "generate_trend_chart": "backend.utils.plotting",
+    "render_chart": "backend.utils.plotting",
+    "render_charts": "backend.utils.plotting",
+    "generate_map": "backend.utils.plotting",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """Import exported helpers lazily (PEP 562)."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    """List the lazily exported helpers alongside the module globals."""
+    return sorted(list(globals()) + __all__)
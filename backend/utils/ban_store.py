@@ -0,0 +1,426 @@
+"""Local address geocoder built from the Base Adresse Nationale (BAN) CSV files.
+
+The BAN files (https://adresse.data.gouv.fr/data/ban/adresses/latest/csv/,
+"adresses-<département>.csv.gz") are loaded into a SQLite database holding one row per
+street (name, postcode, commune) and one per house number. Street lookups go through an
+inverted index of normalised tokens (street name, commune name and postcode words), and
+misspelled words are matched through the trigrams of the token vocabulary. Addresses are
+then answered in-process, with a score comparable to the API Adresse one, so the API is
+only needed for the addresses the local index cannot match confidently.
+
+Usage:
+    python -m backend.utils.ban_store ingest adresses-35.csv.gz adresses-75.csv.gz
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import logging
+import re
+import sqlite3
+from collections import Counter
+from typing import Any
+
+from backend.config import settings
+from backend.utils.cache import normalize_address
+from backend.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Words too common to tell streets apart (still counted when scoring a candidate)
+STOPWORDS = frozenset(
+    {"a", "au", "aux", "d", "de", "des", "du", "en", "et", "l", "la", "le", "les"}
+)
+
+# Abbreviations found in user input -> BAN spelling
+ABBREVIATIONS = {
+    "all": "allee",
+    "av": "avenue",
+    "ave": "avenue",
+    "bd": "boulevard",
+    "bld": "boulevard",
+    "bvd": "boulevard",
+    "ch": "chemin",
+    "che": "chemin",
+    "fg": "faubourg",
+    "imp": "impasse",
+    "pl": "place",
+    "r": "rue",
+    "rte": "route",
+    "sq": "square",
+    "st": "saint",
+    "ste": "sainte",
+}
+
+REPETITIONS = frozenset({"bis", "ter", "quater", "quinquies"})
+
+_NUMBER = re.compile(r"^(\d{1,4})([a-z]*)$")
+_POSTCODE = re.compile(r"^\d{5}$")
+
+# Candidate streets scored per lookup (postings of the rarest query words)
+_MAX_CANDIDATES = 5_000
+# Minimum trigram similarity (Dice coefficient) of a misspelled word to its token
+_MIN_SIMILARITY = 0.45
+# Score factor when the house number is not in the BAN (nearest number returned)
+_MISSING_NUMBER_FACTOR = 0.8
+
+
+def _trigrams(token: str) -> set[str]:
+    """Return the trigrams of a token, padded so its first and last letters weigh more."""
+    padded = f"  {token} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def _tokens(text: str) -> list[str]:
+    """Normalise text into words, expanding common abbreviations."""
+    return [ABBREVIATIONS.get(token, token) for token in normalize_address(text).split()]
+
+
+def _street_tokens(nom_voie: str, nom_commune: str, code_postal: str) -> set[str]:
+    """Words indexed for a street: its name, its commune and its postcode."""
+    words = {*_tokens(nom_voie), *_tokens(nom_commune), code_postal}
+    return {word for word in words if word and word not in STOPWORDS}
+
+
+def parse_query(address: str) -> tuple[int | None, str, str | None, list[str]]:
+    """
+    Split an address into house number, repetition index, postcode and other words.
+
+    Returns:
+        (numero, rep, code_postal, words): numero is the first number of at most four
+        digits before the street words, rep its suffix ("bis", "b"...)
+    """
+    numero, rep, code_postal = None, "", None
+    words = []
+    for token in _tokens(address):
+        match = _NUMBER.match(token)
+        if _POSTCODE.match(token) and code_postal is None:
+            code_postal = token
+        elif match and numero is None and not words:
+            numero, rep = int(match.group(1)), match.group(2)
+        elif token in REPETITIONS and numero is not None and not words and not rep:
+            rep = token
+        else:
+            words.append(token)
+    return numero, rep, code_postal, words
+
+
+def _label(numero: int | None, rep: str, street: dict[str, Any]) -> str:
+    """Format an address label like the API Adresse ("12bis Rue X 35000 Rennes")."""
+    number = f"{numero}{rep} " if numero is not None else ""
+    return f"{number}{street['nom_voie']} {street['code_postal']} {street['nom_commune']}"
+
+
+class BANStore(SQLiteStore):
+    """SQLite-backed BAN address index with a token/trigram street search."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS streets (
+            id INTEGER PRIMARY KEY,
+            nom_voie TEXT,
+            code_postal TEXT,
+            code_insee TEXT,
+            nom_commune TEXT,
+            latitude REAL,
+            longitude REAL
+        );
+        CREATE TABLE IF NOT EXISTS addresses (
+            street_id INTEGER,
+            numero INTEGER,
+            rep TEXT,
+            latitude REAL,
+            longitude REAL,
+            PRIMARY KEY (street_id, numero, rep)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS vocabulary (
+            id INTEGER PRIMARY KEY,
+            token TEXT UNIQUE,
+            frequency INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            token_id INTEGER,
+            street_id INTEGER,
+            PRIMARY KEY (token_id, street_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS trigrams (
+            trigram TEXT,
+            token_id INTEGER,
+            PRIMARY KEY (trigram, token_id)
+        ) WITHOUT ROWID;
+    """
+    SOURCE = "BAN"
+    ROWS = "BAN addresses"
+
+    def __init__(self, path: str):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path of the SQLite database file (created on first ingestion)
+        """
+        super().__init__(path)
+        # Token -> id of the vocabulary, loaded when an ingestion starts
+        self._vocabulary: dict[str, int] = {}
+
+    def _prepare_ingest(self, connection: sqlite3.Connection) -> None:
+        """Load the vocabulary that the new files extend."""
+        self._vocabulary = {
+            row["token"]: row["id"]
+            for row in connection.execute("SELECT id, token FROM vocabulary")
+        }
+
+    def _ingest_file(self, connection: sqlite3.Connection, path: str) -> int:
+        """Insert the streets, addresses and index entries of one BAN CSV file."""
+        vocabulary = self._vocabulary
+        next_street = (connection.execute("SELECT MAX(id) FROM streets").fetchone()[0] or 0) + 1
+        # Street key -> [id, latitude sum, longitude sum, address count]
+        streets: dict[tuple[str, str, str], list[Any]] = {}
+        street_rows: list[tuple[Any, ...]] = []
+        addresses: list[tuple[Any, ...]] = []
+
+        raw = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+        with raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as text:
+            for record in csv.DictReader(text, delimiter=";"):
+                try:
+                    numero = int(record["numero"])
+                    lat, lon = float(record["lat"]), float(record["lon"])
+                except (TypeError, ValueError):
+                    continue
+                key = (record["nom_voie"], record["code_postal"], record["code_insee"])
+                street = streets.get(key)
+                if street is None:
+                    street = streets[key] = [next_street, 0.0, 0.0, 0]
+                    street_rows.append((next_street, *key, record["nom_commune"]))
+                    next_street += 1
+                street[1] += lat
+                street[2] += lon
+                street[3] += 1
+                rep = normalize_address(record.get("rep") or "").replace(" ", "")
+                addresses.append((street[0], numero, rep, lat, lon))
+
+        connection.executemany(
+            "INSERT INTO streets VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(*row, *_centroid(streets[row[1:4]])) for row in street_rows],
+        )
+        connection.executemany("INSERT OR IGNORE INTO addresses VALUES (?, ?, ?, ?, ?)", addresses)
+
+        postings: list[tuple[int, int]] = []
+        frequencies: Counter[str] = Counter()
+        for street_id, nom_voie, code_postal, _, nom_commune in street_rows:
+            for token in _street_tokens(nom_voie, nom_commune, code_postal):
+                frequencies[token] += 1
+                if token not in vocabulary:
+                    vocabulary[token] = len(vocabulary) + 1
+                    connection.execute(
+                        "INSERT INTO vocabulary VALUES (?, ?, 0)", (vocabulary[token], token)
+                    )
+                    connection.executemany(
+                        "INSERT INTO trigrams VALUES (?, ?)",
+                        [(trigram, vocabulary[token]) for trigram in _trigrams(token)],
+                    )
+                postings.append((vocabulary[token], street_id))
+        connection.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)", postings)
+        connection.executemany(
+            "UPDATE vocabulary SET frequency = frequency + ? WHERE id = ?",
+            [(count, vocabulary[token]) for token, count in frequencies.items()],
+        )
+        return len(addresses)
+
+    def _resolve(self, words: list[str]) -> dict[str, tuple[int, str, float, int]]:
+        """
+        Match query words to vocabulary tokens.
+
+        Returns:
+            Word -> (token id, token, similarity, frequency) of each matched word: exact
+            matches have similarity 1, misspelled words the trigram similarity of their
+            closest token
+        """
+        connection = self._connect()
+        matched: dict[str, tuple[int, str, float, int]] = {}
+        for word in dict.fromkeys(words):
+            if word in STOPWORDS:
+                continue
+            row = connection.execute(
+                "SELECT id, frequency FROM vocabulary WHERE token = ?", (word,)
+            ).fetchone()
+            if row is not None:
+                matched[word] = (row["id"], word, 1.0, row["frequency"])
+            elif len(word) >= 4:
+                closest = self._closest(word)
+                if closest is not None:
+                    matched[word] = closest
+        return matched
+
+    def _closest(self, word: str) -> tuple[int, str, float, int] | None:
+        """Return the vocabulary token sharing the most trigrams with a misspelled word."""
+        trigrams = _trigrams(word)
+        best = None
+        for candidate in self._connect().execute(
+            "SELECT v.id, v.token, v.frequency, COUNT(*) AS shared FROM trigrams AS t "
+            "JOIN vocabulary AS v ON v.id = t.token_id "
+            f"WHERE t.trigram IN ({', '.join('?' for _ in trigrams)}) "
+            "GROUP BY t.token_id ORDER BY shared DESC LIMIT 10",
+            tuple(trigrams),
+        ):
+            # Dice coefficient: a swap of two letters ("librete") keeps half the trigrams
+            total = len(trigrams) + len(_trigrams(candidate["token"]))
+            similarity = 2 * candidate["shared"] / total
+            if similarity >= _MIN_SIMILARITY and (best is None or similarity > best[2]):
+                best = (candidate["id"], candidate["token"], similarity, candidate["frequency"])
+        return best
+
+    def _candidates(
+        self, matched: dict[str, tuple[int, str, float, int]], code_postal: str | None
+    ) -> list[sqlite3.Row]:
+        """Streets indexed under the two rarest matched words (and the postcode if given)."""
+        connection = self._connect()
+        rarest = [token_id for token_id, _, _, _ in sorted(matched.values(), key=lambda m: m[3])]
+        token_ids = rarest[:2]
+        if code_postal is not None:
+            row = connection.execute(
+                "SELECT id FROM vocabulary WHERE token = ?", (code_postal,)
+            ).fetchone()
+            if row is not None:
+                token_ids.append(row["id"])
+        if not token_ids:
+            return []
+        return connection.execute(
+            "SELECT * FROM streets WHERE id IN (SELECT street_id FROM postings "
+            f"WHERE token_id IN ({', '.join('?' for _ in token_ids)}) LIMIT ?)",
+            (*token_ids, _MAX_CANDIDATES),
+        ).fetchall()
+
+    @staticmethod
+    def _score(
+        street: sqlite3.Row, query: list[str], weights: dict[str, float], code_postal: str | None
+    ) -> float:
+        """
+        Score a street against the (spelling-corrected) query words, in [0, 1].
+
+        Half of the score is how much of the street name the query contains, half how
+        much of the query (words and postcode) the street, its commune and its postcode
+        account for. Misspelled words count for their similarity.
+        """
+        name = [token for token in _tokens(street["nom_voie"]) if token not in STOPWORDS]
+        place = {*_tokens(street["nom_commune"]), street["code_postal"]}
+        name_score = sum(weights.get(token, 0.0) for token in name) / len(name) if name else 0.0
+
+        explained = sum(weights.get(word, 0.0) for word in query if word in name or word in place)
+        asked = len(query)
+        if code_postal is not None:
+            asked += 1
+            explained += code_postal == street["code_postal"]
+        query_score = explained / asked if asked else 0.0
+        return 0.5 * name_score + 0.5 * query_score
+
+    def geocode(self, address: str) -> dict[str, Any] | None:
+        """
+        Geocode an address from the local index.
+
+        Returns:
+            The geocode_address dictionary (latitude, longitude, full_address, score,
+            city, citycode, postcode) of the best match, or None if no street matches
+        """
+        numero, rep, code_postal, words = parse_query(address)
+        matched = self._resolve(words)
+        streets = self._candidates(matched, code_postal)
+        if not streets:
+            return None
+
+        # Misspelled words are replaced by the token they matched
+        query = [matched[word][1] if word in matched else word for word in words]
+        query = [word for word in query if word not in STOPWORDS]
+        weights = {token: similarity for _, token, similarity, _ in matched.values()}
+        score, street = max(
+            ((self._score(street, query, weights, code_postal), street) for street in streets),
+            key=lambda item: item[0],
+        )
+        latitude, longitude = street["latitude"], street["longitude"]
+
+        if numero is not None:
+            position = (
+                self._connect()
+                .execute(
+                    "SELECT numero, rep, latitude, longitude FROM addresses WHERE street_id = ? "
+                    "ORDER BY ABS(numero - ?), rep != ? LIMIT 1",
+                    (street["id"], numero, rep),
+                )
+                .fetchone()
+            )
+            if position is not None:
+                latitude, longitude = position["latitude"], position["longitude"]
+                if (position["numero"], position["rep"]) != (numero, rep):
+                    # The number is not in the BAN: answer the closest one, less confidently
+                    score *= _MISSING_NUMBER_FACTOR
+                    numero, rep = position["numero"], position["rep"]
+
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "full_address": _label(numero, rep, street),
+            "score": round(score, 4),
+            "city": street["nom_commune"],
+            "citycode": street["code_insee"],
+            "postcode": street["code_postal"],
+        }
+
+
+def _centroid(street: list[Any]) -> tuple[float, float]:
+    """Mean position of the addresses of a street (see BANStore._ingest_file)."""
+    _, lat_sum, lon_sum, count = street
+    return lat_sum / count, lon_sum / count
+
+
+async def geocode_locally(
+    addresses: list[str], store: "BANStore | None" = None
+) -> list[dict[str, Any] | None]:
+    """
+    Geocode addresses from the local BAN index, in a worker thread.
+
+    Matches scoring below settings.geocoder_local_min_score are dropped, so the caller
+    can ask the API Adresse for them. When the store has not been built every address
+    is returned as None (and a warning is logged).
+
+    Returns:
+        One geocode_address dictionary (or None) per input address, in input order
+    """
+    store = store or ban_store
+    if not store.exists():
+        logger.warning("Base BAN locale introuvable (%s), géocodage par l'API", store.path)
+        return [None] * len(addresses)
+
+    def _geocode() -> list[dict[str, Any] | None]:
+        results = [store.geocode(address) for address in addresses]
+        return [
+            result
+            if result is not None and result["score"] >= settings.geocoder_local_min_score
+            else None
+            for result in results
+        ]
+
+    return await asyncio.to_thread(_geocode)
+
+
+# Global store configured from settings
+ban_store = BANStore(settings.ban_store_path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line entry point for building the local BAN index."""
+    parser = argparse.ArgumentParser(description="Build the local BAN address index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest BAN CSV files")
+    ingest_parser.add_argument("files", nargs="+", help="adresses-*.csv(.gz) files")
+    ingest_parser.add_argument("--store", default=settings.ban_store_path, help="SQLite path")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = BANStore(args.store)
+    total = store.ingest(args.files)
+    logger.info("BAN store %s: %d addresses inserted", args.store, total)
+
+
+if __name__ == "__main__":
+    main()
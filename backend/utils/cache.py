@@ -0,0 +1,350 @@
+"""Two-tier TTL cache (in-process LRU backed by SQLite) with request coalescing."""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import weakref
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from backend.config import settings
+from backend.utils.metrics import Sample, metrics
+
+_MISSING = object()
+
+# Writes to a disk store between two purges of its expired rows
+_PURGE_INTERVAL = 1_000
+
+# Live caches, reported on GET /metrics (see _collect_stats)
+_instances: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalise an address into a cache key.
+
+    Case, accents, punctuation and repeated whitespace are ignored, so
+    "10, Rue de l'Église  Paris" and "10 rue de l eglise paris" share a key.
+    """
+    text = unicodedata.normalize("NFKD", address)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+
+def coordinates_key(lat: float, lon: float, precision: int | None = None) -> str:
+    """Return a cache key for coordinates rounded to `precision` decimals."""
+    precision = settings.cache_coordinate_precision if precision is None else precision
+    return f"{lat:.{precision}f},{lon:.{precision}f}"
+
+
+class _DiskStore:
+    """
+    Persistent key/value store shared by every cache namespace (one SQLite file).
+
+    Expired rows are deleted when the store is first opened and then every
+    _PURGE_INTERVAL writes, so the file does not grow with entries never read again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = False
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5.0)
+            # WAL lets several uvicorn workers read while one writes
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, expires_at REAL, value TEXT, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_generations ("
+                "namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+            self._local.connection = connection
+            with self._lock:
+                purge, self._opened = not self._opened, True
+            if purge:
+                with connection:
+                    self._purge(connection)
+        return connection
+
+    @staticmethod
+    def _purge(connection: sqlite3.Connection) -> None:
+        """Delete the expired rows of every namespace."""
+        connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, namespace: str, key: str) -> tuple[float, Any] | None:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT expires_at, value FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            )
+            .fetchone()
+        )
+        if row is None or row[0] <= time.time():
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, namespace: str, key: str, expires_at: float, value: Any) -> None:
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % _PURGE_INTERVAL == 0
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (namespace, key, expires_at, json.dumps(value)),
+            )
+            if purge:
+                self._purge(connection)
+
+    def delete(self, namespace: str, key: str | None = None) -> None:
+        with self._connect() as connection:
+            if key is None:
+                connection.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            else:
+                connection.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+            # Tells the other processes to drop their in-memory copies
+            connection.execute(
+                "INSERT INTO cache_generations VALUES (?, 1) "
+                "ON CONFLICT (namespace) DO UPDATE SET generation = generation + 1",
+                (namespace,),
+            )
+
+    def generation(self, namespace: str) -> int:
+        """Number of invalidations of a namespace, across every process."""
+        row = (
+            self._connect()
+            .execute("SELECT generation FROM cache_generations WHERE namespace = ?", (namespace,))
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+
+class TTLCache:
+    """
+    Two-tier cache: a size-bounded in-process LRU in front of a persistent SQLite store.
+
+    Concurrent get_or_fetch calls for the same key share a single in-flight fetch.
+    With shared_invalidation, memory hits are checked against the invalidation
+    generation of the disk tier, so invalidating in one worker (see invalidate) also
+    drops the copies held by the other workers' LRUs, at the cost of a SQLite read per
+    hit. Values must be JSON-serialisable and are shared between callers, so treat them as
+    read-only.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        max_entries: int | None = None,
+        path: str | None = None,
+        shared_invalidation: bool = False,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            namespace: Name of the cache (separates entries in the shared disk store)
+            ttl: Time-to-live of an entry, in seconds
+            max_entries: Size bound of the in-process LRU (defaults to settings)
+            path: SQLite file of the persistent tier (defaults to settings, "" disables it)
+            shared_invalidation: Honour invalidations made by other processes on memory hits
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries or settings.cache_max_entries
+        path = settings.cache_path if path is None else path
+        self._disk = _DiskStore(path) if path else None
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.shared_invalidation = shared_invalidation and self._disk is not None
+        # Disk generation the LRU content belongs to (see _check_generation)
+        self._generation = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        _instances.add(self)
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters and the current in-process size."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "size": len(self._memory),
+        }
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        """Store an entry in the LRU, evicting the least recently used beyond the bound."""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Any:
+        """
+        Return the cached value for a key, or None on a miss.
+
+        Counts a hit or a miss.
+        """
+        value = await self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return None
+        return value
+
+    async def _lookup(self, key: str) -> Any:
+        """Look a key up in both tiers, promoting disk hits to memory."""
+        if self.shared_invalidation and key in self._memory:
+            await self._check_generation()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._memory[key]
+
+        if self._disk is not None:
+            stored = await asyncio.to_thread(self._disk.get, self.namespace, key)
+            if stored is not None:
+                self._remember(key, *stored)
+                self.disk_hits += 1
+                return stored[1]
+
+        return _MISSING
+
+    async def _check_generation(self) -> None:
+        """Clear the LRU if the namespace was invalidated (by any process) since it was filled."""
+        generation = await asyncio.to_thread(self._disk.generation, self.namespace)
+        if generation != self._generation:
+            self._memory.clear()
+            self._generation = generation
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a value in both tiers."""
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, self.namespace, key, expires_at, value)
+
+    async def invalidate(self, key: str | None = None) -> None:
+        """
+        Remove one key, or every key of this cache when key is None.
+
+        The disk tier is shared by every worker, but other workers' LRUs only see the
+        invalidation when the cache uses shared_invalidation.
+        """
+        if key is None:
+            self._memory.clear()
+        else:
+            self._memory.pop(key, None)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.delete, self.namespace, key)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for a key, calling fetch() on a miss.
+
+        Concurrent misses on the same key await the same fetch, which runs in a task
+        owned by the cache: a cancelled caller stops waiting but the fetch goes on for
+        the others (and its value is cached). Exceptions raised by fetch are propagated
+        to every waiter and nothing is cached. The cache is bypassed
+        entirely when settings.cache_enabled is False.
+
+        Args:
+            key: Cache key
+            fetch: Coroutine function producing the value
+
+        Returns:
+            The cached or freshly fetched value
+        """
+        if not settings.cache_enabled:
+            return await fetch()
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        value = await self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        # Another caller may have started the same fetch while we read the disk tier
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        # The fetch belongs to the cache, not to this caller: cancelling any caller
+        # (including the first) leaves the fetch running for the others
+        task = asyncio.ensure_future(self._fetch_and_set(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._fetched(key, done))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_set(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Fetch a value and store it in both tiers."""
+        value = await fetch()
+        await self.set(key, value)
+        return value
+
+    def _fetched(self, key: str, task: asyncio.Future) -> None:
+        """Forget a finished fetch, marking its exception as retrieved when every caller left."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+
+# TTLCache.stats() key -> metric name
+_STAT_METRICS = {
+    "hits": "cache_hits_total",
+    "disk_hits": "cache_disk_hits_total",
+    "misses": "cache_misses_total",
+    "coalesced": "cache_coalesced_total",
+    "size": "cache_entries",
+}
+
+
+def _collect_stats() -> list[Sample]:
+    """Hit/miss counters and sizes of the live caches, summed per namespace (by metric)."""
+    totals: dict[str, dict[str, int]] = {}
+    for cache in list(_instances):
+        stats = cache.stats()
+        namespace = totals.setdefault(cache.namespace, dict.fromkeys(_STAT_METRICS, 0))
+        for key in _STAT_METRICS:
+            namespace[key] += stats[key]
+    return [
+        (name, {"namespace": namespace}, stats[key])
+        for key, name in _STAT_METRICS.items()
+        for namespace, stats in sorted(totals.items())
+    ]
+
+
+metrics.register_collector(_collect_stats)
@@ -1,17 +1,43 @@
 """Cadastral parcel utilities for geocoding addresses and retrieving parcel information."""
 
+import asyncio
+import csv
+import io
 import json
+import logging
 from typing import Any
 
 import httpx
 
+from backend.config import settings
+from backend.utils.ban_store import geocode_locally
+from backend.utils.cache import TTLCache, coordinates_key, normalize_address
+from backend.utils.cadastre_store import get_local_cadastral_parcel
+from backend.utils.http_client import API_ADRESSE, API_CARTO, AsyncRateLimiter, http_clients
+from backend.utils.metrics import increment
 
-async def geocode_address(address: str) -> dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+# Shared by every batch so concurrent portfolio jobs stay within the API Adresse rate limit
+_csv_rate_limiter = AsyncRateLimiter(settings.api_adresse_csv_rate_limit)
+
+# Lookup caches, keyed by normalised address and by rounded coordinates
+geocode_cache = TTLCache("geocode", settings.geocode_cache_ttl)
+parcel_cache = TTLCache("cadastre", settings.cadastre_cache_ttl)
+
+
+async def geocode_address(
+    address: str, client: httpx.AsyncClient | None = None, include_raw: bool = False
+) -> dict[str, Any]:
     """
     Geocode an address using the API Adresse to get coordinates.
 
+    Results are cached by normalised address (see geocode_cache).
+
     Args:
         address: The address to geocode (e.g., "10 rue de la Paix, 75002 Paris")
+        client: Optional HTTP client (defaults to the shared pooled client)
+        include_raw: Also return the API feature as raw_response (bypasses the cache)
 
     Returns:
         Dictionary containing geocoding results with keys:
@@ -20,18 +46,36 @@ async def geocode_address(address: str) -> dict[str, Any]:
         - full_address: str (formatted address)
         - score: float (confidence score)
         - city: str
+        - citycode: str (INSEE code of the commune)
         - postcode: str
+        - raw_response: dict (full API feature, only with include_raw)
 
     Raises:
         httpx.HTTPStatusError: If the API request fails
         ValueError: If no address is found
     """
-    url = "https://api-adresse.data.gouv.fr/search/"
+    if include_raw:
+        return await _fetch_geocode(address, client, include_raw=True)
+    return await geocode_cache.get_or_fetch(
+        normalize_address(address), lambda: _fetch_geocode(address, client)
+    )
+
+
+async def _fetch_geocode(
+    address: str, client: httpx.AsyncClient | None, include_raw: bool = False
+) -> dict[str, Any]:
+    """Geocode an address with one /search/ request (uncached), or the local BAN index."""
+    if settings.geocoder_backend == "local" and not include_raw:
+        (result,) = await geocode_locally([address])
+        increment("geocoder_local", result="hit" if result is not None else "fallback")
+        if result is not None:
+            return result
+
+    url = f"{settings.api_adresse_url}/search/"
     params = {"q": address, "limit": 1}
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(url, params=params)
-        response.raise_for_status()
+    async with http_clients.client(API_ADRESSE, client) as client:
+        response = await http_clients.send(API_ADRESSE, client, "GET", url, params=params)
         data = response.json()
 
         if not data.get("features"):
@@ -41,24 +85,152 @@ async def geocode_address(address: str) -> dict[str, Any]:
         properties = feature["properties"]
         coordinates = feature["geometry"]["coordinates"]
 
-        return {
+        result = {
             "latitude": coordinates[1],
             "longitude": coordinates[0],
             "full_address": properties.get("label", address),
             "score": properties.get("score", 0.0),
             "city": properties.get("city", ""),
+            "citycode": properties.get("citycode", ""),
             "postcode": properties.get("postcode", ""),
-            "raw_response": feature,
         }
+        if include_raw:
+            result["raw_response"] = feature
+        return result
+
+
+async def geocode_addresses(
+    addresses: list[str], client: httpx.AsyncClient | None = None, include_raw: bool = False
+) -> list[dict[str, Any] | None]:
+    """
+    Geocode many addresses with the API Adresse bulk CSV endpoint (/search/csv/).
+
+    Addresses are sent in chunks of settings.geocode_batch_size. Chunks run concurrently
+    (at most settings.geocode_batch_concurrency at a time) and are spaced out to respect
+    settings.api_adresse_csv_rate_limit. Cached addresses and duplicates are not sent.
+
+    Args:
+        addresses: The addresses to geocode
+        client: Optional HTTP client (defaults to the shared pooled client)
+        include_raw: Also return each CSV result row as raw_response (bypasses the cache)
+
+    Returns:
+        One result per input address, in input order: a dictionary with the same keys as
+        geocode_address, or None if the address was not found
+
+    Raises:
+        httpx.HTTPStatusError: If an API request fails
+    """
+    if include_raw or not settings.cache_enabled:
+        return await _geocode_batch(addresses, client, include_raw)
+
+    keys = [normalize_address(address) for address in addresses]
+    cached = {key: await geocode_cache.get(key) for key in dict.fromkeys(keys)}
+    missing: dict[str, str] = {}
+    for key, address in zip(keys, addresses):
+        if cached[key] is None:
+            missing.setdefault(key, address)
+
+    fetched = await _geocode_batch(list(missing.values()), client)
+    for key, result in zip(missing, fetched):
+        if result is not None:
+            await geocode_cache.set(key, result)
+        cached[key] = result
+
+    return [cached[key] for key in keys]
+
+
+async def _geocode_batch(
+    addresses: list[str], client: httpx.AsyncClient | None, include_raw: bool = False
+) -> list[dict[str, Any] | None]:
+    """Geocode addresses through /search/csv/ in concurrent, rate-limited chunks (uncached)."""
+    if settings.geocoder_backend == "local" and not include_raw:
+        # Only the addresses the local index cannot match confidently are sent to the API
+        results = await geocode_locally(addresses)
+        missing = [index for index, result in enumerate(results) if result is None]
+        increment("geocoder_local", len(addresses) - len(missing), result="hit")
+        increment("geocoder_local", len(missing), result="fallback")
+        if missing:
+            fetched = await _geocode_api_batch([addresses[index] for index in missing], client)
+            for index, result in zip(missing, fetched):
+                results[index] = result
+        return results
+    return await _geocode_api_batch(addresses, client, include_raw)
+
+
+async def _geocode_api_batch(
+    addresses: list[str], client: httpx.AsyncClient | None, include_raw: bool = False
+) -> list[dict[str, Any] | None]:
+    """Send addresses to /search/csv/ in concurrent, rate-limited chunks."""
+    size = settings.geocode_batch_size
+    chunks = [addresses[start : start + size] for start in range(0, len(addresses), size)]
+    semaphore = asyncio.Semaphore(settings.geocode_batch_concurrency)
+
+    async with http_clients.client(API_ADRESSE, client) as client:
+
+        async def _run(chunk: list[str]) -> list[dict[str, Any] | None]:
+            async with semaphore:
+                await _csv_rate_limiter.acquire()
+                return await _geocode_chunk(client, chunk, include_raw)
+
+        chunk_results = await asyncio.gather(*(_run(chunk) for chunk in chunks))
+
+    return [result for chunk_result in chunk_results for result in chunk_result]
+
+
+async def _geocode_chunk(
+    client: httpx.AsyncClient, addresses: list[str], include_raw: bool = False
+) -> list[dict[str, Any] | None]:
+    """Geocode one chunk of addresses with a single /search/csv/ request."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id", "q"])
+    writer.writerows(enumerate(addresses))
+
+    response = await http_clients.send(
+        API_ADRESSE,
+        client,
+        "POST",
+        f"{settings.api_adresse_url}/search/csv/",
+        files={"data": ("adresses.csv", buffer.getvalue().encode("utf-8"), "text/csv")},
+        data={"columns": "q"},
+    )
+
+    results: list[dict[str, Any] | None] = [None] * len(addresses)
+    for row in csv.DictReader(io.StringIO(response.text)):
+        index = int(row["id"])
+        if not row.get("latitude") or row.get("result_status", "ok") not in ("ok", ""):
+            continue
+        results[index] = {
+            "latitude": float(row["latitude"]),
+            "longitude": float(row["longitude"]),
+            "full_address": row.get("result_label") or addresses[index],
+            "score": float(row.get("result_score") or 0.0),
+            "city": row.get("result_city", ""),
+            "citycode": row.get("result_citycode", ""),
+            "postcode": row.get("result_postcode", ""),
+        }
+        if include_raw:
+            results[index]["raw_response"] = row
+    return results
 
 
-async def get_cadastral_parcel(lat: float, lon: float) -> dict[str, Any]:
+async def get_cadastral_parcel(
+    lat: float, lon: float, client: httpx.AsyncClient | None = None, include_raw: bool = False
+) -> dict[str, Any]:
     """
     Get cadastral parcel information from coordinates using API Carto Cadastre.
 
+    Results are cached by coordinates rounded to settings.cache_coordinate_precision
+    (see parcel_cache). When settings.cadastre_backend is "local", the query is answered
+    by the local cadastre store (see backend.utils.cadastre_store) instead, with the
+    same return structure.
+
     Args:
         lat: Latitude (WGS84)
         lon: Longitude (WGS84)
+        client: Optional HTTP client (defaults to the shared pooled client)
+        include_raw: Also return the API feature as raw_response (bypasses the cache)
 
     Returns:
         Dictionary containing parcel information with keys:
@@ -67,23 +239,36 @@ async def get_cadastral_parcel(lat: float, lon: float) -> dict[str, Any]:
         - number: str
         - commune: str
         - geometry: dict (GeoJSON geometry)
-        - raw_response: dict (full API response)
+        - raw_response: dict (full API feature, only with include_raw)
 
     Raises:
         httpx.HTTPStatusError: If the API request fails
         ValueError: If no parcel is found for the given coordinates
     """
-    url = "https://apicarto.ign.fr/api/cadastre/parcelle"
+    if settings.cadastre_backend == "local":
+        return await get_local_cadastral_parcel(lat, lon)
+
+    if include_raw:
+        return await _fetch_cadastral_parcel(lat, lon, client, include_raw=True)
+    return await parcel_cache.get_or_fetch(
+        coordinates_key(lat, lon), lambda: _fetch_cadastral_parcel(lat, lon, client)
+    )
+
+
+async def _fetch_cadastral_parcel(
+    lat: float, lon: float, client: httpx.AsyncClient | None, include_raw: bool = False
+) -> dict[str, Any]:
+    """Get the parcel at a point with one API Carto request (uncached)."""
+    url = f"{settings.api_carto_url}/api/cadastre/parcelle"
 
     # Format GeoJSON POINT pour l'API Carto
     # dict to json string
     geom = json.dumps({"type": "Point", "coordinates": [lon, lat]})
     params = {"geom": geom}
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        print("requesting url", url, "with params", params)
-        response = await client.get(url, params=params)
-        response.raise_for_status()
+    async with http_clients.client(API_CARTO, client) as client:
+        logger.debug("Requesting parcel at (%s, %s)", lat, lon)
+        response = await http_clients.send(API_CARTO, client, "GET", url, params=params)
         data = response.json()
 
         if not data or not isinstance(data.get("features"), list) or len(data.get("features")) == 0:
@@ -94,17 +279,21 @@ async def get_cadastral_parcel(lat: float, lon: float) -> dict[str, Any]:
         parcel = data["features"][0]
         properties = parcel.get("properties", {})
 
-        return {
+        result = {
             "parcel_id": properties.get("id", ""),
             "section": properties.get("section", ""),
             "number": properties.get("numero", ""),
             "commune": properties.get("nom_com", ""),
             "geometry": parcel.get("geometry", {}),
-            "raw_response": parcel,
         }
+        if include_raw:
+            result["raw_response"] = parcel
+        return result
 
 
-async def get_parcel_from_address(address: str) -> dict[str, Any]:
+async def get_parcel_from_address(
+    address: str, client: httpx.AsyncClient | None = None
+) -> dict[str, Any]:
     """
     Get cadastral parcel information from an address.
 
@@ -112,6 +301,7 @@ async def get_parcel_from_address(address: str) -> dict[str, Any]:
 
     Args:
         address: The address to process (e.g., "10 rue de la Paix, 75002 Paris")
+        client: Optional HTTP client used for both requests (defaults to the shared clients)
 
     Returns:
         Dictionary containing both geocoding and parcel information with keys:
@@ -123,11 +313,11 @@ async def get_parcel_from_address(address: str) -> dict[str, Any]:
         ValueError: If address or parcel is not found
     """
     # Step 1: Geocode the address
-    geocoding_result = await geocode_address(address)
+    geocoding_result = await geocode_address(address, client=client)
 
     # Step 2: Get cadastral parcel
     parcel_result = await get_cadastral_parcel(
-        geocoding_result["latitude"], geocoding_result["longitude"]
+        geocoding_result["latitude"], geocoding_result["longitude"], client=client
     )
 
     return {
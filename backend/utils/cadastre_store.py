@@ -0,0 +1,368 @@
+"""Local cadastral parcel store built from the Etalab cadastre GeoJSON files.
+
+The Etalab parcel files (https://cadastre.data.gouv.fr/data/etalab-cadastre/latest/geojson/,
+"cadastre-<code>-parcelles.json.gz" per commune or per département) are loaded into a
+SQLite database. Each parcel's bounding box goes into an R*Tree, so a point lookup only
+tests the few parcels whose box contains the point: parcels are answered in-process
+without the API Carto round trip.
+
+Usage:
+    python -m backend.utils.cadastre_store ingest cadastre-35-parcelles.json.gz
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import math
+import re
+import sqlite3
+from collections.abc import Iterator
+from typing import Any
+
+from backend.config import settings
+from backend.utils.communes import commune_index
+from backend.utils.sqlite_store import EARTH_RADIUS_M, SQLiteStore, bounding_box, overlaps
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("parcel_id", "code_commune", "commune", "section", "number", "geometry")
+
+_INGEST_BATCH_SIZE = 20_000
+
+# Text read at once from a GeoJSON file while streaming its features
+_READ_CHUNK_SIZE = 1 << 20
+_FEATURES_START = re.compile(r'"features"\s*:\s*\[')
+_FEATURES_TAIL = 64
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# A polygon is a list of rings (exterior first, then holes), a ring a list of [lon, lat]
+Polygon = list[list[list[float]]]
+
+
+def _polygons(geometry: dict[str, Any]) -> list[Polygon]:
+    """Return the non-empty polygons of a Polygon or MultiPolygon GeoJSON geometry."""
+    coordinates = geometry.get("coordinates") or []
+    if geometry.get("type") == "Polygon":
+        coordinates = [coordinates]
+    elif geometry.get("type") != "MultiPolygon":
+        return []
+    return [polygon for polygon in coordinates if polygon and polygon[0]]
+
+
+def _bounds(geometry: dict[str, Any]) -> tuple[float, float, float, float] | None:
+    """Return the (min_lat, max_lat, min_lon, max_lon) box of a geometry, or None if empty."""
+    points = [point for polygon in _polygons(geometry) for point in polygon[0]]
+    if not points:
+        return None
+    lons = [point[0] for point in points]
+    lats = [point[1] for point in points]
+    return min(lats), max(lats), min(lons), max(lons)
+
+
+def _in_ring(x: float, y: float, ring: list[list[float]]) -> bool:
+    """Ray casting test of a point against one closed ring."""
+    inside = False
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for point in ring:
+        x2, y2 = point[0], point[1]
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def contains(geometry: dict[str, Any], lat: float, lon: float) -> bool:
+    """Whether a (Multi)Polygon geometry contains a point (holes excluded)."""
+    for polygon in _polygons(geometry):
+        if _in_ring(lon, lat, polygon[0]) and not any(
+            _in_ring(lon, lat, hole) for hole in polygon[1:]
+        ):
+            return True
+    return False
+
+
+def _segment_distance(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    """Planar distance from point P to segment AB."""
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def distance_m(geometry: dict[str, Any], lat: float, lon: float) -> float:
+    """
+    Distance in metres from a point to a (Multi)Polygon geometry (0 inside it).
+
+    Coordinates are projected on the plane tangent at the point, which is exact to well
+    under a metre at the scale of a parcel search.
+    """
+    if contains(geometry, lat, lon):
+        return 0.0
+    scale_y = math.radians(1) * EARTH_RADIUS_M
+    scale_x = scale_y * math.cos(math.radians(lat))
+    best = math.inf
+    for polygon in _polygons(geometry):
+        for ring in polygon:
+            projected = [((x - lon) * scale_x, (y - lat) * scale_y) for x, y, *_ in ring]
+            for (ax, ay), (bx, by) in zip(projected, projected[1:] + projected[:1]):
+                best = min(best, _segment_distance(0.0, 0.0, ax, ay, bx, by))
+    return best
+
+
+def _commune_name(code: str) -> str:
+    """Name of a commune from the local commune index, or its INSEE code if unknown."""
+    if code and commune_index.exists():
+        facts = commune_index.get(code)
+        if facts is not None:
+            return facts.nom
+    return code
+
+
+def _iter_features(path: str, chunk_size: int = _READ_CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    """
+    Stream the features of a GeoJSON FeatureCollection (plain or gzip-compressed).
+
+    A département file holds hundreds of thousands of parcels, so the document is never
+    loaded whole: the file is read chunk by chunk and the "features" array decoded one
+    feature at a time (json.JSONDecoder.raw_decode), keeping in memory only the text of
+    the features not decoded yet.
+
+    Raises:
+        ValueError: If the file has no "features" array or is truncated
+    """
+    decoder = json.JSONDecoder()
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        buffer = ""
+        while (match := _FEATURES_START.search(buffer)) is None:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ValueError(f'Pas de tableau "features" dans {path}')
+            # Keep a tail in case the key is split across two chunks
+            buffer = buffer[-_FEATURES_TAIL:] + chunk
+        buffer, position = buffer[match.end() :], 0
+
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                feature, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Feature cut by the end of the buffer: drop the decoded text, read on
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"Fichier GeoJSON tronqué : {path}") from None
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield feature
+
+
+def _iter_rows(path: str) -> Iterator[tuple[tuple[Any, ...], tuple[float, float, float, float]]]:
+    """Stream (parcel row, bounding box) pairs from an Etalab parcel file."""
+    names: dict[str, str] = {}
+    for feature in _iter_features(path):
+        geometry = feature.get("geometry") or {}
+        bounds = _bounds(geometry)
+        properties = feature.get("properties") or {}
+        if bounds is None or not properties.get("id"):
+            continue
+        code = properties.get("commune", "")
+        if code not in names:
+            names[code] = _commune_name(code)
+        row = (
+            properties["id"],
+            code,
+            names[code],
+            properties.get("section", ""),
+            properties.get("numero", ""),
+            json.dumps(geometry, separators=(",", ":")),
+        )
+        yield row, bounds
+
+
+def row_to_parcel(row: dict[str, Any]) -> dict[str, Any]:
+    """Convert a stored parcel row to the dict returned by get_cadastral_parcel."""
+    parcel = {
+        "parcel_id": row["parcel_id"],
+        "section": row["section"],
+        "number": row["number"],
+        "commune": row["commune"],
+        "geometry": json.loads(row["geometry"]),
+    }
+    if "distance_m" in row:
+        parcel["distance_m"] = row["distance_m"]
+    return parcel
+
+
+class CadastreStore(SQLiteStore):
+    """
+    SQLite-backed store of cadastral parcels with an R*Tree over their bounding boxes.
+
+    Parcels already in the store (files of overlapping areas) are kept once.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS parcels (
+            parcel_id TEXT UNIQUE,
+            code_commune TEXT,
+            commune TEXT,
+            section TEXT,
+            number TEXT,
+            geometry TEXT
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS parcels_rtree
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+    """
+    SOURCE = "cadastre"
+    ROWS = "parcels"
+
+    def _ingest_file(self, connection: sqlite3.Connection, path: str) -> int:
+        """Load one Etalab "parcelles" GeoJSON file (".json" or ".json.gz")."""
+        insert = (
+            f"INSERT OR IGNORE INTO parcels ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+        )
+        count = 0
+        batch: list[tuple[tuple[Any, ...], tuple[float, float, float, float]]] = []
+        for entry in _iter_rows(path):
+            batch.append(entry)
+            if len(batch) >= _INGEST_BATCH_SIZE:
+                count += self._insert(connection, insert, batch)
+                batch.clear()
+        if batch:
+            count += self._insert(connection, insert, batch)
+        return count
+
+    @staticmethod
+    def _insert(
+        connection: sqlite3.Connection,
+        insert: str,
+        batch: list[tuple[tuple[Any, ...], tuple[float, float, float, float]]],
+    ) -> int:
+        """Insert a batch of parcels and index the new ones; return how many were new."""
+        count = 0
+        for row, bounds in batch:
+            cursor = connection.execute(insert, row)
+            if cursor.rowcount:
+                connection.execute(
+                    "INSERT INTO parcels_rtree VALUES (?, ?, ?, ?, ?)", (cursor.lastrowid, *bounds)
+                )
+                count += 1
+        return count
+
+    def _candidates(self, bbox: tuple[float, float, float, float]) -> Iterator[sqlite3.Row]:
+        """Yield the parcels whose bounding box overlaps bbox."""
+        condition, params = overlaps(bbox, "r")
+        yield from self._connect().execute(
+            f"SELECT {', '.join(f'p.{name}' for name in _COLUMNS)} FROM parcels_rtree AS r "
+            f"JOIN parcels AS p ON p.rowid = r.id WHERE {condition}",
+            params,
+        )
+
+    def query_point(self, lat: float, lon: float) -> dict[str, Any] | None:
+        """
+        Return the parcel containing a point.
+
+        Candidates are the parcels whose bounding box contains the point (R*Tree), then
+        tested exactly against their polygons.
+
+        Returns:
+            The parcel row (dict keyed by column name), or None if no parcel contains it
+        """
+        for record in self._candidates((lat, lat, lon, lon)):
+            if contains(json.loads(record["geometry"]), lat, lon):
+                return dict(record)
+        return None
+
+    def query_radius(self, lat: float, lon: float, dist: float) -> list[dict[str, Any]]:
+        """
+        Return every parcel intersecting the circle of dist metres around a point.
+
+        Args:
+            lat: Latitude (WGS84)
+            lon: Longitude (WGS84)
+            dist: Radius in metres
+
+        Returns:
+            List of parcel rows (dicts keyed by column name, plus distance_m from the point
+            to the parcel, 0 for the parcel containing it), closest first
+        """
+        matches = []
+        for record in self._candidates(bounding_box(lat, lon, dist)):
+            distance = distance_m(json.loads(record["geometry"]), lat, lon)
+            if distance <= dist:
+                row = dict(record)
+                row["distance_m"] = distance
+                matches.append(row)
+
+        matches.sort(key=lambda row: row["distance_m"])
+        return matches
+
+
+def _require(store: CadastreStore) -> CadastreStore:
+    """Raise if the store has not been built."""
+    if not store.exists():
+        raise ValueError(f"Base cadastrale locale introuvable: {store.path}")
+    return store
+
+
+async def get_local_cadastral_parcel(
+    lat: float, lon: float, store: CadastreStore | None = None
+) -> dict[str, Any]:
+    """
+    Get the parcel at a point from the local store.
+
+    Returns the same structure as get_cadastral_parcel (commune is the commune name when
+    the commune index is built, its INSEE code otherwise).
+
+    Raises:
+        ValueError: If the local store has not been built or no parcel contains the point
+    """
+    store = _require(store or cadastre_store)
+    row = await asyncio.to_thread(store.query_point, lat, lon)
+    if row is None:
+        raise ValueError(f"Aucune parcelle cadastrale trouvée pour les coordonnées ({lat}, {lon})")
+    return row_to_parcel(row)
+
+
+async def get_local_parcels_within(
+    lat: float, lon: float, dist: float, store: CadastreStore | None = None
+) -> list[dict[str, Any]]:
+    """
+    Get every parcel intersecting the circle of dist metres around a point.
+
+    Returns:
+        Parcels in the get_cadastral_parcel structure, plus distance_m, closest first
+
+    Raises:
+        ValueError: If the local store has not been built
+    """
+    store = _require(store or cadastre_store)
+    rows = await asyncio.to_thread(store.query_radius, lat, lon, dist)
+    return [row_to_parcel(row) for row in rows]
+
+
+# Global store configured from settings
+cadastre_store = CadastreStore(settings.cadastre_store_path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line entry point for building the local cadastre store."""
+    parser = argparse.ArgumentParser(description="Build the local cadastral parcel store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest Etalab parcel files")
+    ingest_parser.add_argument("files", nargs="+", help="cadastre-*-parcelles.json(.gz) files")
+    ingest_parser.add_argument("--store", default=settings.cadastre_store_path, help="SQLite path")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = CadastreStore(args.store)
+    total = store.ingest(args.files)
+    logger.info("Cadastre store %s: %d parcels inserted", args.store, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""Local commune reference data (INSEE COG and commune centroids) in a compact NumPy index.
+
+The index is built once from the official files and saved as a single .npz file:
+- the COG communes, départements and régions tables
+  (https://www.insee.fr/fr/information/2560452, v_commune_*.csv, v_departement_*.csv,
+  v_region_*.csv), including arrondissements and communes déléguées as aliases of
+  their parent commune;
+- a commune centroids file with code_insee, latitude, longitude and population columns
+  (e.g. the "communes-france" export on data.gouv.fr);
+- optionally the INSEE intercommunalités table (CODGEO, LIBEPCI) as CSV.
+
+The nearest large cities of every commune are precomputed at build time, so the
+"Situation" block of a commune is answered with array lookups only.
+
+Usage:
+    python -m backend.utils.communes build --communes v_commune_2025.csv \\
+        --departements v_departement_2025.csv --regions v_region_2025.csv \\
+        --centroids communes-france.csv [--epci epci.csv]
+"""
+
+import argparse
+import csv
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from backend.config import settings
+from backend.utils.cache import normalize_address
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6_371.0088
+
+# Accepted spellings of the centroid file columns
+_CODE_COLUMNS = ("code_insee", "codgeo", "com", "code_commune_insee", "code")
+_LAT_COLUMNS = ("latitude", "latitude_centre", "lat", "latitude_mairie")
+_LON_COLUMNS = ("longitude", "longitude_centre", "lon", "longitude_mairie")
+_POPULATION_COLUMNS = ("population", "pmun", "ptot", "pop")
+
+_DISTANCE_CHUNK = 4096
+
+
+def _read_csv(path: str) -> list[dict[str, str]]:
+    """Read a CSV file (comma or semicolon separated) into rows with lower-case keys."""
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        header = file.readline()
+        file.seek(0)
+        delimiter = ";" if header.count(";") > header.count(",") else ","
+        return [
+            {key.strip().lower(): (value or "").strip() for key, value in row.items()}
+            for row in csv.DictReader(file, delimiter=delimiter)
+        ]
+
+
+def _column(row: dict[str, str], names: tuple[str, ...]) -> str | None:
+    """Return the name of the first column of `names` present in a row."""
+    return next((name for name in names if name in row), None)
+
+
+def _to_float(value: str) -> float:
+    """Parse a number written with a dot or a comma, NaN when empty."""
+    return float(value.replace(",", ".")) if value else np.nan
+
+
+def haversine_km(
+    lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray
+) -> np.ndarray:
+    """Great-circle distance in km (broadcasting over NumPy arrays)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _nearest_large_cities(
+    lat: np.ndarray, lon: np.ndarray, large: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the k nearest large cities of every commune (excluding the commune itself).
+
+    Returns:
+        Tuple (row indices of the large cities, distances in km), both of shape (n, k)
+        and sorted by distance; -1 / NaN pad communes without coordinates
+    """
+    n = len(lat)
+    k = min(k, len(large))
+    indices = np.full((n, k), -1, dtype=np.int32)
+    distances = np.full((n, k), np.nan, dtype=np.float32)
+    if k == 0:
+        return indices, distances
+
+    for start in range(0, n, _DISTANCE_CHUNK):
+        stop = min(start + _DISTANCE_CHUNK, n)
+        matrix = haversine_km(
+            lat[start:stop, None], lon[start:stop, None], lat[None, large], lon[None, large]
+        )
+        # A large city is not its own neighbour; communes without coordinates stay padded
+        matrix[large[None, :] == np.arange(start, stop)[:, None]] = np.inf
+        matrix[np.isnan(matrix)] = np.inf
+        nearest = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(matrix, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        nearest_distances = np.take_along_axis(nearest_distances, order, axis=1)
+
+        found = np.isfinite(nearest_distances)
+        indices[start:stop] = np.where(found, large[nearest], -1)
+        distances[start:stop] = np.where(found, nearest_distances, np.nan)
+    return indices, distances
+
+
+def build_commune_index(
+    communes_path: str,
+    departements_path: str,
+    regions_path: str,
+    centroids_path: str,
+    output_path: str | None = None,
+    epci_path: str | None = None,
+    large_city_population: int | None = None,
+    nearest: int | None = None,
+) -> int:
+    """
+    Build the commune index file from the COG and centroid files.
+
+    Args:
+        communes_path: COG communes file (TYPECOM, COM, DEP, LIBELLE, COMPARENT)
+        departements_path: COG départements file (DEP, REG, LIBELLE)
+        regions_path: COG régions file (REG, LIBELLE)
+        centroids_path: Centroids file (code_insee, latitude, longitude, population)
+        output_path: Index file to write (defaults to settings.commune_index_path)
+        epci_path: Optional intercommunalités file (CODGEO, LIBEPCI)
+        large_city_population: Population from which a commune is a large city
+            (defaults to settings)
+        nearest: Number of nearest large cities kept per commune (defaults to settings)
+
+    Returns:
+        Number of communes in the index
+    """
+    output_path = output_path or settings.commune_index_path
+    if large_city_population is None:
+        large_city_population = settings.commune_large_city_population
+    nearest = nearest or settings.commune_nearest_large_cities
+
+    regions = {row["reg"]: row["libelle"] for row in _read_csv(regions_path)}
+    departements = _read_csv(departements_path)
+
+    centroids: dict[str, tuple[float, float, int]] = {}
+    rows = _read_csv(centroids_path)
+    if rows:
+        code_col = _column(rows[0], _CODE_COLUMNS)
+        lat_col = _column(rows[0], _LAT_COLUMNS)
+        lon_col = _column(rows[0], _LON_COLUMNS)
+        population_col = _column(rows[0], _POPULATION_COLUMNS)
+        if code_col is None or lat_col is None or lon_col is None:
+            raise ValueError(f"Colonnes code/latitude/longitude introuvables dans {centroids_path}")
+        for row in rows:
+            population = row.get(population_col, "") if population_col else ""
+            centroids[row[code_col].zfill(5)] = (
+                _to_float(row[lat_col]),
+                _to_float(row[lon_col]),
+                int(_to_float(population)) if population else -1,
+            )
+
+    epci: dict[str, str] = {}
+    if epci_path:
+        epci = {row["codgeo"]: row["libepci"] for row in _read_csv(epci_path)}
+
+    communes = []
+    aliases: dict[str, str] = {}
+    for row in _read_csv(communes_path):
+        if row["typecom"] == "COM":
+            communes.append(row)
+        elif row.get("comparent"):
+            aliases[row["com"]] = row["comparent"]
+    communes.sort(key=lambda row: row["com"])
+
+    codes = np.array([row["com"] for row in communes], dtype="U5")
+    located = [centroids.get(row["com"], (np.nan, np.nan, -1)) for row in communes]
+    lat = np.array([entry[0] for entry in located], dtype=np.float64)
+    lon = np.array([entry[1] for entry in located], dtype=np.float64)
+    population = np.array([entry[2] for entry in located], dtype=np.int32)
+    large = np.flatnonzero(population >= large_city_population)
+    nearest_rows, nearest_km = _nearest_large_cities(lat, lon, large, nearest)
+
+    alias_codes = np.array(sorted(aliases), dtype="U5")
+    np.savez_compressed(
+        _ensure_parent(output_path),
+        code=codes,
+        name=np.array([row["libelle"] for row in communes], dtype=str),
+        name_key=np.array([normalize_address(row["libelle"]) for row in communes], dtype=str),
+        departement=np.array([row["dep"] for row in communes], dtype="U3"),
+        epci=np.array([epci.get(row["com"], "") for row in communes], dtype=str),
+        population=population,
+        lat=lat.astype(np.float32),
+        lon=lon.astype(np.float32),
+        nearest=nearest_rows,
+        nearest_km=nearest_km,
+        alias_code=alias_codes,
+        alias_parent=np.array([aliases[code] for code in alias_codes], dtype="U5"),
+        departement_code=np.array([row["dep"] for row in departements], dtype="U3"),
+        departement_name=np.array([row["libelle"] for row in departements], dtype=str),
+        departement_region=np.array(
+            [regions.get(row["reg"], "") for row in departements], dtype=str
+        ),
+    )
+    logger.info(
+        "Commune index %s: %d communes, %d large cities", output_path, len(codes), len(large)
+    )
+    return len(codes)
+
+
+def _ensure_parent(path: str) -> str:
+    """Create the parent directory of a path and return the path."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return path
+
+
+@dataclass(slots=True)
+class CommuneFacts:
+    """Reference facts about one commune."""
+
+    code: str
+    nom: str
+    departement_code: str
+    departement: str
+    region: str
+    intercommunalite: str
+    population: int | None
+    lat: float | None
+    lon: float | None
+    grandes_villes: list[tuple[str, float]] = field(default_factory=list)
+
+    def situation(self) -> str:
+        """Describe the commune location in French (the "Situation" block)."""
+        text = f"{self.nom} (code INSEE {self.code}) est une commune du département "
+        text += f"{self.departement} ({self.departement_code})"
+        if self.region:
+            text += f", en région {self.region}"
+        text += "."
+        if self.intercommunalite:
+            text += f" Elle appartient à l'intercommunalité {self.intercommunalite}."
+        if self.population is not None:
+            text += f" Population : {self.population:,} habitants.".replace(",", " ")
+        if self.grandes_villes:
+            cities = ", ".join(
+                f"{name} ({distance:.0f} km)" for name, distance in self.grandes_villes
+            )
+            text += f" Grandes villes les plus proches (à vol d'oiseau) : {cities}."
+        return text
+
+
+class CommuneIndex:
+    """
+    In-memory commune reference index, loaded lazily from the .npz file.
+
+    Communes are looked up by INSEE code (binary search on the sorted codes;
+    arrondissements and communes déléguées resolve to their parent commune) or by
+    unambiguous name.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the index (the file is read on first lookup).
+
+        Args:
+            path: Index file built by build_commune_index
+        """
+        self.path = path
+        self._arrays: dict[str, np.ndarray] | None = None
+        self._departements: dict[str, tuple[str, str]] = {}
+        self._names: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Whether the index file has been built."""
+        return os.path.exists(self.path)
+
+    def _load(self) -> dict[str, np.ndarray]:
+        """Read the index file once (thread-safe)."""
+        if self._arrays is None:
+            with self._lock:
+                if self._arrays is None:
+                    with np.load(self.path) as data:
+                        arrays = {name: data[name] for name in data.files}
+                    self._departements = {
+                        code: (name, region)
+                        for code, name, region in zip(
+                            arrays["departement_code"].tolist(),
+                            arrays["departement_name"].tolist(),
+                            arrays["departement_region"].tolist(),
+                        )
+                    }
+                    # Homonyms (e.g. the many Saint-Denis) are left out of name lookups
+                    keys, counts = np.unique(arrays["name_key"], return_counts=True)
+                    unique = set(keys[counts == 1].tolist())
+                    self._names = {
+                        key: row
+                        for row, key in enumerate(arrays["name_key"].tolist())
+                        if key in unique
+                    }
+                    self._arrays = arrays
+        return self._arrays
+
+    def __len__(self) -> int:
+        """Number of communes."""
+        return len(self._load()["code"])
+
+    def _row(self, code: str) -> int | None:
+        """Return the row of a commune code, or None."""
+        arrays = self._load()
+        position = np.searchsorted(arrays["alias_code"], code)
+        if position < len(arrays["alias_code"]) and arrays["alias_code"][position] == code:
+            code = str(arrays["alias_parent"][position])
+        position = np.searchsorted(arrays["code"], code)
+        if position < len(arrays["code"]) and arrays["code"][position] == code:
+            return int(position)
+        return None
+
+    def get(self, code: str) -> CommuneFacts | None:
+        """Return the facts of a commune by INSEE code, or None if unknown."""
+        row = self._row(code)
+        return None if row is None else self._facts(row)
+
+    def find(self, name: str) -> CommuneFacts | None:
+        """Return the facts of the only commune with this name, or None."""
+        self._load()
+        row = self._names.get(normalize_address(name))
+        return None if row is None else self._facts(row)
+
+    def _facts(self, row: int) -> CommuneFacts:
+        """Build the facts of a commune row."""
+        arrays = self._load()
+        departement_code = str(arrays["departement"][row])
+        departement, region = self._departements.get(departement_code, ("", ""))
+        population = int(arrays["population"][row])
+        lat, lon = float(arrays["lat"][row]), float(arrays["lon"][row])
+        cities = [
+            (str(arrays["name"][city]), round(float(distance), 1))
+            for city, distance in zip(arrays["nearest"][row], arrays["nearest_km"][row])
+            if city >= 0
+        ]
+        return CommuneFacts(
+            code=str(arrays["code"][row]),
+            nom=str(arrays["name"][row]),
+            departement_code=departement_code,
+            departement=departement,
+            region=region,
+            intercommunalite=str(arrays["epci"][row]),
+            population=population if population >= 0 else None,
+            lat=None if np.isnan(lat) else round(lat, 5),
+            lon=None if np.isnan(lon) else round(lon, 5),
+            grandes_villes=cities,
+        )
+
+
+# Global index instance (read on first lookup)
+commune_index = CommuneIndex(settings.commune_index_path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line entry point for building the commune index."""
+    parser = argparse.ArgumentParser(description="Build the local commune reference index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Build the index from COG files")
+    build_parser.add_argument("--communes", required=True, help="COG v_commune_*.csv")
+    build_parser.add_argument("--departements", required=True, help="COG v_departement_*.csv")
+    build_parser.add_argument("--regions", required=True, help="COG v_region_*.csv")
+    build_parser.add_argument("--centroids", required=True, help="Commune centroids CSV")
+    build_parser.add_argument("--epci", help="Intercommunalités CSV (CODGEO, LIBEPCI)")
+    build_parser.add_argument("--output", default=settings.commune_index_path, help="Index path")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    build_commune_index(
+        args.communes,
+        args.departements,
+        args.regions,
+        args.centroids,
+        output_path=args.output,
+        epci_path=args.epci,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,79 +4,131 @@ from typing import Any
 
 import httpx
 
-
-async def get_dvf_transactions(lat: float, lon: float, dist: int = 200) -> dict[str, Any]:
+from backend.config import settings
+from backend.utils.dvf_models import DVFResult, DVFTransaction
+from backend.utils.dvf_store import get_local_dvf_transactions
+from backend.utils.dvf_table import DVFTable
+from backend.utils.http_client import DVF, http_clients
+
+# DVFTable column -> API CQuest property
+_TABLE_COLUMNS = {
+    "id_mutation": "id_mutation",
+    "date_mutation": "date_mutation",
+    "type_local": "type_local",
+    "valeur_fonciere": "valeur_fonciere",
+    "surface_reelle_bati": "surface_relle_bati",
+    "nombre_pieces_principales": "nombre_pieces_principales",
+    "surface_terrain": "surface_terrain",
+    "lat": "lat",
+    "lon": "lon",
+}
+
+
+async def get_dvf_transactions(
+    lat: float,
+    lon: float,
+    dist: int = 200,
+    client: httpx.AsyncClient | None = None,
+    include_raw: bool = False,
+    as_table: bool = False,
+) -> DVFResult:
     """
     Get real estate transactions (DVF) data from coordinates using API CQuest DVF.
 
+    When settings.dvf_backend is "local", the query is answered by the local DVF store
+    (see backend.utils.dvf_store) instead, with the same return structure.
+
     Args:
         lat: Latitude (WGS84)
         lon: Longitude (WGS84)
         dist: Distance in meters around the point (default: 200)
+        client: Optional HTTP client (defaults to the shared pooled client)
+        include_raw: Keep the raw payloads (raw_response and each raw_properties)
+        as_table: Return the transactions as a columnar DVFTable (result.table) instead of
+            DVFTransaction objects, e.g. for vectorised indicators on large areas
 
     Returns:
-        Dictionary containing DVF data with keys:
+        DVFResult with:
         - source: str (data source information)
         - derniere_maj: str (last update date)
         - licence: str (license URL)
-        - transactions: list[dict] (list of transaction features)
-        - raw_response: dict (full API response)
+        - transactions: list[DVFTransaction] (empty with as_table)
+        - table: DVFTable | None (only with as_table)
+        - count: int (number of transactions)
+        - raw_response: dict | None (full API response, only with include_raw)
 
     Raises:
         httpx.HTTPStatusError: If the API request fails
         ValueError: If no transactions are found or response is invalid
     """
+    if settings.dvf_backend == "local":
+        return await get_local_dvf_transactions(
+            lat, lon, dist, include_raw=include_raw, as_table=as_table
+        )
 
     # TODO : Pour le moment j'utilise https://api.cquest.org/dvf qui s'arrete en 2020
     # L'api DVF+ est restreinte et il faut faire un rdv pour y accéder. https://geoservices.sogefi-sig.com/documentation.php?doc=api_dvfplus_v1.0&api=dvfplus#/D%C3%A9couvrez%20les%20routes%20Sogefi
     # On peut aussi dl les fichiers csv et les upload soi meme sur un serveur local.
+    # -> C'est ce que fait backend.utils.dvf_store (settings.dvf_backend = "local").
     # Sur le site https://explore.data.gouv.fr/fr/immobilier?onglet=carte&filtre=tous&lat=48.11645&lng=-1.68111&zoom=17.67&code=35238000AB0855&level=parcelle,
     # on peut voir qu'il appelle une api qui semble fonctionner sans authentification https://app.dvf.etalab.gouv.fr/api/mutations3/35238/000DK.
     # Ce n'est pas officiel donc à voir si on peut l'utiliser
-    url = "https://api.cquest.org/dvf"
+    url = f"{settings.dvf_api_url}/dvf"
     params = {"lat": lat, "lon": lon, "dist": dist}
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(url, params=params)
-        response.raise_for_status()
+    async with http_clients.client(DVF, client) as client:
+        response = await http_clients.send(DVF, client, "GET", url, params=params)
         data = response.json()
 
         if not data or data.get("type") != "Featurecollection":
             raise ValueError("Réponse invalide de l'API DVF")
 
         features = data.get("features", [])
+        raw_response = data if include_raw else None
+
+        if as_table:
+            properties = [feature.get("properties", {}) for feature in features]
+            columns = {
+                name: [props.get(key) for props in properties]
+                for name, key in _TABLE_COLUMNS.items()
+            }
+            return DVFResult(
+                source=data.get("source", ""),
+                derniere_maj=data.get("derniere_maj", ""),
+                licence=data.get("licence", ""),
+                raw_response=raw_response,
+                table=DVFTable.from_columns(columns),
+            )
 
         # Extract and format transaction data
         transactions = []
         for feature in features:
             props = feature.get("properties", {})
             transactions.append(
-                {
-                    "date_mutation": props.get("date_mutation"),
-                    "nature_mutation": props.get("nature_mutation"),
-                    "valeur_fonciere": props.get("valeur_fonciere"),
-                    "type_local": props.get("type_local"),
-                    "code_type_local": props.get("code_type_local"),
-                    "surface_relle_bati": props.get("surface_relle_bati"),
-                    "nombre_pieces_principales": props.get("nombre_pieces_principales"),
-                    "surface_terrain": props.get("surface_terrain"),
-                    "adresse": _format_address(props),
-                    "coordonnees": {
-                        "lat": props.get("lat"),
-                        "lon": props.get("lon"),
-                    },
-                    "raw_properties": props,
-                }
+                DVFTransaction(
+                    date_mutation=props.get("date_mutation"),
+                    nature_mutation=props.get("nature_mutation"),
+                    valeur_fonciere=props.get("valeur_fonciere"),
+                    type_local=props.get("type_local"),
+                    code_type_local=props.get("code_type_local"),
+                    surface_reelle_bati=props.get("surface_relle_bati"),
+                    nombre_pieces_principales=props.get("nombre_pieces_principales"),
+                    surface_terrain=props.get("surface_terrain"),
+                    adresse=_format_address(props),
+                    lat=props.get("lat"),
+                    lon=props.get("lon"),
+                    id_mutation=props.get("id_mutation"),
+                    raw_properties=props if include_raw else None,
+                )
             )
 
-        return {
-            "source": data.get("source", ""),
-            "derniere_maj": data.get("derniere_maj", ""),
-            "licence": data.get("licence", ""),
-            "transactions": transactions,
-            "count": len(transactions),
-            "raw_response": data,
-        }
+        return DVFResult(
+            source=data.get("source", ""),
+            derniere_maj=data.get("derniere_maj", ""),
+            licence=data.get("licence", ""),
+            transactions=transactions,
+            raw_response=raw_response,
+        )
 
 
 def _format_address(properties: dict[str, Any]) -> str:
@@ -0,0 +1,68 @@
+"""Compact typed models for DVF results."""
+
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from backend.utils.dvf_table import DVFTable
+
+
+@dataclass(slots=True)
+class DVFTransaction:
+    """One DVF transaction (a mutation row), without per-instance __dict__."""
+
+    date_mutation: str | None
+    nature_mutation: str | None
+    valeur_fonciere: float | None
+    type_local: str | None
+    code_type_local: int | None
+    surface_reelle_bati: float | None
+    nombre_pieces_principales: int | None
+    surface_terrain: float | None
+    adresse: str
+    lat: float | None
+    lon: float | None
+    distance_m: float | None = None
+    id_mutation: str | None = None
+    raw_properties: dict[str, Any] | None = None
+
+
+@dataclass(slots=True)
+class DVFResult:
+    """
+    Transactions returned by get_dvf_transactions, with their source metadata.
+
+    Transactions are held either as DVFTransaction objects (transactions) or, when
+    requested with as_table, as a columnar DVFTable (table) with transactions left empty.
+    """
+
+    source: str
+    derniere_maj: str
+    licence: str
+    transactions: list[DVFTransaction] = field(default_factory=list)
+    search_mode: str = "radius"
+    raw_response: dict[str, Any] | None = None
+    table: DVFTable | None = None
+
+    @property
+    def count(self) -> int:
+        """Number of transactions."""
+        return len(self.table) if self.table is not None else len(self.transactions)
+
+    def to_table(self) -> DVFTable:
+        """Return the transactions as a columnar DVFTable."""
+        if self.table is not None:
+            return self.table
+        return DVFTable.from_transactions(self.transactions)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a JSON-serialisable dict (including count)."""
+        return {
+            "source": self.source,
+            "derniere_maj": self.derniere_maj,
+            "licence": self.licence,
+            "transactions": [asdict(transaction) for transaction in self.transactions],
+            "search_mode": self.search_mode,
+            "raw_response": self.raw_response,
+            "table": self.table.to_dict() if self.table is not None else None,
+            "count": self.count,
+        }
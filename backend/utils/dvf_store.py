@@ -0,0 +1,348 @@
+"""Local DVF transaction store built from the geolocated DVF bulk CSV files.
+
+The official "geo-dvf" files (https://files.data.gouv.fr/geo-dvf/latest/csv/) are streamed
+into a SQLite database with typed columns, so radius queries are answered locally without
+any network round trip. Ingestion also builds one R*Tree spatial index per département.
+
+Usage:
+    python -m backend.utils.dvf_store ingest 2022/full.csv.gz 2023/full.csv.gz
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import logging
+import os
+import sqlite3
+from collections.abc import Iterator
+from typing import Any
+
+from backend.config import settings
+from backend.utils.dvf_models import DVFResult, DVFTransaction
+from backend.utils.dvf_table import DVFTable
+from backend.utils.sqlite_store import SQLiteStore, bounding_box, haversine_m, overlaps
+
+logger = logging.getLogger(__name__)
+
+# (column name, SQLite type, parser applied to the CSV value)
+_COLUMNS: list[tuple[str, str, Any]] = [
+    ("id_mutation", "TEXT", str),
+    ("date_mutation", "TEXT", str),
+    ("nature_mutation", "TEXT", str),
+    ("valeur_fonciere", "REAL", float),
+    ("adresse_numero", "TEXT", str),
+    ("adresse_suffixe", "TEXT", str),
+    ("adresse_nom_voie", "TEXT", str),
+    ("code_postal", "TEXT", str),
+    ("code_commune", "TEXT", str),
+    ("nom_commune", "TEXT", str),
+    ("code_departement", "TEXT", str),
+    ("id_parcelle", "TEXT", str),
+    ("code_type_local", "INTEGER", int),
+    ("type_local", "TEXT", str),
+    ("surface_reelle_bati", "REAL", float),
+    ("nombre_pieces_principales", "INTEGER", int),
+    ("surface_terrain", "REAL", float),
+    ("longitude", "REAL", float),
+    ("latitude", "REAL", float),
+]
+COLUMN_NAMES = [name for name, _, _ in _COLUMNS]
+_COLUMN_DEFINITIONS = ", ".join(f"{name} {sql_type}" for name, sql_type, _ in _COLUMNS)
+
+_INGEST_BATCH_SIZE = 50_000
+
+
+def _rtree_table(code_departement: str) -> str:
+    """Return the name of a département's R*Tree table."""
+    if not code_departement.isalnum():
+        code_departement = "inconnu"
+    return f"rtree_dep_{code_departement}"
+
+
+def _parse_value(parser: Any, value: str | None) -> Any:
+    """Parse one CSV cell, mapping empty or malformed values to None."""
+    if value is None or value == "":
+        return None
+    try:
+        return parser(value)
+    except ValueError:
+        return None
+
+
+def _iter_csv_rows(path: str) -> Iterator[tuple[Any, ...]]:
+    """Stream typed rows from a geo-dvf CSV file (plain or gzip-compressed)."""
+    raw = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+    with raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as text:
+        for record in csv.DictReader(text):
+            row = tuple(_parse_value(parser, record.get(name)) for name, _, parser in _COLUMNS)
+            # Rows without coordinates can never match a radius query
+            if row[-1] is None or row[-2] is None:
+                continue
+            yield row
+
+
+def _format_store_address(row: dict[str, Any]) -> str:
+    """Format an address from a stored mutation row."""
+    parts = []
+    numero = " ".join(
+        str(part) for part in (row.get("adresse_numero"), row.get("adresse_suffixe")) if part
+    )
+    if numero:
+        parts.append(numero)
+    for key in ("adresse_nom_voie", "code_postal", "nom_commune"):
+        if value := row.get(key):
+            parts.append(value)
+
+    return ", ".join(parts) if parts else "Adresse non disponible"
+
+
+def row_to_transaction(row: dict[str, Any], include_raw: bool = False) -> DVFTransaction:
+    """Convert a stored mutation row to the transaction returned by get_dvf_transactions."""
+    return DVFTransaction(
+        date_mutation=row["date_mutation"],
+        nature_mutation=row["nature_mutation"],
+        valeur_fonciere=row["valeur_fonciere"],
+        type_local=row["type_local"],
+        code_type_local=row["code_type_local"],
+        surface_reelle_bati=row["surface_reelle_bati"],
+        nombre_pieces_principales=row["nombre_pieces_principales"],
+        surface_terrain=row["surface_terrain"],
+        adresse=_format_store_address(row),
+        lat=row["latitude"],
+        lon=row["longitude"],
+        distance_m=row.get("distance_m"),
+        id_mutation=row["id_mutation"],
+        raw_properties=row if include_raw else None,
+    )
+
+
+class DVFStore(SQLiteStore):
+    """
+    SQLite-backed store of DVF mutations with typed columns.
+
+    geo-dvf files are all named full.csv.gz, so they are recorded as ingested under
+    their year directory and file name.
+    """
+
+    SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS mutations ({_COLUMN_DEFINITIONS});
+        -- Lets _index_rows_after select the new rows of one département
+        CREATE INDEX IF NOT EXISTS idx_mutations_departement
+            ON mutations (code_departement);
+        CREATE TABLE IF NOT EXISTS departements (
+            code TEXT PRIMARY KEY,
+            min_lat REAL,
+            max_lat REAL,
+            min_lon REAL,
+            max_lon REAL
+        );
+    """
+    SOURCE = "DVF"
+    ROWS = "DVF rows"
+
+    def _file_key(self, path: str) -> str:
+        """Year directory and name of a geo-dvf file."""
+        return os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+
+    def _prepare_ingest(self, connection: sqlite3.Connection) -> None:
+        """Bulk-load settings: the store is rebuilt from the CSVs if ingestion is interrupted."""
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+
+    def _ingest_file(self, connection: sqlite3.Connection, path: str) -> int:
+        """Stream the rows of one geo-dvf CSV file (".csv" or ".csv.gz") and index them."""
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        insert = f"INSERT INTO mutations ({', '.join(COLUMN_NAMES)}) VALUES ({placeholders})"
+        count = 0
+        batch: list[tuple[Any, ...]] = []
+        last_rowid = connection.execute("SELECT MAX(rowid) FROM mutations").fetchone()[0]
+        for row in _iter_csv_rows(path):
+            batch.append(row)
+            if len(batch) >= _INGEST_BATCH_SIZE:
+                connection.executemany(insert, batch)
+                count += len(batch)
+                batch.clear()
+        if batch:
+            connection.executemany(insert, batch)
+            count += len(batch)
+        self._index_rows_after(connection, last_rowid or 0)
+        return count
+
+    def _index_rows_after(self, connection: sqlite3.Connection, last_rowid: int) -> None:
+        """
+        Add the mutations inserted after last_rowid to their département's spatial index.
+
+        Each département has its own R*Tree over mutation coordinates, and its bounding
+        box is kept in the departements table so queries only visit the départements
+        their search area overlaps.
+        """
+        codes = [
+            code
+            for (code,) in connection.execute(
+                "SELECT DISTINCT code_departement FROM mutations WHERE rowid > ?", (last_rowid,)
+            )
+        ]
+        for code in codes:
+            table = _rtree_table(code or "")
+            connection.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+                "USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+            )
+            # Filled in SQL, without loading the rows into Python
+            connection.execute(
+                f"INSERT INTO {table} "
+                "SELECT rowid, latitude, latitude, longitude, longitude FROM mutations "
+                "WHERE code_departement IS ? AND rowid > ?",
+                (code, last_rowid),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO departements "
+                f"SELECT ?, MIN(min_lat), MAX(max_lat), MIN(min_lon), MAX(max_lon) FROM {table}",
+                (code or "",),
+            )
+
+    def _departements_in(self, bbox: tuple[float, float, float, float]) -> list[str]:
+        """Return the codes of the départements whose bounding box overlaps bbox."""
+        condition, params = overlaps(bbox)
+        cursor = self._connect().execute(f"SELECT code FROM departements WHERE {condition}", params)
+        return [code for (code,) in cursor]
+
+    def query_radius(self, lat: float, lon: float, dist: float) -> list[dict[str, Any]]:
+        """
+        Return every mutation within dist metres of a point.
+
+        Candidates come from the R*Trees of the départements overlapping the search area
+        and are then filtered on their exact haversine distance.
+
+        Args:
+            lat: Latitude (WGS84)
+            lon: Longitude (WGS84)
+            dist: Radius in metres
+
+        Returns:
+            List of mutation rows (dicts keyed by column name, plus distance_m), closest first
+        """
+        bbox = bounding_box(lat, lon, dist)
+        condition, params = overlaps(bbox, "r")
+        connection = self._connect()
+        columns = ", ".join(f"m.{name}" for name in COLUMN_NAMES)
+
+        matches = []
+        for code in self._departements_in(bbox):
+            cursor = connection.execute(
+                f"SELECT {columns} FROM {_rtree_table(code)} AS r "
+                f"JOIN mutations AS m ON m.rowid = r.id WHERE {condition}",
+                params,
+            )
+            for record in cursor:
+                distance = haversine_m(lat, lon, record["latitude"], record["longitude"])
+                if distance <= dist:
+                    row = dict(record)
+                    row["distance_m"] = distance
+                    matches.append(row)
+
+        matches.sort(key=lambda row: row["distance_m"])
+        return matches
+
+    def query_nearest(
+        self, lat: float, lon: float, k: int, max_dist: float = 50_000
+    ) -> list[dict[str, Any]]:
+        """
+        Return the k mutations nearest to a point.
+
+        The search radius doubles until it holds at least k mutations (or reaches
+        max_dist): every mutation outside the radius is farther than every mutation inside,
+        so the k closest candidates are the exact k nearest neighbours.
+
+        Args:
+            lat: Latitude (WGS84)
+            lon: Longitude (WGS84)
+            k: Number of mutations to return
+            max_dist: Maximum search radius in metres
+
+        Returns:
+            Up to k mutation rows (dicts keyed by column name, plus distance_m), closest first
+        """
+        dist = 250.0
+        while True:
+            dist = min(dist, max_dist)
+            matches = self.query_radius(lat, lon, dist)
+            if len(matches) >= k or dist >= max_dist:
+                return matches[:k]
+            dist *= 2
+
+
+async def get_local_dvf_transactions(
+    lat: float,
+    lon: float,
+    dist: int = 200,
+    store: DVFStore | None = None,
+    include_raw: bool = False,
+    as_table: bool = False,
+) -> DVFResult:
+    """
+    Get DVF transactions around a point from the local store.
+
+    Returns the same structure as get_dvf_transactions. When the radius holds no mutation
+    (sparse rural communes), the settings.dvf_nearest_fallback nearest mutations are returned
+    instead and search_mode is "nearest".
+
+    Args:
+        lat: Latitude (WGS84)
+        lon: Longitude (WGS84)
+        dist: Distance in meters around the point (default: 200)
+        store: Optional store (defaults to the store configured in settings)
+        include_raw: Keep each stored row as the transaction's raw_properties
+        as_table: Return the transactions as a columnar DVFTable (result.table)
+
+    Raises:
+        ValueError: If the local store has not been built
+    """
+    store = store or dvf_store
+    if not store.exists():
+        raise ValueError(f"Base DVF locale introuvable: {store.path}")
+
+    def _query() -> tuple[list[dict[str, Any]], str, str]:
+        rows = store.query_radius(lat, lon, dist)
+        if rows or settings.dvf_nearest_fallback <= 0:
+            return rows, "radius", store.last_update()
+        return (
+            store.query_nearest(lat, lon, settings.dvf_nearest_fallback),
+            "nearest",
+            store.last_update(),
+        )
+
+    rows, search_mode, last_update = await asyncio.to_thread(_query)
+    return DVFResult(
+        source="DVF géolocalisées (base locale)",
+        derniere_maj=last_update,
+        licence="https://www.etalab.gouv.fr/licence-ouverte-open-licence",
+        transactions=[] if as_table else [row_to_transaction(row, include_raw) for row in rows],
+        search_mode=search_mode,
+        table=DVFTable.from_rows(rows) if as_table else None,
+    )
+
+
+# Global store configured from settings
+dvf_store = DVFStore(settings.dvf_store_path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line entry point for building the local DVF store."""
+    parser = argparse.ArgumentParser(description="Build the local DVF transaction store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest geo-dvf CSV files")
+    ingest_parser.add_argument("files", nargs="+", help="geo-dvf CSV files (.csv or .csv.gz)")
+    ingest_parser.add_argument("--store", default=settings.dvf_store_path, help="SQLite path")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = DVFStore(args.store)
+    total = store.ingest(args.files)
+    logger.info("DVF store %s: %d rows inserted", args.store, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Columnar (NumPy-backed) DVF transaction table."""
+
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from backend.utils.dvf_models import DVFTransaction
+
+# Fixed categories keep type_local codes stable across tables
+TYPE_LOCAL_CATEGORIES = (
+    "Appartement",
+    "Maison",
+    "Dépendance",
+    "Local industriel. commercial ou assimilé",
+)
+DWELLING_TYPES = ("Appartement", "Maison")
+
+_FLOAT_COLUMNS = (
+    "valeur_fonciere",
+    "surface_reelle_bati",
+    "nombre_pieces_principales",
+    "surface_terrain",
+    "lat",
+    "lon",
+)
+
+
+def _floats(values: Iterable[Any]) -> np.ndarray:
+    """Build a float64 array, mapping None to NaN."""
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+class DVFTable:
+    """
+    DVF transactions stored column by column in NumPy arrays.
+
+    Columns:
+        id_mutation: str array ("" when unknown)
+        date_mutation: datetime64[D] array (NaT when unknown)
+        type_local: int8 codes into TYPE_LOCAL_CATEGORIES (-1 for other or unknown)
+        valeur_fonciere, surface_reelle_bati, nombre_pieces_principales, surface_terrain,
+        lat, lon: float64 arrays (NaN when unknown)
+    """
+
+    __slots__ = (
+        "id_mutation",
+        "date_mutation",
+        "type_local",
+        "valeur_fonciere",
+        "surface_reelle_bati",
+        "nombre_pieces_principales",
+        "surface_terrain",
+        "lat",
+        "lon",
+    )
+
+    def __init__(self, **columns: np.ndarray):
+        """Initialize the table from equally long column arrays."""
+        for name in self.__slots__:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def from_columns(cls, columns: dict[str, list[Any]]) -> "DVFTable":
+        """
+        Build a table from plain Python column lists.
+
+        Args:
+            columns: Lists keyed by column name (type_local as labels, dates as ISO strings)
+        """
+        codes = {label: code for code, label in enumerate(TYPE_LOCAL_CATEGORIES)}
+        arrays = {name: _floats(columns[name]) for name in _FLOAT_COLUMNS}
+        arrays["id_mutation"] = np.array(
+            [value or "" for value in columns["id_mutation"]], dtype=str
+        )
+        arrays["date_mutation"] = np.array(
+            [value or "NaT" for value in columns["date_mutation"]], dtype="datetime64[D]"
+        )
+        arrays["type_local"] = np.array(
+            [codes.get(value, -1) for value in columns["type_local"]], dtype=np.int8
+        )
+        return cls(**arrays)
+
+    @classmethod
+    def from_transactions(cls, transactions: list["DVFTransaction"]) -> "DVFTable":
+        """Build a table from DVFTransaction instances."""
+        names = ("id_mutation", "date_mutation", "type_local", *_FLOAT_COLUMNS)
+        return cls.from_columns(
+            {name: [getattr(transaction, name) for transaction in transactions] for name in names}
+        )
+
+    @classmethod
+    def from_rows(cls, rows: list[dict[str, Any]]) -> "DVFTable":
+        """Build a table from local store rows (see backend.utils.dvf_store)."""
+        aliases = {"lat": "latitude", "lon": "longitude"}
+        names = ("id_mutation", "date_mutation", "type_local", *_FLOAT_COLUMNS)
+        return cls.from_columns(
+            {name: [row[aliases.get(name, name)] for row in rows] for name in names}
+        )
+
+    def __len__(self) -> int:
+        """Number of transactions."""
+        return len(self.valeur_fonciere)
+
+    @property
+    def year(self) -> np.ndarray:
+        """Mutation year (int, -1 when the date is unknown)."""
+        years = self.date_mutation.astype("datetime64[Y]").astype(np.int64) + 1970
+        return np.where(np.isnat(self.date_mutation), -1, years)
+
+    def filter(self, mask: np.ndarray) -> "DVFTable":
+        """Return the rows selected by a boolean mask."""
+        return DVFTable(**{name: getattr(self, name)[mask] for name in self.__slots__})
+
+    def to_dict(self) -> dict[str, list[Any]]:
+        """Return JSON-serialisable column lists (type_local as labels, None for missing)."""
+        labels = np.array((*TYPE_LOCAL_CATEGORIES, None), dtype=object)
+        data: dict[str, list[Any]] = {
+            "id_mutation": self.id_mutation.tolist(),
+            "date_mutation": [None if np.isnat(date) else str(date) for date in self.date_mutation],
+            "type_local": labels[self.type_local].tolist(),
+        }
+        for name in _FLOAT_COLUMNS:
+            column = getattr(self, name).astype(object)
+            column[np.isnan(getattr(self, name))] = None
+            data[name] = column.tolist()
+        return data
@@ -0,0 +1,510 @@
+"""Shared pooled HTTP clients for upstream APIs (API Adresse, API Carto, DVF).
+
+Requests go through HTTPClientRegistry.send, which applies each upstream's policy: a
+client-side token bucket, jittered retries on 429/5xx and network errors (bounded by a
+retry budget so retries cannot amplify an overload), a circuit breaker, and optionally a
+hedged second GET when the first is slower than the upstream's p95 latency.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import httpx
+
+from backend.config import settings
+from backend.utils.metrics import increment, timed
+
+logger = logging.getLogger(__name__)
+
+API_ADRESSE = "api_adresse"
+API_CARTO = "api_carto"
+DVF = "dvf"
+
+UPSTREAMS = (API_ADRESSE, API_CARTO, DVF)
+
+# Responses worth retrying: throttled, or a transient server-side failure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Latency samples kept per upstream, and needed before hedging
+_LATENCY_WINDOW = 200
+_MIN_LATENCY_SAMPLES = 20
+
+
+def _upstream_timeout(upstream: str) -> float:
+    """Return the configured read timeout (in seconds) for an upstream."""
+    return {
+        API_ADRESSE: settings.api_adresse_timeout,
+        API_CARTO: settings.api_carto_timeout,
+        DVF: settings.dvf_api_timeout,
+    }[upstream]
+
+
+def _upstream_rate_limit(upstream: str) -> float:
+    """Return the configured request rate (per second) for an upstream."""
+    return {
+        API_ADRESSE: settings.api_adresse_rate_limit,
+        API_CARTO: settings.api_carto_rate_limit,
+        DVF: settings.dvf_api_rate_limit,
+    }[upstream]
+
+
+def build_client(upstream: str) -> httpx.AsyncClient:
+    """
+    Build an AsyncClient configured for one upstream host.
+
+    Each upstream gets its own connection pool, so the pool limits act as per-host limits.
+
+    Args:
+        upstream: Upstream name, one of UPSTREAMS
+
+    Returns:
+        A new httpx.AsyncClient (the caller is responsible for closing it)
+    """
+    timeout = httpx.Timeout(_upstream_timeout(upstream), connect=settings.http_connect_timeout)
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections_per_host,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(http2=settings.http2_enabled, timeout=timeout, limits=limits)
+
+
+class AsyncRateLimiter:
+    """
+    Space out requests to at most `rate` per second.
+
+    The limiter keeps no asyncio primitive, so one instance can be shared by tasks running
+    on different event loops (e.g. successive test cases).
+    """
+
+    def __init__(self, rate: float):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Maximum number of acquisitions per second (<= 0 disables the limit)
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        """Wait until the next request slot is available."""
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class TokenBucket:
+    """
+    Allow bursts of `burst` requests, then `rate` per second.
+
+    The rate is adaptive: throttle() halves it (down to a tenth of the configured rate)
+    when the upstream answers 429, and each successful request wins back 5% of it. Like
+    AsyncRateLimiter, the bucket keeps no asyncio primitive.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Refill rate in tokens per second (<= 0 disables the limit)
+            burst: Bucket capacity
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Take a token, waiting for it if the bucket is empty."""
+        if self.max_rate <= 0:
+            return
+        self._refill()
+        # Tokens go negative to queue waiters in arrival order
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right away."""
+        if self.max_rate <= 0:
+            return True
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def throttle(self) -> None:
+        """Halve the rate after a 429."""
+        if self.max_rate > 0:
+            self._refill()
+            self.rate = max(self.max_rate / 10, self.rate / 2)
+
+    def recover(self) -> None:
+        """Raise the rate back towards the configured one after a success."""
+        if self.max_rate > 0 and self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RetryBudget:
+    """
+    Allow extra attempts (retries and hedges) for at most `ratio` of the requests.
+
+    Each request deposits `ratio` tokens and each extra attempt withdraws one, so when an
+    upstream fails every request, retries add at most `ratio` to the load instead of
+    multiplying it. The balance starts at (and is capped to) `reserve` for low traffic.
+    """
+
+    def __init__(self, ratio: float, reserve: float = 10.0):
+        """
+        Initialize the budget.
+
+        Args:
+            ratio: Extra attempts allowed per request
+            reserve: Maximum balance, also the initial one
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = reserve
+
+    def deposit(self) -> None:
+        """Credit one request."""
+        self.balance = min(self.reserve, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one extra attempt from the budget, if there is one left."""
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream after `threshold` consecutive failures.
+
+    The circuit then stays open for `reset_timeout` seconds, after which one probe request
+    is let through (half-open): a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        """
+        Initialize a closed circuit.
+
+        Args:
+            threshold: Consecutive failures (network errors, 5xx) opening the circuit
+            reset_timeout: Seconds before a probe request is allowed
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        """ "closed", "open" or "half_open"."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (one probe at a time when half-open)."""
+        state = self.state
+        if state != "half_open":
+            return state == "closed"
+        now = time.monotonic()
+        # A probe that never reported back (cancelled) is replaced after reset_timeout
+        if self._probe_at is not None and now - self._probe_at < self.reset_timeout:
+            return False
+        self._probe_at = now
+        return True
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        self.failures = 0
+        self.opened_at = self._probe_at = None
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold or after a failed probe."""
+        self.failures += 1
+        self._probe_at = None
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request to an upstream whose circuit is open."""
+
+
+class UpstreamPolicy:
+    """Rate limit, retry budget, circuit breaker and latency window of one upstream."""
+
+    def __init__(self, upstream: str):
+        """
+        Initialize the policy from settings.
+
+        Args:
+            upstream: Upstream name, one of UPSTREAMS
+        """
+        self.upstream = upstream
+        self.bucket = TokenBucket(_upstream_rate_limit(upstream), settings.http_rate_limit_burst)
+        self.budget = RetryBudget(settings.http_retry_budget_ratio)
+        self.breaker = CircuitBreaker(
+            settings.http_circuit_failure_threshold, settings.http_circuit_reset_timeout
+        )
+        # Durations of the recent successful attempts, in seconds
+        self.latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def hedge_delay(self) -> float | None:
+        """Delay before hedging a request (the p95 latency), None without enough samples."""
+        if len(self.latencies) < _MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return max(settings.http_hedge_min_delay, p95)
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Return the Retry-After delay of a response in seconds (HTTP dates are ignored)."""
+    try:
+        return max(0.0, float(response.headers["retry-after"]))
+    except (KeyError, ValueError):
+        return None
+
+
+def _backoff(attempt: int, retry_after: float | None = None) -> float | None:
+    """
+    Delay before retry number `attempt + 1`: full jitter over an exponential backoff.
+
+    Returns:
+        The delay in seconds, or None when the upstream asks to wait longer than
+        settings.http_retry_max_delay (the request is not retried)
+    """
+    ceiling = min(settings.http_retry_max_delay, settings.http_retry_base_delay * 2**attempt)
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        if retry_after > settings.http_retry_max_delay:
+            return None
+        delay = max(delay, retry_after)
+    return delay
+
+
+class HTTPClientRegistry:
+    """Application-scoped registry of pooled AsyncClients, one per upstream."""
+
+    def __init__(self):
+        """Initialize an empty (closed) registry."""
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._policies: dict[str, UpstreamPolicy] = {}
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the shared clients are currently open."""
+        return bool(self._clients)
+
+    def open(self) -> None:
+        """Create the shared clients. Calling it on an open registry is a no-op."""
+        for upstream in UPSTREAMS:
+            if upstream not in self._clients:
+                self._clients[upstream] = build_client(upstream)
+
+    async def aclose(self) -> None:
+        """Close every shared client and release their connections."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, upstream: str) -> httpx.AsyncClient | None:
+        """Return the shared client for an upstream, or None if the registry is closed."""
+        return self._clients.get(upstream)
+
+    def policy(self, upstream: str) -> UpstreamPolicy:
+        """Return the call policy of an upstream, created from settings on first use."""
+        policy = self._policies.get(upstream)
+        if policy is None:
+            policy = self._policies[upstream] = UpstreamPolicy(upstream)
+        return policy
+
+    def reset_policies(self) -> None:
+        """Forget rate limits, retry budgets, circuit states and latencies (after tests)."""
+        self._policies.clear()
+
+    @asynccontextmanager
+    async def client(
+        self, upstream: str, client: httpx.AsyncClient | None = None
+    ) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        Yield the client to use for a request to an upstream.
+
+        Resolution order: the explicitly injected client, then the shared pooled client,
+        then a short-lived client closed on exit (for scripts and notebooks that run
+        outside the FastAPI lifespan). The block is timed as one upstream_request (see
+        backend.utils.metrics), labelled with the upstream.
+
+        Args:
+            upstream: Upstream name, one of UPSTREAMS
+            client: Optional client injected by the caller
+
+        Yields:
+            An httpx.AsyncClient
+        """
+        async with timed("upstream_request", upstream=upstream):
+            if client is not None:
+                yield client
+                return
+
+            shared = self._clients.get(upstream)
+            if shared is not None:
+                yield shared
+                return
+
+            async with build_client(upstream) as one_shot:
+                yield one_shot
+
+    async def send(
+        self, upstream: str, client: httpx.AsyncClient, method: str, url: str, **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Send a request to an upstream under its policy.
+
+        The request waits for a token of the upstream's bucket, and is retried with a
+        jittered exponential backoff (honouring Retry-After) on network errors and
+        RETRY_STATUSES, up to settings.http_max_retries times and within the retry
+        budget. With settings.http_hedging_enabled, a GET still running after the
+        upstream's p95 latency is sent a second time and the first answer wins.
+
+        Args:
+            upstream: Upstream name, one of UPSTREAMS
+            client: Client to send the request with (see client())
+            method: HTTP method
+            url: Request URL
+            **kwargs: Passed to httpx.AsyncClient.request (params, files, data...)
+
+        Returns:
+            The successful response
+
+        Raises:
+            httpx.HTTPStatusError: If the last response has an error status
+            httpx.TransportError: If the last attempt failed on the network
+            CircuitOpenError: If the upstream's circuit is open
+        """
+        policy = self.policy(upstream)
+        policy.budget.deposit()
+        attempt = 0
+        while True:
+            if not policy.breaker.allow():
+                increment("upstream_rejected", upstream=upstream)
+                raise CircuitOpenError(
+                    f"Circuit ouvert pour {upstream}, requête non envoyée",
+                    request=httpx.Request(method, url),
+                )
+            await policy.bucket.acquire()
+
+            retry_after = None
+            try:
+                if method == "GET" and settings.http_hedging_enabled:
+                    response = await self._hedged(policy, client, method, url, kwargs)
+                else:
+                    response = await self._attempt(policy, client, method, url, kwargs)
+            except httpx.TransportError as error:
+                policy.breaker.record_failure()
+                failure: Exception | None = error
+                reason = type(error).__name__
+            else:
+                if response.status_code == 429:
+                    policy.bucket.throttle()
+                    retry_after = _retry_after(response)
+                elif response.status_code >= 500:
+                    policy.breaker.record_failure()
+                else:
+                    policy.breaker.record_success()
+                    policy.bucket.recover()
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                failure, reason = None, str(response.status_code)
+
+            delay = _backoff(attempt, retry_after)
+            if (
+                attempt >= settings.http_max_retries
+                or delay is None
+                or not policy.budget.withdraw()
+            ):
+                if failure is not None:
+                    raise failure
+                response.raise_for_status()
+            increment("upstream_retries", upstream=upstream, reason=reason)
+            logger.debug("Retrying %s %s in %.2fs (%s)", method, url, delay, reason)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    async def _attempt(
+        policy: UpstreamPolicy,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        kwargs: dict[str, Any],
+    ) -> httpx.Response:
+        """Send one attempt, recording its latency when the upstream answered normally."""
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        if response.status_code not in RETRY_STATUSES:
+            policy.latencies.append(time.perf_counter() - start)
+        return response
+
+    async def _hedged(
+        self,
+        policy: UpstreamPolicy,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        kwargs: dict[str, Any],
+    ) -> httpx.Response:
+        """Send an attempt, and a second one if the first outlasts the p95 latency."""
+        attempts = [asyncio.ensure_future(self._attempt(policy, client, method, url, kwargs))]
+        try:
+            delay = policy.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                # Hedges are extra load: they need a free token and the retry budget
+                if not done and policy.bucket.try_acquire() and policy.budget.withdraw():
+                    increment("upstream_hedges", upstream=policy.upstream)
+                    attempts.append(
+                        asyncio.ensure_future(self._attempt(policy, client, method, url, kwargs))
+                    )
+
+            error: httpx.TransportError | None = None
+            for finished in asyncio.as_completed(attempts):
+                try:
+                    return await finished
+                except httpx.TransportError as e:
+                    error = error or e
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+
+# Global registry, opened and closed by the FastAPI lifespan
+http_clients = HTTPClientRegistry()
@@ -0,0 +1,188 @@
+"""Vectorised DVF price indicators: price per m², medians and quantiles by segment.
+
+Every statistic is computed on NumPy arrays: grouped quantiles come from a single sort of
+the (group, price) pairs, so the cost does not depend on the number of segments and
+whole communes (100k+ mutations) are analysed in well under a second.
+"""
+
+from typing import Any
+
+import numpy as np
+
+from backend.utils.dvf_table import DWELLING_TYPES, TYPE_LOCAL_CATEGORIES, DVFTable
+
+QUANTILES = (0.25, 0.5, 0.75)
+MAX_ROOMS_BUCKET = 5  # 5 rooms and more share the "5+" bucket
+
+
+def grouped_quantiles(
+    keys: np.ndarray, values: np.ndarray, quantiles: tuple[float, ...] = QUANTILES
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute per-group counts, means and quantiles in one sort.
+
+    Quantiles use linear interpolation, like numpy.quantile's default method.
+
+    Args:
+        keys: Integer group key of each value
+        values: Values (no NaN)
+        quantiles: Quantiles to compute, in [0, 1]
+
+    Returns:
+        Tuple (unique keys, counts, means, quantiles) where quantiles has one row per
+        group and one column per requested quantile
+    """
+    if len(values) == 0:
+        empty = np.empty(0)
+        return (
+            empty.astype(keys.dtype),
+            empty.astype(np.int64),
+            empty,
+            np.empty((0, len(quantiles))),
+        )
+
+    order = np.lexsort((values, keys))
+    sorted_keys, sorted_values = keys[order], values[order]
+    groups, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+
+    positions = starts[:, None] + np.asarray(quantiles)[None, :] * (counts[:, None] - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+    values_q = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+    means = np.add.reduceat(sorted_values, starts) / counts
+    return groups, counts, means, values_q
+
+
+def _stats(count: int, mean: float, values_q: np.ndarray) -> dict[str, Any]:
+    """Format the statistics of one segment."""
+    q1, median, q3 = values_q
+    return {
+        "nb_ventes": int(count),
+        "moyenne": round(float(mean), 2),
+        "q1": round(float(q1), 2),
+        "mediane": round(float(median), 2),
+        "q3": round(float(q3), 2),
+    }
+
+
+def dwelling_price_per_m2(
+    table: DVFTable, single_dwelling_only: bool = True
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Select dwelling sales with a usable price per m².
+
+    A DVF mutation selling several dwellings repeats its total valeur_fonciere on every
+    row, so such mutations are dropped when single_dwelling_only is True.
+
+    Args:
+        table: DVF transactions
+        single_dwelling_only: Keep only mutations with exactly one dwelling row
+
+    Returns:
+        Tuple (boolean mask of the selected rows, price per m² of the selected rows)
+    """
+    dwelling_codes = [TYPE_LOCAL_CATEGORIES.index(label) for label in DWELLING_TYPES]
+    mask = np.isin(table.type_local, dwelling_codes)
+
+    if single_dwelling_only:
+        ids = table.id_mutation[mask]
+        _, inverse, counts = np.unique(ids, return_inverse=True, return_counts=True)
+        # Rows without a mutation id cannot be grouped and are kept as they are
+        single = (counts[inverse.reshape(-1)] == 1) | (ids == "")
+        mask[mask] = single
+
+    with np.errstate(invalid="ignore"):
+        mask &= (table.surface_reelle_bati > 0) & (table.valeur_fonciere > 0)
+    price = table.valeur_fonciere[mask] / table.surface_reelle_bati[mask]
+    return mask, price
+
+
+def compute_price_indicators(
+    table: DVFTable, iqr_factor: float = 1.5, single_dwelling_only: bool = True
+) -> dict[str, Any]:
+    """
+    Compute price-per-m² indicators for dwellings (apartments and houses).
+
+    Outliers are removed per type_local with Tukey fences
+    [Q1 - iqr_factor * IQR, Q3 + iqr_factor * IQR].
+
+    Args:
+        table: DVF transactions (see DVFResult.to_table or get_dvf_transactions(as_table=True))
+        iqr_factor: Width of the outlier fences, in interquartile ranges (<= 0 disables)
+        single_dwelling_only: Drop mutations selling several dwellings at once
+
+    Returns:
+        Dictionary with keys:
+        - nb_transactions: int (rows in the table)
+        - nb_ventes_retenues: int (dwelling sales used for the indicators)
+        - nb_outliers: int (sales removed as outliers)
+        - prix_m2_moyen, prix_m2_median, prix_m2_q1, prix_m2_q3: float | None
+        - par_type_local: dict (statistics by type_local)
+        - par_nombre_pieces: dict (statistics by type_local, then rooms "1".."5+")
+        - par_annee: dict (statistics by type_local, then year)
+    """
+    mask, price = dwelling_price_per_m2(table, single_dwelling_only)
+    types = table.type_local[mask].astype(np.int64)
+    rooms = table.nombre_pieces_principales[mask]
+    years = table.year[mask]
+
+    outliers = 0
+    if iqr_factor > 0 and len(price):
+        groups, _, _, values_q = grouped_quantiles(types, price, (0.25, 0.75))
+        position = np.searchsorted(groups, types)
+        iqr = values_q[:, 1] - values_q[:, 0]
+        low = (values_q[:, 0] - iqr_factor * iqr)[position]
+        high = (values_q[:, 1] + iqr_factor * iqr)[position]
+        keep = (price >= low) & (price <= high)
+        outliers = int((~keep).sum())
+        price, types, rooms, years = price[keep], types[keep], rooms[keep], years[keep]
+
+    indicators: dict[str, Any] = {
+        "nb_transactions": len(table),
+        "nb_ventes_retenues": len(price),
+        "nb_outliers": outliers,
+        "prix_m2_moyen": None,
+        "prix_m2_median": None,
+        "prix_m2_q1": None,
+        "prix_m2_q3": None,
+        "par_type_local": {},
+        "par_nombre_pieces": {},
+        "par_annee": {},
+    }
+    if not len(price):
+        return indicators
+
+    q1, median, q3 = np.quantile(price, QUANTILES)
+    indicators.update(
+        prix_m2_moyen=round(float(price.mean()), 2),
+        prix_m2_median=round(float(median), 2),
+        prix_m2_q1=round(float(q1), 2),
+        prix_m2_q3=round(float(q3), 2),
+    )
+
+    for group, count, mean, values_q in zip(*grouped_quantiles(types, price)):
+        indicators["par_type_local"][TYPE_LOCAL_CATEGORIES[group]] = _stats(count, mean, values_q)
+
+    # Rooms: 1..MAX_ROOMS_BUCKET (bucket "5+"), unknown or zero rooms are left out
+    has_rooms = rooms >= 1
+    room_bucket = np.minimum(rooms[has_rooms], MAX_ROOMS_BUCKET).astype(np.int64)
+    room_keys = types[has_rooms] * 100 + room_bucket
+    for key, count, mean, values_q in zip(*grouped_quantiles(room_keys, price[has_rooms])):
+        label = TYPE_LOCAL_CATEGORIES[key // 100]
+        bucket = key % 100
+        bucket_label = f"{bucket}+" if bucket == MAX_ROOMS_BUCKET else str(bucket)
+        indicators["par_nombre_pieces"].setdefault(label, {})[bucket_label] = _stats(
+            count, mean, values_q
+        )
+
+    has_year = years >= 0
+    year_keys = types[has_year] * 10_000 + years[has_year]
+    for key, count, mean, values_q in zip(*grouped_quantiles(year_keys, price[has_year])):
+        label = TYPE_LOCAL_CATEGORIES[key // 10_000]
+        indicators["par_annee"].setdefault(label, {})[str(key % 10_000)] = _stats(
+            count, mean, values_q
+        )
+
+    return indicators
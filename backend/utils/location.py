@@ -0,0 +1,93 @@
+"""Combined location lookup: geocoding, then cadastral parcel and DVF data concurrently."""
+
+import asyncio
+import logging
+from collections.abc import Awaitable
+from typing import Any
+
+import httpx
+
+from backend.config import settings
+from backend.utils.cadastre import geocode_address, get_cadastral_parcel
+from backend.utils.dvf import get_dvf_transactions
+
+logger = logging.getLogger(__name__)
+
+
+async def guarded(
+    source: str, awaitable: Awaitable[Any], timeout: float, errors: dict[str, str]
+) -> Any:
+    """
+    Await one optional source under its deadline, recording its failure instead of raising.
+
+    Args:
+        source: Name of the source, used as key in errors
+        awaitable: Coroutine fetching the source
+        timeout: Deadline in seconds
+        errors: Error messages per source, updated on failure
+
+    Returns:
+        The source result, or None if it failed or timed out
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        errors[source] = f"Délai dépassé ({timeout:g} s)"
+    except Exception as e:
+        errors[source] = str(e) or type(e).__name__
+    logger.warning("Location bundle: %s unavailable (%s)", source, errors[source])
+    return None
+
+
+async def get_location_bundle(
+    address: str, dist: int = 200, client: httpx.AsyncClient | None = None
+) -> dict[str, Any]:
+    """
+    Geocode an address, then fetch its cadastral parcel and DVF transactions concurrently.
+
+    End-to-end latency is the geocoding time plus the slowest remaining source. Each
+    source has its own deadline (settings.location_parcel_timeout and
+    settings.location_dvf_timeout); a source that fails or times out is returned as None
+    with its error in "errors", without cancelling the other one.
+
+    Args:
+        address: The address to process (e.g., "10 rue de la Paix, 75002 Paris")
+        dist: DVF search radius in meters (default: 200)
+        client: Optional HTTP client used for every request (defaults to the shared clients)
+
+    Returns:
+        Dictionary with keys:
+        - address: dict (geocoding results from geocode_address)
+        - parcel: dict | None (parcel information from get_cadastral_parcel)
+        - dvf: DVFResult | None (transactions from get_dvf_transactions)
+        - errors: dict[str, str] (error message per failed source)
+
+    Raises:
+        httpx.HTTPStatusError: If the geocoding request fails
+        ValueError: If the address is not found
+    """
+    geocoding_result = await geocode_address(address, client=client)
+    lat, lon = geocoding_result["latitude"], geocoding_result["longitude"]
+
+    errors: dict[str, str] = {}
+    parcel_result, dvf_result = await asyncio.gather(
+        guarded(
+            "parcel",
+            get_cadastral_parcel(lat, lon, client=client),
+            settings.location_parcel_timeout,
+            errors,
+        ),
+        guarded(
+            "dvf",
+            get_dvf_transactions(lat, lon, dist, client=client),
+            settings.location_dvf_timeout,
+            errors,
+        ),
+    )
+
+    return {
+        "address": geocoding_result,
+        "parcel": parcel_result,
+        "dvf": dvf_result,
+        "errors": errors,
+    }
@@ -0,0 +1,243 @@
+"""In-process latency and error metrics, exposed in the Prometheus text format.
+
+External calls (API Adresse, API Carto, DVF, the LLM and its web searches) and the
+analysis graph nodes are timed with `timed`, which records a latency histogram and
+counts failures by exception type. Other components add counters with `increment`
+(e.g. LLM token usage) or register a collector for values they already track (e.g.
+the cache hit counters). GET /metrics renders everything with `render`.
+
+Metrics are kept per process, like the caches: each uvicorn worker exposes its own.
+When settings.metrics_enabled is False, `timed` and `increment` return immediately.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from backend.config import settings
+
+PREFIX = "agentimmo_"
+
+# Upper bounds of the latency buckets, in seconds (LLM runs take up to minutes)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# (metric name, labels, value) samples produced by a collector, rendered as counters
+# when the name ends with "_total" and as gauges otherwise
+Sample = tuple[str, dict[str, str], float]
+
+_Key = tuple[str, tuple[tuple[str, str], ...]]
+
+
+def _key(name: str, labels: dict[str, Any]) -> _Key:
+    """Identify a series by its name and sorted labels."""
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name: str, labels: Iterable[tuple[str, str]]) -> str:
+    """Format a series name with its labels."""
+    labels = ",".join(f'{label}="{_escape(value)}"' for label, value in labels)
+    return f"{PREFIX}{name}{{{labels}}}" if labels else f"{PREFIX}{name}"
+
+
+class MetricsRegistry:
+    """Thread-safe store of latency histograms and counters."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        # Per series: count per bucket (plus +Inf), sum of observations
+        self._histograms: dict[_Key, tuple[list[int], list[float]]] = {}
+        self._counters: dict[_Key, float] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """Record a duration in the `<name>_seconds` histogram."""
+        if not settings.metrics_enabled:
+            return
+        key = _key(f"{name}_seconds", labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = ([0] * (len(BUCKETS) + 1), [0.0])
+            counts, total = histogram
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += seconds
+
+    def increment(self, name: str, amount: float = 1, **labels: Any) -> None:
+        """Add to the `<name>_total` counter."""
+        if not settings.metrics_enabled:
+            return
+        key = _key(f"{name}_total", labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Register a function called on every render for values tracked elsewhere."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        """Forget every recorded histogram and counter (collectors are kept)."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def histogram(self, name: str, **labels: Any) -> dict[str, Any] | None:
+        """Return {"count", "sum"} of a `<name>_seconds` histogram, or None if unused."""
+        with self._lock:
+            histogram = self._histograms.get(_key(f"{name}_seconds", labels))
+            if histogram is None:
+                return None
+            return {"count": sum(histogram[0]), "sum": histogram[1][0]}
+
+    def counter(self, name: str, **labels: Any) -> float:
+        """Return the value of a `<name>_total` counter (0 if unused)."""
+        with self._lock:
+            return self._counters.get(_key(f"{name}_total", labels), 0)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {key: (list(c), t[0]) for key, (c, t) in self._histograms.items()}
+            counters = dict(self._counters)
+            collectors = list(self._collectors)
+
+        # Samples per metric family, so each family is rendered in one block under its TYPE
+        families: dict[str, tuple[str, list[str]]] = {}
+
+        def family(name: str, kind: str) -> list[str]:
+            return families.setdefault(name, (kind, []))[1]
+
+        for (name, labels), (counts, total) in sorted(histograms.items()):
+            samples = family(name, "histogram")
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, "+Inf"), counts):
+                cumulative += count
+                samples.append(
+                    f"{_series(f'{name}_bucket', (*labels, ('le', str(bound))))} {cumulative}"
+                )
+            samples.append(f"{_series(f'{name}_sum', labels)} {total}")
+            samples.append(f"{_series(f'{name}_count', labels)} {cumulative}")
+
+        for (name, labels), value in sorted(counters.items()):
+            family(name, "counter").append(f"{_series(name, labels)} {value}")
+
+        for collector in collectors:
+            for name, labels, value in collector():
+                kind = "counter" if name.endswith("_total") else "gauge"
+                family(name, kind).append(f"{_series(name, sorted(labels.items()))} {value}")
+
+        lines: list[str] = []
+        for name, (kind, samples) in families.items():
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    """Context manager (sync or async) timing a block into a registry."""
+
+    __slots__ = ("_registry", "_name", "_labels", "_start")
+
+    def __init__(self, registry: MetricsRegistry, name: str, labels: dict[str, Any]):
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        self._registry.observe(self._name, time.perf_counter() - self._start, **self._labels)
+        if exc_type is not None:
+            self._registry.increment(
+                f"{self._name}_errors", error=exc_type.__name__, **self._labels
+            )
+
+    async def __aenter__(self) -> "_Timer":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        self.__exit__(exc_type, exc, traceback)
+
+
+class _NoTimer:
+    """Context manager doing nothing, used while metrics are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def __aenter__(self) -> None:
+        return None
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NO_TIMER = _NoTimer()
+
+# Application-wide registry, rendered by GET /metrics
+metrics = MetricsRegistry()
+
+
+def timed(name: str, **labels: Any) -> _Timer | _NoTimer:
+    """
+    Time a block (`with` or `async with`) into the `<name>_seconds` histogram.
+
+    A block raising an exception also increments `<name>_errors_total`, labelled with
+    the exception type.
+
+    Usage:
+        async with timed("upstream_request", upstream="api_carto"):
+            response = await client.get(url)
+    """
+    if not settings.metrics_enabled:
+        return _NO_TIMER
+    return _Timer(metrics, name, labels)
+
+
+def timed_function(name: str, **labels: Any) -> Callable[[Callable], Callable]:
+    """Decorator timing every call of a function or coroutine function (see timed)."""
+
+    def decorate(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                async with timed(name, **labels):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with timed(name, **labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def increment(name: str, amount: float = 1, **labels: Any) -> None:
+    """Add to the `<name>_total` counter of the application registry."""
+    metrics.increment(name, amount, **labels)
@@ -1,40 +1,89 @@
-"""PDF generation utilities using ReportLab."""
+"""PDF generation utilities using ReportLab.
 
+ReportLab is imported by build_pdf_report on first use, so processes that only hand
+reports to the process pool (the API) never load it.
+"""
+
+import io
 import os
+import time
+import uuid
 from typing import Any
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
-
-
-def generate_pdf_report(indicators: dict[str, Any], images: dict[str, Any]) -> str:
+from backend.config import settings
+from backend.utils.process_pool import run_in_process
+
+# Labels of the indicators shown in the summary table (see compute_price_indicators)
+_INDICATOR_LABELS = {
+    "nb_transactions": "Transactions",
+    "nb_ventes_retenues": "Ventes de logements retenues",
+    "nb_outliers": "Ventes écartées (valeurs aberrantes)",
+    "prix_m2_moyen": "Prix moyen (€/m²)",
+    "prix_m2_median": "Prix médian (€/m²)",
+    "prix_m2_q1": "Premier quartile (€/m²)",
+    "prix_m2_q3": "Troisième quartile (€/m²)",
+}
+
+_IMAGE_TITLES = {
+    "price_chart": "Prix au m² par type de bien",
+    "trend_chart": "Évolution des prix",
+}
+
+_TABLE_STYLE = [
+    ("GRID", (0, 0), (-1, -1), 0.5, "grey"),
+    ("BACKGROUND", (0, 0), (-1, 0), "lightgrey"),
+    ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+]
+
+
+def _format(value: Any) -> str:
+    """Format a number with French thousands separators."""
+    if isinstance(value, float):
+        return f"{value:,.2f}".replace(",", " ")
+    if isinstance(value, int):
+        return f"{value:,}".replace(",", " ")
+    return str(value)
+
+
+def _image(png: bytes, max_width: float) -> Any:
+    """Embed PNG bytes scaled to max_width, keeping the aspect ratio."""
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import Image
+
+    width, height = ImageReader(io.BytesIO(png)).getSize()
+    scale = min(1.0, max_width / width)
+    return Image(io.BytesIO(png), width=width * scale, height=height * scale)
+
+
+def build_pdf_report(
+    indicators: dict[str, Any], images: dict[str, Any], title: str | None = None
+) -> bytes:
     """
-    Generate a PDF report from indicators and images.
+    Build a PDF report in memory.
 
     Args:
         indicators: Dictionary containing analysis indicators
-        images: Dictionary containing visualization images
+        images: Dictionary containing visualization images (PNG bytes are embedded,
+            other values are ignored)
+        title: Optional subtitle (e.g. the analysed address)
 
     Returns:
-        Path to the generated PDF file
+        PDF document bytes
     """
-    # Create output directory if it doesn't exist
-    output_dir = "reports"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Generate PDF filename
-    pdf_path = os.path.join(output_dir, "rapport_analyse.pdf")
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
 
-    # Create PDF document
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
     story = []
     styles = getSampleStyleSheet()
 
     # Title
-    title = Paragraph("Rapport d'Analyse Immobilière", styles["Title"])
-    story.append(title)
+    story.append(Paragraph("Rapport d'Analyse Immobilière", styles["Title"]))
+    if title:
+        story.append(Paragraph(title, styles["Heading2"]))
     story.append(Spacer(1, 0.2 * inch))
 
     # Introduction
@@ -49,32 +98,101 @@ def generate_pdf_report(indicators: dict[str, Any], images: dict[str, Any]) -> s
     story.append(Paragraph("Indicateurs", styles["Heading1"]))
     story.append(Spacer(1, 0.1 * inch))
 
-    # TODO: Add actual indicator data to PDF
-    if indicators:
-        for key, value in indicators.items():
-            if value is not None:
-                text = f"<b>{key}:</b> {value}"
-                story.append(Paragraph(text, styles["Normal"]))
-                story.append(Spacer(1, 0.05 * inch))
+    rows = [["Indicateur", "Valeur"]]
+    for key, value in (indicators or {}).items():
+        if value is not None and not isinstance(value, dict | list):
+            rows.append([_INDICATOR_LABELS.get(key, key), _format(value)])
+    if len(rows) > 1:
+        story.append(Table(rows, hAlign="LEFT", style=_TABLE_STYLE))
+        story.append(Spacer(1, 0.2 * inch))
+
+    by_type = (indicators or {}).get("par_type_local") or {}
+    if by_type:
+        story.append(Paragraph("Prix au m² par type de bien", styles["Heading2"]))
+        rows = [["Type", "Ventes", "Q1", "Médiane", "Q3", "Moyenne"]]
+        for type_local, stats in by_type.items():
+            rows.append(
+                [type_local]
+                + [_format(stats[name]) for name in ("nb_ventes", "q1", "mediane", "q3", "moyenne")]
+            )
+        story.append(Table(rows, hAlign="LEFT", style=_TABLE_STYLE))
 
     # Images section
     story.append(Spacer(1, 0.2 * inch))
     story.append(Paragraph("Visualisations", styles["Heading1"]))
     story.append(Spacer(1, 0.1 * inch))
 
-    # TODO: Add actual images to PDF
-    # For now, just add placeholder text
-    story.append(
-        Paragraph("Les visualisations seront ajoutées dans une version future.", styles["Normal"])
-    )
+    embedded = 0
+    for name, png in (images or {}).items():
+        if not isinstance(png, bytes | bytearray):
+            continue
+        story.append(Paragraph(_IMAGE_TITLES.get(name, name), styles["Heading2"]))
+        story.append(_image(bytes(png), doc.width))
+        story.append(Spacer(1, 0.2 * inch))
+        embedded += 1
+    if not embedded:
+        story.append(Paragraph("Aucune visualisation disponible.", styles["Normal"]))
 
     # Build PDF
     doc.build(story)
 
-    return pdf_path
+    return buffer.getvalue()
 
 
+def generate_pdf_report(
+    indicators: dict[str, Any],
+    images: dict[str, Any],
+    workflow_id: str | None = None,
+    output_dir: str | None = None,
+    title: str | None = None,
+) -> str:
+    """
+    Generate a PDF report from indicators and images.
 
+    Each report gets its own file (named after the workflow, or a random id), written
+    to a temporary name then renamed, so concurrent workflows never overwrite or read
+    a partial report. Reports older than settings.reports_ttl are deleted meanwhile.
 
+    Args:
+        indicators: Dictionary containing analysis indicators
+        images: Dictionary containing visualization images (PNG bytes)
+        workflow_id: Workflow the report belongs to
+        output_dir: Output directory (defaults to settings.reports_dir)
+        title: Optional subtitle (e.g. the analysed address)
+
+    Returns:
+        Path to the generated PDF file
+    """
+    # Create output directory if it doesn't exist
+    output_dir = output_dir or settings.reports_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    pdf_path = os.path.join(output_dir, f"rapport_{workflow_id or uuid.uuid4().hex}.pdf")
+    temporary_path = f"{pdf_path}.{uuid.uuid4().hex}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(build_pdf_report(indicators, images, title))
+    os.replace(temporary_path, pdf_path)
+    _prune_reports(output_dir, settings.reports_ttl)
+
+    return pdf_path
 
 
+def _prune_reports(output_dir: str, max_age: float) -> None:
+    """Delete the reports (and leftover temporary files) older than max_age seconds."""
+    limit = time.time() - max_age
+    for entry in os.scandir(output_dir):
+        if not entry.name.startswith("rapport_"):
+            continue
+        try:
+            if entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Deleted concurrently by another worker
+            pass
+
+
+async def render_pdf_report(
+    indicators: dict[str, Any], images: dict[str, Any], title: str | None = None
+) -> bytes:
+    """Build a PDF report in the shared process pool (see build_pdf_report)."""
+    return await run_in_process(build_pdf_report, indicators, images, title)
@@ -1,51 +1,218 @@
-"""Plotting utilities for generating charts and visualizations."""
+"""Plotting utilities for generating charts and visualizations.
 
-from typing import Any
+Price and trend charts are drawn from the DVF indicators returned by
+compute_price_indicators and rendered to PNG bytes. render_chart runs the rendering in
+a process pool (matplotlib is CPU-bound and not thread-safe) and caches the PNG under
+a hash of the data it depends on, so identical indicators are never rendered twice.
 
-import matplotlib
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
+matplotlib and plotly are imported on first use only: the API process merely hashes
+indicators and reads the cache, the pool workers do the drawing.
+"""
 
-matplotlib.use("Agg")  # Use non-interactive backend
+import asyncio
+import base64
+import hashlib
+import io
+import json
+from typing import TYPE_CHECKING, Any
 
+from backend.config import settings
+from backend.utils.cache import TTLCache
+from backend.utils.process_pool import run_in_process
 
-def generate_price_chart(indicators: dict[str, Any]) -> str:
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# Bump when the rendering changes, so cached charts are not reused
+CHART_VERSION = 1
+
+# Indicator keys each chart depends on (the cache key hashes only these)
+_CHART_INPUTS = {
+    "price_chart": ("prix_m2_median", "par_type_local", "par_nombre_pieces"),
+    "trend_chart": ("par_annee",),
+}
+
+chart_cache = TTLCache("charts", settings.chart_cache_ttl)
+
+
+def _new_figure() -> "Figure":
+    """Create a standalone figure (not tracked by pyplot, so no GUI backend is involved)."""
+    from matplotlib.figure import Figure
+
+    return Figure(figsize=(10, 6))
+
+
+def _to_png(fig: "Figure") -> bytes:
+    """Render a figure to PNG bytes and release it."""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format="png", dpi=100)
+    finally:
+        # Figures built with Figure() are not tracked by pyplot; clearing them frees
+        # their artists right away instead of waiting for the garbage collector
+        fig.clear()
+    return buffer.getvalue()
+
+
+def _empty(fig: "Figure", ax: Any, title: str) -> bytes:
+    """Render a chart with a "no data" message."""
+    ax.text(0.5, 0.5, "Pas assez de ventes", ha="center", va="center")
+    ax.set_axis_off()
+    ax.set_title(title)
+    return _to_png(fig)
+
+
+def generate_price_chart(indicators: dict[str, Any]) -> bytes:
     """
-    Generate a price evolution chart.
+    Generate a price per m² chart by dwelling type and number of rooms.
+
+    Bars show the median price per m², whiskers the interquartile range [Q1, Q3].
 
     Args:
-        indicators: Dictionary containing price indicators
+        indicators: Price indicators (see compute_price_indicators)
 
     Returns:
-        Base64 encoded image or file path
+        PNG image bytes
     """
-    # TODO: Implement actual price chart generation
-    # For now, return a placeholder
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.text(0.5, 0.5, "Price Chart\n(To be implemented)", ha="center", va="center")
-    ax.set_title("Évolution des prix")
-    plt.tight_layout()
-    # Save to temporary file or return base64
-    # For now, return placeholder
-    return "price_chart.png"
-
-
-def generate_trend_chart(indicators: dict[str, Any]) -> str:
+    fig = _new_figure()
+    ax = fig.subplots()
+    title = "Prix au m² par type de bien et nombre de pièces"
+    by_rooms = indicators.get("par_nombre_pieces") or {}
+    by_type = indicators.get("par_type_local") or {}
+    if not by_rooms and not by_type:
+        return _empty(fig, ax, title)
+
+    if by_rooms:
+        buckets = sorted({bucket for stats in by_rooms.values() for bucket in stats})
+        width = 0.8 / len(by_rooms)
+        for offset, (type_local, stats) in enumerate(by_rooms.items()):
+            positions = [
+                index + (offset - (len(by_rooms) - 1) / 2) * width
+                for index, bucket in enumerate(buckets)
+                if bucket in stats
+            ]
+            values = [stats[bucket] for bucket in buckets if bucket in stats]
+            ax.bar(
+                positions,
+                [value["mediane"] for value in values],
+                width,
+                yerr=[
+                    [value["mediane"] - value["q1"] for value in values],
+                    [value["q3"] - value["mediane"] for value in values],
+                ],
+                capsize=3,
+                label=type_local,
+            )
+        ax.set_xticks(range(len(buckets)), [f"{bucket} p." for bucket in buckets])
+        ax.set_xlabel("Nombre de pièces principales")
+    else:
+        labels = list(by_type)
+        ax.bar(
+            labels,
+            [by_type[label]["mediane"] for label in labels],
+            yerr=[
+                [by_type[label]["mediane"] - by_type[label]["q1"] for label in labels],
+                [by_type[label]["q3"] - by_type[label]["mediane"] for label in labels],
+            ],
+            capsize=3,
+        )
+
+    if indicators.get("prix_m2_median") is not None:
+        ax.axhline(
+            indicators["prix_m2_median"],
+            color="grey",
+            linestyle="--",
+            linewidth=1,
+            label="Médiane globale",
+        )
+    ax.set_ylabel("Prix médian (€/m²)")
+    ax.set_title(title)
+    # Headroom for the legend above the bars
+    ax.set_ylim(top=ax.get_ylim()[1] * 1.15)
+    ax.legend(loc="upper left", ncols=3)
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def generate_trend_chart(indicators: dict[str, Any]) -> bytes:
     """
-    Generate a market trend chart.
+    Generate a yearly price trend chart by dwelling type.
+
+    Lines show the median price per m² per year, shaded bands the interquartile range.
 
     Args:
-        indicators: Dictionary containing market indicators
+        indicators: Price indicators (see compute_price_indicators)
 
     Returns:
-        Base64 encoded image or file path
+        PNG image bytes
     """
-    # TODO: Implement actual trend chart generation
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.text(0.5, 0.5, "Trend Chart\n(To be implemented)", ha="center", va="center")
-    ax.set_title("Tendances du marché")
-    plt.tight_layout()
-    return "trend_chart.png"
+    fig = _new_figure()
+    ax = fig.subplots()
+    title = "Évolution du prix au m²"
+    by_year = indicators.get("par_annee") or {}
+    if not by_year:
+        return _empty(fig, ax, title)
+
+    for type_local, stats in by_year.items():
+        years = sorted(stats, key=int)
+        x = [int(year) for year in years]
+        ax.plot(x, [stats[year]["mediane"] for year in years], marker="o", label=type_local)
+        ax.fill_between(
+            x,
+            [stats[year]["q1"] for year in years],
+            [stats[year]["q3"] for year in years],
+            alpha=0.2,
+        )
+    ax.xaxis.get_major_locator().set_params(integer=True)
+    ax.set_xlabel("Année de mutation")
+    ax.set_ylabel("Prix médian (€/m²)")
+    ax.set_title(title)
+    ax.legend()
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+_RENDERERS = {"price_chart": generate_price_chart, "trend_chart": generate_trend_chart}
+
+
+def _render(kind: str, data: dict[str, Any]) -> bytes:
+    """Render one chart (runs in a pool process)."""
+    return _RENDERERS[kind](data)
+
+
+def chart_key(kind: str, indicators: dict[str, Any]) -> str:
+    """Hash the indicators a chart depends on (stable across key order)."""
+    data = {name: indicators.get(name) for name in _CHART_INPUTS[kind]}
+    payload = json.dumps([kind, CHART_VERSION, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def render_chart(kind: str, indicators: dict[str, Any]) -> bytes:
+    """
+    Render a chart in the shared process pool, reusing the cached PNG of identical data.
+
+    Args:
+        kind: "price_chart" or "trend_chart"
+        indicators: Price indicators (see compute_price_indicators)
+
+    Returns:
+        PNG image bytes
+    """
+    data = {name: indicators.get(name) for name in _CHART_INPUTS[kind]}
+
+    async def fetch() -> str:
+        png = await run_in_process(_render, kind, data)
+        # The cache stores JSON values
+        return base64.b64encode(png).decode("ascii")
+
+    return base64.b64decode(await chart_cache.get_or_fetch(chart_key(kind, indicators), fetch))
+
+
+async def render_charts(indicators: dict[str, Any]) -> dict[str, bytes]:
+    """Render the price and trend charts concurrently (keyed by chart kind)."""
+    kinds = list(_RENDERERS)
+    images = await asyncio.gather(*(render_chart(kind, indicators) for kind in kinds))
+    return dict(zip(kinds, images))
 
 
 def generate_map(indicators: dict[str, Any]) -> str:
@@ -58,6 +225,8 @@ def generate_map(indicators: dict[str, Any]) -> str:
     Returns:
         HTML file path or base64 encoded image
     """
+    import plotly.graph_objects as go
+
     # TODO: Implement actual map generation with Plotly
     # For now, create a simple placeholder map
     fig = go.Figure()
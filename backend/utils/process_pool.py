@@ -0,0 +1,43 @@
+"""Shared process pool for CPU-bound rendering (charts, PDF reports)."""
+
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from backend.config import settings
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared pool, started on first use with settings.process_pool_workers."""
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs threads (uvicorn, executors) is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.process_pool_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the pool processes, if started."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_process(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a picklable top-level function in the shared pool without blocking the event loop.
+
+    Args:
+        func: Module-level function (pickled by reference)
+        *args: Picklable arguments
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
@@ -0,0 +1,166 @@
+"""Base of the local SQLite stores built from bulk open-data files (DVF, cadastre, BAN).
+
+Each store is a SQLite database filled by a command-line ingestion and then queried
+from worker threads. SQLiteStore holds one connection per thread, records the files
+already ingested (so re-running an ingestion only loads the new ones) and runs the
+ingestion loop; subclasses declare their tables and load one file. The geographic
+helpers shared by the spatial stores (distances, bounding boxes) live here too.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6_371_008.8
+
+_INGESTED_FILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    name TEXT PRIMARY KEY,
+    row_count INTEGER,
+    ingested_at TEXT
+);
+"""
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return the great-circle distance in metres between two WGS84 points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat: float, lon: float, dist: float) -> tuple[float, float, float, float]:
+    """Return the (min_lat, max_lat, min_lon, max_lon) box enclosing a circle of dist metres."""
+    dlat = math.degrees(dist / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def overlaps(
+    bbox: tuple[float, float, float, float], alias: str = ""
+) -> tuple[str, tuple[float, float, float, float]]:
+    """
+    Return the SQL condition (and its parameters) selecting the boxes that overlap bbox.
+
+    Args:
+        bbox: (min_lat, max_lat, min_lon, max_lon) search box
+        alias: Alias of the table holding the min_lat, max_lat, min_lon and max_lon columns
+            (an R*Tree or a plain table)
+    """
+    min_lat, max_lat, min_lon, max_lon = bbox
+    prefix = f"{alias}." if alias else ""
+    condition = (
+        f"{prefix}min_lat <= ? AND {prefix}max_lat >= ? "
+        f"AND {prefix}min_lon <= ? AND {prefix}max_lon >= ?"
+    )
+    return condition, (max_lat, min_lat, max_lon, min_lon)
+
+
+class SQLiteStore:
+    """
+    SQLite database built from bulk files, queried through one connection per thread.
+
+    Subclasses set SCHEMA (their tables, created along with ingested_files), SOURCE and
+    ROWS (names used in the ingestion logs) and implement _ingest_file.
+    """
+
+    SCHEMA = ""
+    SOURCE = ""
+    ROWS = "rows"
+
+    def __init__(self, path: str):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path of the SQLite database file (created on first ingestion)
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection to the database, opening it if needed."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def exists(self) -> bool:
+        """Whether the database file has been created."""
+        return os.path.exists(self.path)
+
+    def create_schema(self) -> None:
+        """Create the store tables and the ingested_files table if they do not exist."""
+        self._connect().executescript(self.SCHEMA + _INGESTED_FILES_SCHEMA)
+
+    def ingest(self, paths: Iterable[str]) -> int:
+        """
+        Load files into the store, skipping the files already ingested.
+
+        Each file is loaded in its own transaction, together with its ingested_files
+        entry, so an interrupted ingestion can be resumed.
+
+        Args:
+            paths: Paths of the source files
+
+        Returns:
+            Number of rows inserted
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.create_schema()
+        connection = self._connect()
+        self._prepare_ingest(connection)
+
+        total = 0
+        for path in paths:
+            name = self._file_key(path)
+            if connection.execute(
+                "SELECT 1 FROM ingested_files WHERE name = ?", (name,)
+            ).fetchone():
+                logger.info("Skipping already ingested %s file %s", self.SOURCE, name)
+                continue
+
+            with connection:
+                count = self._ingest_file(connection, path)
+                connection.execute(
+                    "INSERT INTO ingested_files VALUES (?, ?, ?)",
+                    (name, count, datetime.now(timezone.utc).isoformat()),
+                )
+            logger.info("Ingested %d %s from %s", count, self.ROWS, name)
+            total += count
+
+        connection.execute("ANALYZE")
+        return total
+
+    def _file_key(self, path: str) -> str:
+        """Name under which a file is recorded in ingested_files."""
+        return os.path.basename(path)
+
+    def _prepare_ingest(self, connection: sqlite3.Connection) -> None:
+        """Prepare the connection before the files are ingested (no-op by default)."""
+
+    def _ingest_file(self, connection: sqlite3.Connection, path: str) -> int:
+        """Insert the rows of one file (inside a transaction); return how many were new."""
+        raise NotImplementedError
+
+    def last_update(self) -> str:
+        """Return the date of the most recent ingestion (ISO format), or an empty string."""
+        row = self._connect().execute("SELECT MAX(ingested_at) FROM ingested_files").fetchone()
+        return (row[0] or "")[:10]
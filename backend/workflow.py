@@ -1,91 +1,172 @@
-"""Workflow orchestrator for LangGraph agents."""
+"""Workflow orchestrator running the LangGraph analysis pipeline."""
 
+import asyncio
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
-from backend.agents.analyzer import AnalyzerAgent
-from backend.agents.data_collector import DataCollectorAgent
-from backend.agents.report_builder import ReportBuilderAgent
-from backend.agents.visualizer import VisualizerAgent
+from backend.agents.graph import NODE_OUTPUTS, NODE_STATUSES, RESULT_KEYS, get_graph
+from backend.config import settings
+from backend.utils.metrics import timed
+from backend.workflow_store import (
+    CANCELLING,
+    FINISHED_STATUSES,
+    WorkflowStore,
+    get_workflow_store,
+)
 
 
-class WorkflowOrchestrator:
-    """Orchestrates the execution of LangGraph agents in sequence."""
+def _status(done: set[str]) -> str:
+    """Status of the first graph node that has not completed yet."""
+    return next(
+        (status for node, status in NODE_STATUSES.items() if node not in done),
+        "building_report",
+    )
+
 
-    def __init__(self):
-        """Initialize the workflow orchestrator."""
-        self.data_collector = DataCollectorAgent()
-        self.analyzer = AnalyzerAgent()
-        self.visualizer = VisualizerAgent()
-        self.report_builder = ReportBuilderAgent()
-        self.workflows: dict[str, dict[str, Any]] = {}
+class WorkflowOrchestrator:
+    """
+    Runs the analysis graph (backend.agents.graph) for stored workflows.
+
+    Progress and results are written to the store as the graph nodes complete. The graph
+    is checkpointed under the workflow id: running a failed workflow again in the same
+    process resumes from the nodes that did not complete (elsewhere it starts over).
+    Checkpoints are released once the workflow completes or is cancelled, and
+    settings.workflow_ttl after it failed. Runs are timed as workflow_run (see
+    backend.utils.metrics).
+    """
+
+    def __init__(
+        self, store: WorkflowStore | None = None, max_workers: int | None = None, graph: Any = None
+    ):
+        """
+        Initialize the workflow orchestrator.
+
+        Args:
+            store: Workflow state store (defaults to the application-wide store)
+            max_workers: Threads running the blocking store writes (defaults to settings)
+            graph: Compiled analysis graph with a checkpointer (defaults to get_graph())
+        """
+        self.store = store or get_workflow_store()
+        self.graph = graph or get_graph()
+        # Checkpoints kept for resumption, by workflow id, with the time the run failed
+        self._failed_runs: dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.workflow_max_workers,
+            thread_name_prefix="workflow",
+        )
 
     def create_workflow(self, adresse: str) -> str:
         """Create a new workflow instance."""
         workflow_id = str(uuid.uuid4())
-        self.workflows[workflow_id] = {
-            "workflow_id": workflow_id,
-            "adresse": adresse,
-            "status": "pending",
-            "progress": 0.0,
-            "results": {},
-            "error": None,
-        }
+        self.store.create(workflow_id, adresse)
         return workflow_id
 
     def get_workflow_status(self, workflow_id: str) -> dict[str, Any]:
         """Get the status of a workflow."""
-        return self.workflows.get(workflow_id, {})
+        return self.store.get(workflow_id) or {}
 
     async def run_workflow(self, workflow_id: str) -> None:
-        """Run the complete workflow for a given workflow_id."""
-        if workflow_id not in self.workflows:
+        """Run (or resume) the analysis graph for a given workflow_id."""
+        workflow = self.store.get(workflow_id)
+        if workflow is None:
             raise ValueError(f"Workflow {workflow_id} not found")
 
-        workflow = self.workflows[workflow_id]
+        await self._release_stale_checkpoints()
+        self._failed_runs.pop(workflow_id, None)
+        config = {"configurable": {"thread_id": workflow_id}}
+        snapshot = await self.graph.aget_state(config)
+        # A pending checkpoint means a previous run stopped midway: resume it
+        graph_input = None if snapshot.next else {"adress_in": workflow["adresse"]}
+        done = {node for node, key in NODE_OUTPUTS.items() if key in snapshot.values}
 
         try:
-            # Step 1: Data Collection
-            workflow["status"] = "collecting"
-            workflow["progress"] = 0.25
-            dataset = self.data_collector.run({"adresse": workflow["adresse"]})
-            workflow["results"]["dataset"] = dataset
-
-            # Step 2: Analysis
-            workflow["status"] = "analyzing"
-            workflow["progress"] = 0.5
-            indicators = self.analyzer.run({"dataset": dataset})
-            workflow["results"]["indicators"] = indicators
-
-            # Step 3: Visualization
-            workflow["status"] = "visualizing"
-            workflow["progress"] = 0.75
-            images = self.visualizer.run({"indicators": indicators})
-            workflow["results"]["images"] = images
-
-            # Step 4: Report Building
-            workflow["status"] = "building_report"
-            workflow["progress"] = 0.9
-            report = self.report_builder.run(
-                {"indicators": indicators, "images": images}
-            )
-            workflow["results"]["report"] = report
-
-            # Complete
-            workflow["status"] = "completed"
-            workflow["progress"] = 1.0
-
+            async with timed("workflow_run"):
+                await self._in_executor(
+                    self.store.update,
+                    workflow_id,
+                    status=_status(done),
+                    progress=len(done) / len(NODE_STATUSES),
+                    error=None,
+                )
+                async for update in self.graph.astream(graph_input, config, stream_mode="updates"):
+                    for node, values in update.items():
+                        if node not in NODE_STATUSES:
+                            continue
+                        done.add(node)
+                        await self._in_executor(self._record, workflow_id, values, set(done))
+
+                # Complete
+                await self._in_executor(
+                    self.store.update, workflow_id, status="completed", progress=1.0
+                )
+                await self.graph.checkpointer.adelete_thread(workflow_id)
+
+        except asyncio.CancelledError:
+            await self.graph.checkpointer.adelete_thread(workflow_id)
+            raise
         except Exception as e:
-            workflow["status"] = "failed"
-            workflow["error"] = str(e)
+            self._failed_runs[workflow_id] = time.monotonic()
+            await self._in_executor(self.store.update, workflow_id, status="failed", error=str(e))
             raise
 
+    async def _release_stale_checkpoints(self) -> None:
+        """
+        Delete the checkpoints of runs that failed more than settings.workflow_ttl ago.
+
+        Their workflows have been evicted from the store by then, so they can no longer
+        be resumed; this bounds the memory held by the in-memory checkpointer.
+        """
+        limit = time.monotonic() - settings.workflow_ttl
+        for workflow_id, failed_at in list(self._failed_runs.items()):
+            if failed_at < limit:
+                del self._failed_runs[workflow_id]
+                await self.graph.checkpointer.adelete_thread(workflow_id)
+
+    def _record(self, workflow_id: str, values: dict[str, Any], done: set[str]) -> None:
+        """
+        Store the results of a completed node and the progress of the workflow.
+
+        The progress is not written over a finished or cancelling workflow, whose status
+        was set by a cancellation (possibly from another process).
+        """
+        for key, value in (values or {}).items():
+            if key not in RESULT_KEYS:
+                continue
+            if key == "errors":
+                # Parallel branches each report their own errors: merge them
+                if not value:
+                    continue
+                workflow = self.store.get(workflow_id) or {"results": {}}
+                value = {**(workflow["results"].get("errors") or {}), **value}
+            self.store.set_result(workflow_id, key, value)
+        workflow = self.store.get(workflow_id)
+        if workflow is None or workflow["status"] in (*FINISHED_STATUSES, CANCELLING):
+            return
+        self.store.update(
+            workflow_id, status=_status(done), progress=len(done) / len(NODE_STATUSES)
+        )
+
+    async def _in_executor(self, func: Any, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking call in the bounded executor.
+
+        When the run is cancelled, a call already started is waited for before the
+        cancellation propagates, so the run never writes to the store once it stopped.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait({future})
+            raise
 
-# Global orchestrator instance
-orchestrator = WorkflowOrchestrator()
-
-
-
-
+    def shutdown(self) -> None:
+        """Wait for running store writes and release the executor threads."""
+        self._executor.shutdown(wait=True)
 
 
+# Global orchestrator instance
+orchestrator = WorkflowOrchestrator()
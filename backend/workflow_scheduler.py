@@ -0,0 +1,212 @@
+"""Bounded in-process job queue running analysis workflows with admission control."""
+
+import asyncio
+import itertools
+import logging
+from collections.abc import Awaitable, Callable
+
+from backend.config import settings
+from backend.workflow_store import CANCELLING, FINISHED_STATUSES, WorkflowStore
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a workflow is submitted while the queue is full."""
+
+
+class WorkflowScheduler:
+    """
+    Priority queue of workflows drained by a fixed number of worker tasks.
+
+    At most `workers` workflows run at once and at most `max_queue` wait; submissions
+    beyond that raise QueueFullError (surfaced as HTTP 429). Higher priorities run
+    first, equal priorities in submission order. Queued and running workflows can be
+    cancelled individually. Store reads and writes run in threads (asyncio.to_thread)
+    so a slow shared store never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str], Awaitable[None]],
+        store: WorkflowStore,
+        workers: int | None = None,
+        max_queue: int | None = None,
+    ):
+        """
+        Initialize the scheduler (workers start on the first submission).
+
+        Args:
+            run: Coroutine function running one workflow (e.g. orchestrator.run_workflow)
+            store: Store holding the workflow states
+            workers: Number of workflows running concurrently (defaults to settings)
+            max_queue: Maximum number of waiting workflows (defaults to settings)
+        """
+        self._run = run
+        self.store = store
+        self.workers = workers or settings.workflow_queue_workers
+        self.max_queue = max_queue or settings.workflow_queue_size
+        self._queue: asyncio.PriorityQueue[tuple[int, int, str]] | None = None
+        self._counter = itertools.count()
+        self._queued: set[str] = set()
+        self._running: dict[str, asyncio.Task] = {}
+        self._worker_tasks: list[asyncio.Task] = []
+
+    @property
+    def queued(self) -> int:
+        """Number of workflows waiting to run."""
+        return len(self._queued)
+
+    @property
+    def running(self) -> int:
+        """Number of workflows currently running."""
+        return len(self._running)
+
+    def is_full(self) -> bool:
+        """Whether a new submission would be rejected."""
+        return len(self._queued) >= self.max_queue
+
+    def _start(self) -> None:
+        """Create the queue and the worker tasks in the running event loop."""
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"workflow-worker-{index}")
+            for index in range(self.workers)
+        ]
+
+    def submit(self, workflow_id: str, priority: int = 0) -> None:
+        """
+        Queue a workflow for execution.
+
+        Args:
+            workflow_id: Workflow already registered in the store
+            priority: Higher values run first
+
+        Raises:
+            QueueFullError: If max_queue workflows are already waiting
+        """
+        if self.is_full():
+            raise QueueFullError(f"File d'attente pleine ({self.max_queue} workflows)")
+        if self._queue is None:
+            self._start()
+        self._queued.add(workflow_id)
+        self._queue.put_nowait((-priority, next(self._counter), workflow_id))
+
+    async def cancel(self, workflow_id: str) -> bool:
+        """
+        Cancel a queued or running workflow and mark it cancelled in the store.
+
+        A running workflow is marked cancelled once its task has stopped, so none of its
+        own store writes can land after (and overwrite) the cancelled status. A workflow
+        that is unfinished in the store but queued or running in another process (shared
+        PostgreSQL store) is marked "cancelling"; the scheduler of the process owning it
+        stops it when it next polls the store (see _wait) or skips it when it is
+        dequeued.
+
+        Returns:
+            True if the workflow was cancelled or marked cancelling, False if it is
+            unknown or already finished
+        """
+        if workflow_id in self._queued:
+            # Left in the heap and skipped by the worker that pops it
+            self._queued.discard(workflow_id)
+        elif workflow_id in self._running:
+            task = self._running[workflow_id]
+            task.cancel()
+            await asyncio.wait({task})
+            if not task.cancelled():
+                # Finished before the cancellation reached it
+                return False
+        else:
+            workflow = await asyncio.to_thread(self.store.get, workflow_id)
+            if workflow is None or workflow["status"] in FINISHED_STATUSES:
+                return False
+            await asyncio.to_thread(self.store.update, workflow_id, status=CANCELLING)
+            return True
+        await asyncio.to_thread(self.store.update, workflow_id, status="cancelled")
+        return True
+
+    async def _worker(self) -> None:
+        """Run queued workflows one at a time, forever."""
+        while True:
+            _, _, workflow_id = await self._queue.get()
+            try:
+                if workflow_id not in self._queued:
+                    continue
+                self._queued.discard(workflow_id)
+                workflow = await asyncio.to_thread(self.store.get, workflow_id)
+                if workflow is not None and workflow["status"] == CANCELLING:
+                    # Cancelled from another process while waiting here
+                    await asyncio.to_thread(self.store.update, workflow_id, status="cancelled")
+                    continue
+                task = asyncio.create_task(self._run(workflow_id))
+                self._running[workflow_id] = task
+                try:
+                    await self._wait(workflow_id, task)
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                finally:
+                    self._running.pop(workflow_id, None)
+                if task.cancelled():
+                    logger.info("Workflow %s cancelled", workflow_id)
+                elif task.exception() is not None:
+                    logger.error("Workflow %s failed", workflow_id, exc_info=task.exception())
+            finally:
+                self._queue.task_done()
+
+    async def _wait(self, workflow_id: str, task: asyncio.Task) -> None:
+        """
+        Wait for a workflow task, stopping it if another process asked to cancel it.
+
+        asyncio.wait only raises if the worker itself is cancelled (shutdown), which
+        must not be mistaken for a cancel of the workflow.
+        """
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.workflow_cancel_poll_interval)
+            if done:
+                return
+            workflow = await asyncio.to_thread(self.store.get, workflow_id)
+            if workflow is not None and workflow["status"] == CANCELLING:
+                task.cancel()
+                await asyncio.wait({task})
+                await asyncio.to_thread(self.store.update, workflow_id, status="cancelled")
+                return
+
+    async def join(self) -> None:
+        """Wait until every queued workflow has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def aclose(self) -> None:
+        """Stop the workers, cancelling running workflows and marking waiting ones cancelled."""
+        for workflow_id in list(self._queued) + list(self._running):
+            workflow = await asyncio.to_thread(self.store.get, workflow_id)
+            if workflow is not None and workflow["status"] not in FINISHED_STATUSES:
+                await self.cancel(workflow_id)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+
+_scheduler: WorkflowScheduler | None = None
+
+
+def get_scheduler() -> WorkflowScheduler:
+    """Return the application scheduler, built around the global orchestrator on first use."""
+    global _scheduler
+    if _scheduler is None:
+        from backend.workflow import orchestrator
+
+        _scheduler = WorkflowScheduler(orchestrator.run_workflow, orchestrator.store)
+    return _scheduler
+
+
+async def close_scheduler() -> None:
+    """Stop the application scheduler if it was started."""
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.aclose()
+        _scheduler = None
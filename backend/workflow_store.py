@@ -0,0 +1,365 @@
+"""Pluggable workflow state stores (in-memory or PostgreSQL)."""
+
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+
+from backend.config import settings
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+# Cancel requested for a workflow queued or running in another process
+CANCELLING = "cancelling"
+UPDATABLE_FIELDS = frozenset({"status", "progress", "error"})
+
+
+def _check_fields(fields: dict[str, Any]) -> None:
+    """Reject updates of fields other than status, progress and error."""
+    if not fields.keys() <= UPDATABLE_FIELDS:
+        raise ValueError(f"Champs non modifiables: {sorted(fields.keys() - UPDATABLE_FIELDS)}")
+
+
+def _json_default(value: Any) -> Any:
+    """Serialise result objects exposing to_dict() (e.g. DVFResult)."""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+class WorkflowStore(ABC):
+    """
+    Storage of workflow state shared by every API worker.
+
+    A workflow is a dict with keys workflow_id, adresse, status, progress, results (dict),
+    error, created_at, updated_at and finished_at (timestamps in seconds, finished_at set
+    while the status is one of FINISHED_STATUSES). Finished workflows are evicted ttl
+    seconds after they finish.
+
+    Changes made through this store instance are also published to in-process
+    subscribers (see subscribe); changes made by other workers are only visible in the
+    stored state.
+    """
+
+    def __init__(self, ttl: float | None = None):
+        """
+        Initialize the store.
+
+        Args:
+            ttl: Retention of finished workflows, in seconds (defaults to settings)
+        """
+        self.ttl = settings.workflow_ttl if ttl is None else ttl
+        self._subscribers: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._subscribers_lock = threading.Lock()
+
+    def subscribe(self, workflow_id: str) -> asyncio.Queue:
+        """
+        Return a queue receiving the changes of a workflow (call from the event loop).
+
+        Each update puts a dict of the updated fields, each set_result a dict
+        {"result": key}. Call unsubscribe with the same queue when done.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._subscribers_lock:
+            self._subscribers.setdefault(workflow_id, []).append(
+                (asyncio.get_running_loop(), queue)
+            )
+        return queue
+
+    def unsubscribe(self, workflow_id: str, queue: asyncio.Queue) -> None:
+        """Stop delivering changes of a workflow to a queue."""
+        with self._subscribers_lock:
+            subscribers = self._subscribers.get(workflow_id, [])
+            subscribers[:] = [entry for entry in subscribers if entry[1] is not queue]
+            if not subscribers:
+                self._subscribers.pop(workflow_id, None)
+
+    def _publish(self, workflow_id: str, change: dict[str, Any]) -> None:
+        """Deliver a change to the subscribers of a workflow (thread-safe)."""
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(workflow_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, change)
+            except RuntimeError:
+                # The subscriber's event loop is closed
+                self.unsubscribe(workflow_id, queue)
+
+    @abstractmethod
+    def create(self, workflow_id: str, adresse: str) -> dict[str, Any]:
+        """Register a new pending workflow and return it."""
+
+    @abstractmethod
+    def get(self, workflow_id: str) -> dict[str, Any] | None:
+        """Return a workflow, or None if it does not exist (or was evicted)."""
+
+    @abstractmethod
+    def update(self, workflow_id: str, **fields: Any) -> None:
+        """
+        Atomically update status, progress and/or error.
+
+        Raises:
+            KeyError: If the workflow does not exist
+            ValueError: If another field is given
+        """
+
+    @abstractmethod
+    def set_result(self, workflow_id: str, key: str, value: Any) -> None:
+        """
+        Atomically store one entry of the workflow results.
+
+        Raises:
+            KeyError: If the workflow does not exist
+        """
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """Delete finished workflows older than the TTL and return how many were deleted."""
+
+
+class InMemoryWorkflowStore(WorkflowStore):
+    """Process-local store (single worker, state lost on restart)."""
+
+    def __init__(self, ttl: float | None = None):
+        """Initialize an empty store."""
+        super().__init__(ttl)
+        self._workflows: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def create(self, workflow_id: str, adresse: str) -> dict[str, Any]:
+        """Register a new pending workflow and return it."""
+        now = time.time()
+        workflow = {
+            "workflow_id": workflow_id,
+            "adresse": adresse,
+            "status": "pending",
+            "progress": 0.0,
+            "results": {},
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._sweep_locked(now)
+            self._workflows[workflow_id] = workflow
+            return dict(workflow, results=dict(workflow["results"]))
+
+    def get(self, workflow_id: str) -> dict[str, Any] | None:
+        """Return a snapshot of a workflow, or None."""
+        now = time.time()
+        with self._lock:
+            self._sweep_locked(now)
+            workflow = self._workflows.get(workflow_id)
+            if workflow is None:
+                return None
+            if self._is_expired(workflow, now):
+                del self._workflows[workflow_id]
+                return None
+            return dict(workflow, results=dict(workflow["results"]))
+
+    def update(self, workflow_id: str, **fields: Any) -> None:
+        """Atomically update status, progress and/or error."""
+        _check_fields(fields)
+        now = time.time()
+        with self._lock:
+            workflow = self._workflows[workflow_id]
+            workflow.update(fields, updated_at=now)
+            if "status" in fields:
+                # A resumed workflow is no longer finished
+                workflow["finished_at"] = now if fields["status"] in FINISHED_STATUSES else None
+        self._publish(workflow_id, fields)
+
+    def set_result(self, workflow_id: str, key: str, value: Any) -> None:
+        """Atomically store one entry of the workflow results."""
+        with self._lock:
+            workflow = self._workflows[workflow_id]
+            workflow["results"][key] = value
+            workflow["updated_at"] = time.time()
+        self._publish(workflow_id, {"result": key})
+
+    def evict_expired(self) -> int:
+        """Delete finished workflows older than the TTL."""
+        with self._lock:
+            return self._evict_expired_locked(time.time())
+
+    def _is_expired(self, workflow: dict[str, Any], now: float) -> bool:
+        """Whether a workflow finished more than ttl seconds ago."""
+        return workflow["finished_at"] is not None and now - workflow["finished_at"] > self.ttl
+
+    def _sweep_locked(self, now: float) -> None:
+        """Evict expired workflows at most once a minute (the lock must be held)."""
+        if now >= self._next_sweep:
+            self._evict_expired_locked(now)
+            self._next_sweep = now + min(self.ttl, 60.0)
+
+    def _evict_expired_locked(self, now: float) -> int:
+        """Evict expired workflows (the lock must be held)."""
+        expired = [
+            workflow_id
+            for workflow_id, workflow in self._workflows.items()
+            if self._is_expired(workflow, now)
+        ]
+        for workflow_id in expired:
+            del self._workflows[workflow_id]
+        return len(expired)
+
+
+class PostgresWorkflowStore(WorkflowStore):
+    """
+    PostgreSQL store shared by every worker behind the load balancer.
+
+    Each method is a single SQL statement, so status/progress updates and result merges
+    (jsonb concatenation) are atomic without explicit locking.
+    """
+
+    def __init__(self, dsn: str | None = None, ttl: float | None = None, max_connections: int = 10):
+        """
+        Initialize the store and create its table if needed.
+
+        Args:
+            dsn: PostgreSQL connection string (defaults to settings.database_url)
+            ttl: Retention of finished workflows, in seconds (defaults to settings)
+            max_connections: Size of the connection pool
+        """
+        from psycopg2.pool import ThreadedConnectionPool
+
+        super().__init__(ttl)
+        self._pool = ThreadedConnectionPool(1, max_connections, dsn or settings.database_url)
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = 0.0
+        self._execute(
+            """
+            CREATE TABLE IF NOT EXISTS workflows (
+                workflow_id TEXT PRIMARY KEY,
+                adresse TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+                results JSONB NOT NULL DEFAULT '{}'::jsonb,
+                error TEXT,
+                created_at DOUBLE PRECISION NOT NULL,
+                updated_at DOUBLE PRECISION NOT NULL,
+                finished_at DOUBLE PRECISION
+            );
+            CREATE INDEX IF NOT EXISTS idx_workflows_finished_at ON workflows (finished_at);
+            """
+        )
+
+    def _execute(self, query: str, params: tuple = (), fetch: bool = False) -> Any:
+        """Run one statement in its own transaction and return the rows if fetch is set."""
+        connection = self._pool.getconn()
+        try:
+            with connection, connection.cursor() as cursor:
+                cursor.execute(query, params)
+                if fetch:
+                    return cursor.fetchall()
+                return cursor.rowcount
+        finally:
+            self._pool.putconn(connection)
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        self._pool.closeall()
+
+    def create(self, workflow_id: str, adresse: str) -> dict[str, Any]:
+        """Register a new pending workflow and return it."""
+        now = time.time()
+        self._execute(
+            "INSERT INTO workflows (workflow_id, adresse, status, created_at, updated_at) "
+            "VALUES (%s, %s, 'pending', %s, %s)",
+            (workflow_id, adresse, now, now),
+        )
+        self._sweep(now)
+        return self.get(workflow_id)
+
+    def get(self, workflow_id: str) -> dict[str, Any] | None:
+        """Return a workflow, or None."""
+        rows = self._execute(
+            "SELECT workflow_id, adresse, status, progress, results, error, created_at, "
+            "updated_at, finished_at FROM workflows WHERE workflow_id = %s "
+            "AND (finished_at IS NULL OR finished_at >= %s)",
+            (workflow_id, time.time() - self.ttl),
+            fetch=True,
+        )
+        if not rows:
+            return None
+        keys = (
+            "workflow_id",
+            "adresse",
+            "status",
+            "progress",
+            "results",
+            "error",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        )
+        return dict(zip(keys, rows[0]))
+
+    def update(self, workflow_id: str, **fields: Any) -> None:
+        """Atomically update status, progress and/or error."""
+        _check_fields(fields)
+        now = time.time()
+        assignments = [f"{name} = %s" for name in fields]
+        params: list[Any] = list(fields.values())
+        assignments.append("updated_at = %s")
+        params.append(now)
+        if "status" in fields:
+            # A resumed workflow is no longer finished
+            assignments.append("finished_at = %s")
+            params.append(now if fields["status"] in FINISHED_STATUSES else None)
+
+        updated = self._execute(
+            f"UPDATE workflows SET {', '.join(assignments)} WHERE workflow_id = %s",
+            (*params, workflow_id),
+        )
+        if not updated:
+            raise KeyError(workflow_id)
+        self._publish(workflow_id, fields)
+
+    def set_result(self, workflow_id: str, key: str, value: Any) -> None:
+        """Atomically store one entry of the workflow results."""
+        updated = self._execute(
+            "UPDATE workflows SET results = results || jsonb_build_object(%s, %s::jsonb), "
+            "updated_at = %s WHERE workflow_id = %s",
+            (key, json.dumps(value, default=_json_default), time.time(), workflow_id),
+        )
+        if not updated:
+            raise KeyError(workflow_id)
+        self._publish(workflow_id, {"result": key})
+
+    def evict_expired(self) -> int:
+        """Delete finished workflows older than the TTL."""
+        return self._execute(
+            "DELETE FROM workflows WHERE finished_at < %s", (time.time() - self.ttl,)
+        )
+
+    def _sweep(self, now: float) -> None:
+        """Evict expired workflows at most once a minute per worker."""
+        with self._sweep_lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + min(self.ttl, 60.0)
+        self.evict_expired()
+
+
+def create_workflow_store() -> WorkflowStore:
+    """Build the store selected by settings.workflow_store ("memory" or "postgres")."""
+    if settings.workflow_store == "postgres":
+        return PostgresWorkflowStore()
+    if settings.workflow_store == "memory":
+        return InMemoryWorkflowStore()
+    raise ValueError(f"Stockage de workflow inconnu: {settings.workflow_store}")
+
+
+_default_store: WorkflowStore | None = None
+
+
+def get_workflow_store() -> WorkflowStore:
+    """Return the application-wide store, created on first use."""
+    global _default_store
+    if _default_store is None:
+        _default_store = create_workflow_store()
+    return _default_store
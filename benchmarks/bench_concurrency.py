@@ -0,0 +1,95 @@
+"""Measure /city-information throughput as the number of parallel requests grows.
+
+The LLM sub-agents are replaced by a fake with a fixed latency and commune resolution by a
+local lookup (no geocoding request), so the benchmark measures how well the API overlaps
+requests rather than the model or the API Adresse. The city information cache is
+disabled (every request is a miss). With --blocking the fake sleeps synchronously inside
+the event loop, reproducing an endpoint that calls a blocking agent: throughput then stays
+flat whatever the concurrency.
+
+Usage:
+    python -m benchmarks.bench_concurrency [--latency 0.2] [--requests 64] [--blocking]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from backend.agents.city_information import agent as city_agent
+from backend.agents.city_information import cache as city_cache
+from backend.api.main import app
+from backend.config import settings
+from backend.utils.http_client import http_clients
+
+CITY_INFORMATION = {
+    "situation": "Situation",
+    "politique_color": "Couleur politique",
+    "qualitative_presentation": "Présentation",
+}
+
+
+class FakeAgent:
+    """City information sub-agent answering after a fixed latency (any block)."""
+
+    def __init__(self, latency: float, blocking: bool):
+        """Initialize the fake agent."""
+        self.latency = latency
+        self.blocking = blocking
+
+    async def ainvoke(self, payload: dict) -> dict:
+        """Answer after the latency, blocking the event loop if requested."""
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return {"structured_response": CITY_INFORMATION}
+
+
+async def resolve_commune(adress_in: str, client: httpx.AsyncClient | None = None):
+    """Resolve every address to its own commune without geocoding it."""
+    return f"nom:{adress_in}", adress_in
+
+
+async def run(requests: int, concurrency: int) -> float:
+    """Send `requests` requests with at most `concurrency` in flight; return requests/s."""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    http_clients.open()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(index: int) -> None:
+            async with semaphore:
+                response = await client.post("/city-information", json={"adress_in": f"{index}"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(requests)))
+        elapsed = time.perf_counter() - start
+    await http_clients.aclose()
+    return requests / elapsed
+
+
+def main() -> None:
+    """Run the benchmark for increasing concurrency levels and print the throughput."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+
+    city_agent.city_information_agents = dict.fromkeys(
+        city_agent.BLOCKS, FakeAgent(args.latency, args.blocking)
+    )
+    settings.cache_enabled = False
+    mode = "blocking" if args.blocking else "async"
+    city_cache.resolve_commune = resolve_commune
+    for concurrency in (1, 4, 16, 64):
+        throughput = asyncio.run(run(args.requests, concurrency))
+        print(f"{mode}, concurrency {concurrency:>2}: {throughput:6.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
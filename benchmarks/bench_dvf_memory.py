@@ -0,0 +1,148 @@
+"""Memory held by a large DVF result: legacy dicts vs compact typed transactions.
+
+Serves a stubbed API CQuest DVF response (a dense Paris radius) through an in-process
+transport and measures, with tracemalloc, the memory still held by the returned result.
+
+Usage:
+    python -m benchmarks.bench_dvf_memory [--features 20000]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import tracemalloc
+from typing import Any
+
+import httpx
+
+from backend.utils.dvf import _format_address, get_dvf_transactions
+
+
+def build_response(n_features: int) -> bytes:
+    """Build a CQuest-like DVF FeatureCollection with n_features transactions."""
+    random.seed(0)
+    features = []
+    for i in range(n_features):
+        lat, lon = 48.86 + random.uniform(-0.002, 0.002), 2.34 + random.uniform(-0.002, 0.002)
+        properties = {
+            "id_mutation": f"2019-{i}",
+            "date_mutation": f"2019-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+            "numero_disposition": "000001",
+            "nature_mutation": "Vente",
+            "valeur_fonciere": round(random.uniform(1e5, 2e6), 2),
+            "numero_voie": random.randint(1, 150),
+            "suffixe_numero": None,
+            "type_voie": "RUE",
+            "code_voie": "1234",
+            "voie": "DE RIVOLI",
+            "code_postal": "75001",
+            "commune": "Paris 1er Arrondissement",
+            "code_departement": "75",
+            "code_commune": "75101",
+            "prefixe_section": "000",
+            "section": "AB",
+            "numero_plan": f"{i:04d}",
+            "numero_volume": None,
+            "lot1": str(random.randint(1, 300)),
+            "surface_lot1": round(random.uniform(10, 150), 2),
+            "lot2": None,
+            "surface_lot2": None,
+            "nombre_lots": 1,
+            "code_type_local": 2,
+            "type_local": "Appartement",
+            "surface_relle_bati": random.randint(10, 200),
+            "nombre_pieces_principales": random.randint(1, 6),
+            "nature_culture": None,
+            "nature_culture_speciale": None,
+            "surface_terrain": None,
+            "lat": lat,
+            "lon": lon,
+        }
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": properties,
+            }
+        )
+    return json.dumps(
+        {
+            "type": "Featurecollection",
+            "source": "DGFiP / DVF",
+            "derniere_maj": "2020-04",
+            "licence": "https://www.etalab.gouv.fr/licence-ouverte-open-licence",
+            "features": features,
+        }
+    ).encode()
+
+
+def legacy_result(data: dict[str, Any]) -> dict[str, Any]:
+    """Reproduce the former dict-based result (parsed fields plus raw payloads)."""
+    transactions = []
+    for feature in data["features"]:
+        props = feature["properties"]
+        transactions.append(
+            {
+                "date_mutation": props.get("date_mutation"),
+                "nature_mutation": props.get("nature_mutation"),
+                "valeur_fonciere": props.get("valeur_fonciere"),
+                "type_local": props.get("type_local"),
+                "code_type_local": props.get("code_type_local"),
+                "surface_relle_bati": props.get("surface_relle_bati"),
+                "nombre_pieces_principales": props.get("nombre_pieces_principales"),
+                "surface_terrain": props.get("surface_terrain"),
+                "adresse": _format_address(props),
+                "coordonnees": {"lat": props.get("lat"), "lon": props.get("lon")},
+                "raw_properties": props,
+            }
+        )
+    return {"transactions": transactions, "count": len(transactions), "raw_response": data}
+
+
+async def measure(payload: bytes, variant: str) -> tuple[int, int]:
+    """Return (bytes held by the result, transaction count) for one variant."""
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=payload))
+    async with httpx.AsyncClient(transport=transport) as client:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        if variant == "legacy":
+            response = await client.get("https://stub/dvf")
+            result = legacy_result(response.json())
+            count = result["count"]
+            del response
+        else:
+            result = await get_dvf_transactions(
+                48.86, 2.34, client=client, include_raw=variant == "include_raw"
+            )
+            count = result.count
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del result
+    return held, count
+
+
+def main() -> None:
+    """Run the benchmark and print the memory held by each variant."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--features", type=int, default=20_000)
+    args = parser.parse_args()
+
+    payload = build_response(args.features)
+    print(f"Stubbed DVF response: {args.features} features, {len(payload) / 1e6:.1f} MB JSON")
+
+    baseline = None
+    for variant in ("legacy", "include_raw", "compact"):
+        held, count = asyncio.run(measure(payload, variant))
+        baseline = baseline or held
+        print(
+            f"{variant:<12} {held / 1e6:8.1f} MB held  {held / count:7.0f} B/transaction  "
+            f"({held / baseline:.0%} of legacy)"
+        )
+
+
+if __name__ == "__main__":
+    main()
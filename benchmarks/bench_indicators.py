@@ -0,0 +1,54 @@
+"""Time the vectorised price indicators on a commune-sized synthetic DVF table.
+
+Usage:
+    python -m benchmarks.bench_indicators [--rows 200000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.utils.dvf_table import DVFTable
+from backend.utils.indicators import compute_price_indicators
+
+
+def build_table(rows: int) -> DVFTable:
+    """Build a synthetic table of `rows` mutations over 10 years."""
+    rng = np.random.default_rng(0)
+    surface = rng.uniform(15, 200, rows)
+    return DVFTable(
+        id_mutation=np.char.add("m", np.arange(rows).astype(str)),
+        date_mutation=np.datetime64("2014-01-01") + rng.integers(0, 3650, rows),
+        type_local=rng.integers(0, 4, rows).astype(np.int8),
+        valeur_fonciere=surface * rng.lognormal(np.log(4000), 0.3, rows),
+        surface_reelle_bati=surface,
+        nombre_pieces_principales=rng.integers(0, 9, rows).astype(np.float64),
+        surface_terrain=np.full(rows, np.nan),
+        lat=np.full(rows, np.nan),
+        lon=np.full(rows, np.nan),
+    )
+
+
+def main() -> None:
+    """Run the benchmark and print the timing."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    table = build_table(args.rows)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        indicators = compute_price_indicators(table)
+        timings.append(time.perf_counter() - start)
+
+    print(
+        f"{args.rows} mutations, {indicators['nb_ventes_retenues']} sales used: "
+        f"best {min(timings) * 1000:.1f} ms, median {np.median(timings) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""End-to-end load test of /city-information and the analysis workflow on local stubs.
+
+API Adresse, API Carto and DVF are served by a local HTTP server, and the city
+information sub-agents are replaced by a fake standing in for the chat model and its
+web searches. Each stub answers after a configurable latency and fails at a configurable
+rate (503 for the APIs, an exception for the agent). Each scenario is driven at
+increasing concurrency: POST /city-information through the FastAPI app, and
+WorkflowOrchestrator.run_workflow on the full analysis graph (PDF report included).
+
+For every level the benchmark reports throughput, p50/p95/p99 latency, errors, peak
+memory and the mean time of each stage (upstream requests, agent run, workflow nodes)
+taken from the application metrics. Results are written as JSON, with the commit they
+were measured on, so two runs can be compared with --compare.
+
+Usage:
+    python -m benchmarks.bench_load [--scenarios city_information workflow]
+        [--requests 64] [--concurrency 1 4 16 64] [--upstream-latency 0.02]
+        [--agent-latency 0.2] [--error-rate 0.0] [--memory]
+        [--output bench_load.json] [--compare previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from backend.agents.city_information import agent as city_agent
+from backend.agents.graph import NODE_STATUSES
+from backend.api.main import app
+from backend.config import settings
+from backend.utils.http_client import UPSTREAMS, http_clients
+from backend.utils.metrics import metrics
+from backend.workflow import WorkflowOrchestrator
+from backend.workflow_store import InMemoryWorkflowStore
+
+CITY_INFORMATION = {
+    "situation": "Situation",
+    "politique_color": "Couleur politique",
+    "qualitative_presentation": "Présentation",
+}
+
+
+class _Server(ThreadingHTTPServer):
+    """Threaded server with a listen backlog large enough for concurrent clients."""
+
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class UpstreamStubs:
+    """
+    Local server answering API Adresse /search/, API Carto parcel and DVF requests.
+
+    Every address geocodes to its own commune (named after the address) in Rennes, every
+    point to one parcel, and every DVF query to `transactions` synthetic mutations.
+
+    Usage:
+        with UpstreamStubs(latency=0.02, error_rate=0.01) as stubs:
+            settings.api_adresse_url = stubs.url
+    """
+
+    def __init__(self, latency: float, error_rate: float, transactions: int = 50):
+        """
+        Initialize the stubs.
+
+        Args:
+            latency: Seconds each request takes before it is answered
+            error_rate: Fraction of requests answered with a 503
+            transactions: Number of DVF mutations in each DVF response
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.dvf_payload = json.dumps(_dvf_collection(transactions)).encode()
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running stubs."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "UpstreamStubs":
+        """Start serving in a background thread."""
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802
+                time.sleep(stubs.latency)
+                if random.random() < stubs.error_rate:
+                    self._send(b'{"message": "stub error"}', status=503)
+                    return
+                url = urlparse(self.path)
+                if url.path == "/search/":
+                    query = parse_qs(url.query).get("q", [""])[0]
+                    self._send(json.dumps(_geocode_collection(query)).encode())
+                elif url.path == "/api/cadastre/parcelle":
+                    self._send(json.dumps(_PARCEL_COLLECTION).encode())
+                elif url.path == "/dvf":
+                    self._send(stubs.dvf_payload)
+                else:
+                    self._send(b'{"message": "not found"}', status=404)
+
+            def _send(self, payload: bytes, status: int = 200) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _geocode_collection(query: str) -> dict[str, Any]:
+    """API Adresse answer for any query: a point in Rennes, in a commune of its own."""
+    return {
+        "features": [
+            {
+                "geometry": {"coordinates": [-1.68, 48.11]},
+                "properties": {"label": query, "score": 0.95, "city": query, "postcode": "35000"},
+            }
+        ]
+    }
+
+
+_PARCEL_COLLECTION = {
+    "features": [
+        {
+            "properties": {
+                "id": "35238000AB0001",
+                "section": "AB",
+                "numero": "1",
+                "nom_com": "Rennes",
+            },
+            "geometry": {"type": "Point", "coordinates": [-1.68, 48.11]},
+        }
+    ]
+}
+
+
+def _dvf_collection(transactions: int) -> dict[str, Any]:
+    """API CQuest DVF answer with `transactions` mutations (seeded)."""
+    rng = random.Random(0)
+    features = []
+    for index in range(transactions):
+        surface = rng.uniform(20, 150)
+        features.append(
+            {
+                "properties": {
+                    "id_mutation": f"2019-{index}",
+                    "date_mutation": f"{rng.randint(2014, 2023)}-{rng.randint(1, 12):02d}-15",
+                    "nature_mutation": "Vente",
+                    "type_local": rng.choice(("Appartement", "Maison")),
+                    "valeur_fonciere": round(surface * rng.uniform(2500, 5500), 2),
+                    "surface_relle_bati": round(surface),
+                    "nombre_pieces_principales": rng.randint(1, 6),
+                    "lat": 48.11 + rng.uniform(-0.001, 0.001),
+                    "lon": -1.68 + rng.uniform(-0.001, 0.001),
+                }
+            }
+        )
+    return {"type": "Featurecollection", "features": features}
+
+
+class FakeAgent:
+    """City information sub-agent answering after a fixed latency, failing at a given rate."""
+
+    def __init__(self, latency: float, error_rate: float):
+        """Initialize the fake agent."""
+        self.latency = latency
+        self.error_rate = error_rate
+
+    async def ainvoke(self, payload: dict) -> dict:
+        """Answer after the latency, or fail like a model call that errored."""
+        await asyncio.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise RuntimeError("fake model error")
+        return {"structured_response": CITY_INFORMATION}
+
+
+async def city_information(client: httpx.AsyncClient, _: Any, index: int) -> bool:
+    """POST /city-information for a new commune; return whether the answer is complete."""
+    response = await client.post(
+        "/city-information", json={"adress_in": f"{index} rue de la Charge, Ville{index}"}
+    )
+    response.raise_for_status()
+    return True
+
+
+async def workflow(_: httpx.AsyncClient, orchestrator: WorkflowOrchestrator, index: int) -> bool:
+    """Run one analysis workflow; return whether every branch succeeded."""
+    workflow_id = orchestrator.create_workflow(f"{index} rue de la Charge, Ville{index}")
+    await orchestrator.run_workflow(workflow_id)
+    state = orchestrator.get_workflow_status(workflow_id)
+    return not state["results"].get("errors")
+
+
+SCENARIOS: dict[str, Callable[[httpx.AsyncClient, Any, int], Awaitable[bool]]] = {
+    "city_information": city_information,
+    "workflow": workflow,
+}
+
+# Stages read from the application metrics: (histogram name, labels) by stage name
+STAGES = {
+    **{
+        f"upstream:{upstream}": ("upstream_request", {"upstream": upstream})
+        for upstream in UPSTREAMS
+    },
+    "agent_run": ("agent_run", {"agent": "city_information"}),
+    **{f"node:{node}": ("workflow_node", {"node": node}) for node in NODE_STATUSES},
+}
+
+
+def _percentile(ordered: list[float], quantile: float) -> float | None:
+    """Nearest-rank percentile of sorted values, in milliseconds (None without values)."""
+    if not ordered:
+        return None
+    rank = min(len(ordered) - 1, max(0, round(quantile * len(ordered)) - 1))
+    return round(ordered[rank] * 1000, 2)
+
+
+def _stages() -> dict[str, dict[str, float]]:
+    """Count and mean time (ms) of each stage recorded since the last metrics reset."""
+    stages = {}
+    for stage, (name, labels) in STAGES.items():
+        histogram = metrics.histogram(name, **labels)
+        if histogram and histogram["count"]:
+            mean = histogram["sum"] / histogram["count"] * 1000
+            stages[stage] = {"count": histogram["count"], "mean_ms": round(mean, 2)}
+    return stages
+
+
+async def run_level(
+    scenario: str, requests: int, concurrency: int, trace_memory: bool
+) -> dict[str, Any]:
+    """Send `requests` requests with at most `concurrency` in flight and summarise them."""
+    run = SCENARIOS[scenario]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: Counter[str] = Counter()
+    degraded = 0
+
+    metrics.reset()
+    http_clients.reset_policies()
+    http_clients.open()
+    orchestrator = WorkflowOrchestrator(store=InMemoryWorkflowStore())
+    if trace_memory:
+        tracemalloc.start()
+    # Application errors become 500 responses, as behind a real server
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(index: int) -> None:
+            nonlocal degraded
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    complete = await run(client, orchestrator, index)
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+                degraded += not complete
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    peak_memory = None
+    if trace_memory:
+        peak_memory = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    await http_clients.aclose()
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": _percentile(latencies, 1.0),
+        },
+        "errors": dict(errors),
+        "degraded": degraded,
+        "peak_traced_mib": peak_memory,
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": _stages(),
+    }
+
+
+def _commit() -> str | None:
+    """Commit of the working tree ("-dirty" if it has uncommitted changes), if in git."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: dict[str, Any], current: dict[str, Any]) -> None:
+    """Print the throughput and p95 changes of every level measured in both runs."""
+    print(f"\nCompared with {previous.get('commit')} ({previous.get('date')}):")
+    for scenario, levels in current["results"].items():
+        before = {level["concurrency"]: level for level in previous["results"].get(scenario, [])}
+        for level in levels:
+            old = before.get(level["concurrency"])
+            if old is None or not old["throughput"] or not old["latency_ms"]["p95"]:
+                continue
+            throughput = level["throughput"] / old["throughput"] - 1
+            p95 = (level["latency_ms"]["p95"] or 0) / old["latency_ms"]["p95"] - 1
+            print(
+                f"{scenario:>16}, concurrency {level['concurrency']:>3}: "
+                f"throughput {throughput:+7.1%}, p95 {p95:+7.1%}"
+            )
+
+
+def main() -> None:
+    """Run the scenarios at each concurrency level, print a summary and save the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--upstream-latency", type=float, default=0.02)
+    parser.add_argument("--agent-latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--memory", action="store_true", help="trace peak Python memory")
+    parser.add_argument("--output", default="bench_load.json", help="JSON results file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    args = parser.parse_args()
+
+    city_agent.city_information_agents = dict.fromkeys(
+        city_agent.BLOCKS, FakeAgent(args.agent_latency, args.error_rate)
+    )
+    settings.cache_enabled = False
+    settings.geocoder_backend = settings.cadastre_backend = settings.dvf_backend = "api"
+    # The stubs have no quota: measure the application, not the client-side limits
+    settings.api_adresse_rate_limit = settings.api_carto_rate_limit = 0
+    settings.dvf_api_rate_limit = 0
+
+    results: dict[str, list[dict[str, Any]]] = {}
+    with (
+        tempfile.TemporaryDirectory(prefix="bench_load_") as reports_dir,
+        UpstreamStubs(args.upstream_latency, args.error_rate) as stubs,
+    ):
+        # Passed to the PDF pool worker by the report node (see backend.agents.graph)
+        settings.reports_dir = reports_dir
+        settings.api_adresse_url = settings.api_carto_url = settings.dvf_api_url = stubs.url
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                level = asyncio.run(run_level(scenario, args.requests, concurrency, args.memory))
+                results.setdefault(scenario, []).append(level)
+                latency = level["latency_ms"]
+                print(
+                    f"{scenario:>16}, concurrency {concurrency:>3}: "
+                    f"{level['throughput']:7.1f} req/s, p50 {latency['p50']} ms, "
+                    f"p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+                    f"errors {sum(level['errors'].values())}, degraded {level['degraded']}"
+                )
+
+    report = {
+        "commit": _commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "parameters": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            compare(json.load(handle), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Measure PDF reports per second, sequentially and in a process pool.
+
+Each report embeds the price and trend charts of a synthetic commune (PNG bytes rendered
+once up front), so the timing covers the ReportLab layout and image embedding only.
+
+Usage:
+    python -m benchmarks.bench_reports [--reports 40] [--workers 1 2 4]
+"""
+
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.utils.indicators import compute_price_indicators
+from backend.utils.pdf_generator import build_pdf_report
+from backend.utils.plotting import generate_price_chart, generate_trend_chart
+from benchmarks.bench_indicators import build_table
+
+
+def main() -> None:
+    """Run the benchmark and print the throughput of each configuration."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--reports", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    indicators = compute_price_indicators(build_table(args.rows))
+    images = {
+        "price_chart": generate_price_chart(indicators),
+        "trend_chart": generate_trend_chart(indicators),
+    }
+
+    start = time.perf_counter()
+    for _ in range(args.reports):
+        size = len(build_pdf_report(indicators, images))
+    elapsed = time.perf_counter() - start
+    print(f"sequential: {args.reports / elapsed:6.1f} reports/s ({size / 1024:.0f} KiB each)")
+
+    context = multiprocessing.get_context("spawn")
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            # Warm the workers up so process start-up is not timed
+            list(pool.map(build_pdf_report, [{}] * workers, [{}] * workers))
+            start = time.perf_counter()
+            reports = list(
+                pool.map(build_pdf_report, [indicators] * args.reports, [images] * args.reports)
+            )
+            elapsed = time.perf_counter() - start
+        assert all(report.startswith(b"%PDF") for report in reports)
+        print(f"{workers} worker(s): {args.reports / elapsed:6.1f} reports/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure the import time and baseline RSS of the API and the backend packages.
+
+Each target is imported in a fresh interpreter run with `-X importtime`; the benchmark
+reports the total import time (interpreter start-up included), the slowest direct
+dependencies of the imported modules and the peak RSS of the process. The "eager"
+target also loads the chart, PDF and agent stacks, for comparison with what a worker
+serving only /health loads.
+
+Usage:
+    python -m benchmarks.bench_startup [--top 8] [--repeat 3] [api utils agents eager]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    "api": "import backend.api.main",
+    "utils": "import backend.utils",
+    "agents": "import backend.agents",
+    "eager": (
+        "import backend.api.main, matplotlib.figure, plotly.graph_objects, "
+        "reportlab.platypus, backend.agents.graph"
+    ),
+}
+
+# Printed by the child process after the imports, parsed from stdout
+_RSS_PROBE = "; import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def measure(statement: str) -> tuple[float, int, list[tuple[int, str]]]:
+    """
+    Import in a fresh interpreter.
+
+    Returns:
+        Tuple (total import time in ms, peak RSS in KiB, direct dependencies of the
+        top-level imports as (cumulative µs, module) pairs)
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement + _RSS_PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total, dependencies = 0, []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Names are indented by two spaces per nesting level (after one separator space)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            total += int(cumulative)
+        elif depth == 1:
+            dependencies.append((int(cumulative), name.strip()))
+    return total / 1000, int(completed.stdout.split()[-1]), dependencies
+
+
+def main() -> None:
+    """Run the benchmark and print one summary per target."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=8, help="slowest dependencies to list")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("targets", nargs="*", help=f"subset of {', '.join(TARGETS)}")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    for target in args.targets or TARGETS:
+        runs = [measure(TARGETS[target]) for _ in range(args.repeat)]
+        total_ms = statistics.median(run[0] for run in runs)
+        rss_mib = statistics.median(run[1] for run in runs) / 1024
+        print(f"{target:>7}: import {total_ms:7.1f} ms, peak RSS {rss_mib:6.1f} MiB")
+        for cumulative, name in sorted(runs[-1][2], reverse=True)[: args.top]:
+            print(f"{'':>9}{cumulative / 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Shared pytest fixtures."""
+
+import pytest
+
+from backend.config import settings
+from backend.utils.http_client import http_clients
+
+
+@pytest.fixture(autouse=True)
+def disable_lookup_cache(monkeypatch):
+    """Bypass the persistent lookup caches so tests always reach their stubs."""
+    monkeypatch.setattr(settings, "cache_enabled", False)
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream_policies():
+    """Start every test with closed circuits, full token buckets and no latency history."""
+    yield
+    http_clients.reset_policies()
@@ -0,0 +1,133 @@
+"""Local stub servers and synthetic data standing in for upstream APIs in tests."""
+
+import csv
+import io
+import json
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from backend.utils.dvf_table import DVFTable
+
+
+class _Server(ThreadingHTTPServer):
+    """Threaded server with a listen backlog large enough for concurrent clients."""
+
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class APIAdresseStub:
+    """
+    Minimal API Adresse server answering /search/ and /search/csv/ on localhost.
+
+    Addresses listed in `known` resolve to their coordinates; any other address is not found.
+
+    Usage:
+        with APIAdresseStub({"1 rue A, Rennes": (48.1, -1.6)}) as stub:
+            settings.api_adresse_url = stub.url
+    """
+
+    def __init__(self, known: dict[str, tuple[float, float]]):
+        """Initialize the stub with the addresses it knows about."""
+        self.known = known
+        self.requests: list[str] = []
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running stub."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "APIAdresseStub":
+        """Start serving in a background thread."""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802
+                stub.requests.append(self.path)
+                query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+                features = []
+                if query in stub.known:
+                    lat, lon = stub.known[query]
+                    features.append(
+                        {
+                            "geometry": {"coordinates": [lon, lat]},
+                            "properties": {
+                                "label": query,
+                                "score": 0.95,
+                                "city": "Rennes",
+                                "citycode": "35238",
+                            },
+                        }
+                    )
+                self._send(json.dumps({"features": features}).encode(), "application/json")
+
+            def do_POST(self) -> None:  # noqa: N802
+                stub.requests.append(self.path)
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+                )
+                fields = {
+                    part.get_param("name", header="content-disposition"): part.get_content()
+                    for part in message.iter_parts()
+                }
+                data = fields["data"]
+                text = data.decode("utf-8") if isinstance(data, bytes) else data
+
+                output = io.StringIO()
+                writer = csv.writer(output)
+                writer.writerow(
+                    ["id", "q", "latitude", "longitude", "result_label", "result_score"]
+                    + ["result_city", "result_citycode", "result_postcode", "result_status"]
+                )
+                for row in csv.DictReader(io.StringIO(text)):
+                    if row["q"] in stub.known:
+                        lat, lon = stub.known[row["q"]]
+                        result = [lat, lon, row["q"], 0.95, "Rennes", "35238", "35000", "ok"]
+                    else:
+                        result = ["", "", "", "", "", "", "", "not-found"]
+                    writer.writerow([row["id"], row["q"], *result])
+                self._send(output.getvalue().encode(), "text/csv")
+
+            def _send(self, payload: bytes, content_type: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def build_dvf_table(rows: int) -> DVFTable:
+    """Build a synthetic DVF table of `rows` mutations over 10 years (seeded)."""
+    rng = np.random.default_rng(0)
+    surface = rng.uniform(15, 200, rows)
+    return DVFTable(
+        id_mutation=np.char.add("m", np.arange(rows).astype(str)),
+        date_mutation=np.datetime64("2014-01-01") + rng.integers(0, 3650, rows),
+        type_local=rng.integers(0, 4, rows).astype(np.int8),
+        valeur_fonciere=surface * rng.lognormal(np.log(4000), 0.3, rows),
+        surface_reelle_bati=surface,
+        nombre_pieces_principales=rng.integers(0, 9, rows).astype(np.float64),
+        surface_terrain=np.full(rows, np.nan),
+        lat=np.full(rows, np.nan),
+        lon=np.full(rows, np.nan),
+    )
@@ -0,0 +1,128 @@
+"""Tests for the local BAN geocoder."""
+
+import csv
+import gzip
+
+import pytest
+
+from backend.config import settings
+from backend.utils import ban_store as ban_store_module
+from backend.utils import cadastre
+from backend.utils.ban_store import BANStore, parse_query
+from tests.stubs import APIAdresseStub
+
+COLUMNS = ["id", "numero", "rep", "nom_voie", "code_postal", "code_insee", "nom_commune"]
+ROWS = [
+    (1, "", "Rue de la Monnaie", 48.1130, -1.6810),
+    (3, "", "Rue de la Monnaie", 48.1132, -1.6812),
+    (3, "bis", "Rue de la Monnaie", 48.1133, -1.6813),
+    (12, "", "Boulevard de la Liberté", 48.1060, -1.6780),
+    (14, "", "Boulevard de la Liberté", 48.1062, -1.6782),
+    (2, "", "Avenue Janvier", 48.1040, -1.6720),
+    (5, "", "Place Sainte-Anne", 48.1150, -1.6800),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Build a store from one Rennes BAN file."""
+    path = tmp_path / "adresses-35.csv.gz"
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle, delimiter=";")
+        writer.writerow([*COLUMNS, "lon", "lat"])
+        for numero, rep, nom_voie, lat, lon in ROWS:
+            writer.writerow(
+                ["35238_x", numero, rep, nom_voie, "35000", "35238", "Rennes", lon, lat]
+            )
+        # Addresses without a position are skipped
+        writer.writerow(["35238_y", 7, "", "Rue Nantaise", "35000", "35238", "Rennes", "", ""])
+
+    ban_store = BANStore(str(tmp_path / "ban.sqlite"))
+    assert ban_store.ingest([str(path)]) == len(ROWS)
+    # Files are only ingested once
+    assert ban_store.ingest([str(path)]) == 0
+    yield ban_store
+    ban_store.close()
+
+
+def test_parse_query():
+    """House number, repetition index and postcode are split from the street words."""
+    assert parse_query("3 bis r. de la Monnaie 35000 Rennes") == (
+        3,
+        "bis",
+        "35000",
+        ["rue", "de", "la", "monnaie", "rennes"],
+    )
+    assert parse_query("12B bd Liberté") == (12, "b", None, ["boulevard", "liberte"])
+
+
+def test_exact_match(store):
+    """A well-formed address resolves to its house number with a full score."""
+    result = store.geocode("3 bis rue de la Monnaie 35000 Rennes")
+
+    assert result == {
+        "latitude": 48.1133,
+        "longitude": -1.6813,
+        "full_address": "3bis Rue de la Monnaie 35000 Rennes",
+        "score": 1.0,
+        "city": "Rennes",
+        "citycode": "35238",
+        "postcode": "35000",
+    }
+
+
+def test_abbreviation_and_typo(store):
+    """Abbreviations are expanded and misspelled words matched through their trigrams."""
+    result = store.geocode("14 bd de la Libreté, Rennes")
+
+    assert result["full_address"] == "14 Boulevard de la Liberté 35000 Rennes"
+    assert (result["latitude"], result["longitude"]) == (48.1062, -1.6782)
+    assert 0.7 <= result["score"] < 1.0
+
+
+def test_missing_number_is_penalised(store):
+    """An unknown house number answers the nearest one, with a lower score."""
+    result = store.geocode("13 boulevard de la Liberté 35000 Rennes")
+
+    assert result["full_address"] == "12 Boulevard de la Liberté 35000 Rennes"
+    assert result["score"] == pytest.approx(0.8)
+    assert store.geocode("rue inconnue 35000 Rennes")["score"] < 0.7
+    assert store.geocode("zzz qqq") is None
+
+
+@pytest.mark.asyncio
+async def test_local_backend_falls_back_to_api(store, monkeypatch):
+    """Confident local matches skip the API; the others are sent to it."""
+    monkeypatch.setattr(settings, "geocoder_backend", "local")
+    monkeypatch.setattr(ban_store_module, "ban_store", store)
+    known = {"10 rue Inconnue, Rennes": (48.12, -1.69), "9 rue Ailleurs, Brest": (48.39, -4.48)}
+
+    with APIAdresseStub(known) as stub:
+        monkeypatch.setattr(settings, "api_adresse_url", stub.url)
+        single = await cadastre.geocode_address("1 rue de la Monnaie, Rennes")
+        assert stub.requests == []
+        fallback = await cadastre.geocode_address("10 rue Inconnue, Rennes")
+        batch = await cadastre.geocode_addresses(
+            ["2 av Janvier Rennes", "9 rue Ailleurs, Brest", "nulle part"]
+        )
+
+    assert (single["latitude"], single["longitude"]) == (48.113, -1.681)
+    assert (fallback["latitude"], fallback["longitude"]) == (48.12, -1.69)
+    assert batch[0]["full_address"] == "2 Avenue Janvier 35000 Rennes"
+    assert (batch[1]["latitude"], batch[1]["longitude"]) == (48.39, -4.48)
+    assert batch[2] is None
+    # One /search/ request for the fallback, one CSV request for the two unmatched addresses
+    assert len(stub.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_local_backend_without_store(tmp_path, monkeypatch):
+    """Without a built index every address goes to the API."""
+    monkeypatch.setattr(settings, "geocoder_backend", "local")
+    monkeypatch.setattr(ban_store_module, "ban_store", BANStore(str(tmp_path / "missing.sqlite")))
+
+    with APIAdresseStub({"1 rue A, Rennes": (48.11, -1.68)}) as stub:
+        monkeypatch.setattr(settings, "api_adresse_url", stub.url)
+        result = await cadastre.geocode_address("1 rue A, Rennes")
+
+    assert (result["latitude"], result["longitude"]) == (48.11, -1.68)
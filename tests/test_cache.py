@@ -0,0 +1,174 @@
+"""Tests for the two-tier lookup cache."""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.config import settings
+from backend.utils import cache as cache_module
+from backend.utils import cadastre
+from backend.utils.cache import TTLCache, coordinates_key, normalize_address
+from backend.utils.cadastre import geocode_address, geocode_addresses
+from tests.stubs import APIAdresseStub
+
+
+@pytest.fixture
+def enable_cache(monkeypatch):
+    """Re-enable the lookup caches disabled by the autouse fixture."""
+    monkeypatch.setattr(settings, "cache_enabled", True)
+
+
+def test_keys():
+    """Equivalent addresses and nearby coordinates share a key."""
+    assert normalize_address("10, Rue de l'Église  PARIS") == "10 rue de l eglise paris"
+    assert coordinates_key(48.1234561, -1.6789012, precision=5) == "48.12346,-1.67890"
+
+
+@pytest.mark.asyncio
+async def test_memory_and_disk_tiers(tmp_path, enable_cache):
+    """Values survive LRU eviction through the disk tier, and expire after their TTL."""
+    path = str(tmp_path / "cache.sqlite")
+    cache = TTLCache("test", ttl=60, max_entries=1, path=path)
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        return {"value": value}
+
+    assert await cache.get_or_fetch("a", lambda: fetch("a")) == {"value": "a"}
+    assert await cache.get_or_fetch("b", lambda: fetch("b")) == {"value": "b"}  # evicts "a"
+    assert await cache.get_or_fetch("a", lambda: fetch("a")) == {"value": "a"}
+    assert await cache.get_or_fetch("a", lambda: fetch("a")) == {"value": "a"}
+
+    assert calls == ["a", "b"]
+    assert cache.stats() | {"hit_rate": None} == {
+        "namespace": "test",
+        "hits": 1,
+        "disk_hits": 1,
+        "misses": 2,
+        "coalesced": 0,
+        "hit_rate": None,
+        "size": 1,
+    }
+
+    # A fresh process (new instance, same file) reads the disk tier
+    assert await TTLCache("test", ttl=60, path=path).get("b") == {"value": "b"}
+    # Expired entries are misses
+    expired = TTLCache("expired", ttl=-1, path=path)
+    await expired.set("a", 1)
+    assert await expired.get("a") is None
+
+
+def _disk_keys(path: str) -> list[tuple[str, str]]:
+    """(namespace, key) of the rows of a disk tier."""
+    with sqlite3.connect(path) as connection:
+        return sorted(connection.execute("SELECT namespace, key FROM cache").fetchall())
+
+
+@pytest.mark.asyncio
+async def test_expired_disk_entries_are_purged(tmp_path, enable_cache, monkeypatch):
+    """Expired rows are deleted when the disk tier is opened and every _PURGE_INTERVAL writes."""
+    monkeypatch.setattr(cache_module, "_PURGE_INTERVAL", 3)
+    path = str(tmp_path / "cache.sqlite")
+    expired = TTLCache("expired", ttl=-1, path=path)
+    await expired.set("a", 1)
+    await expired.set("b", 2)
+    assert _disk_keys(path) == [("expired", "a"), ("expired", "b")]
+
+    # Third write of the store: the expired rows go, the fresh ones stay
+    await expired.set("c", 3)
+    assert _disk_keys(path) == []
+    await expired.set("d", 4)
+    fresh = TTLCache("fresh", ttl=60, path=path)
+    await fresh.set("a", 1)
+    assert _disk_keys(path) == [("fresh", "a")]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers(tmp_path, enable_cache):
+    """Invalidating in one worker drops the entries held in memory by the others."""
+    path = str(tmp_path / "cache.sqlite")
+    worker_a = TTLCache("shared", ttl=60, path=path, shared_invalidation=True)
+    worker_b = TTLCache("shared", ttl=60, path=path, shared_invalidation=True)
+    unshared = TTLCache("shared", ttl=60, path=path)
+    await worker_a.set("k", "v1")
+    assert await worker_b.get("k") == "v1"
+    assert await unshared.get("k") == "v1"
+
+    await worker_a.invalidate("k")
+
+    assert await worker_b.get("k") is None
+    # Without shared_invalidation the LRU keeps serving its copy
+    assert await unshared.get("k") == "v1"
+
+    await worker_a.set("k", "v2")
+    assert await worker_b.get("k") == "v2"
+    assert await worker_b.get("k") == "v2"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced(enable_cache):
+    """Concurrent callers for the same key share one fetch, including its failure."""
+    cache = TTLCache("test", ttl=60, path="")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    assert await asyncio.gather(*(cache.get_or_fetch("k", fetch) for _ in range(5))) == [1] * 5
+    assert calls == 1
+    assert cache.stats()["coalesced"] == 4
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *(cache.get_or_fetch("err", fail) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert await cache.get("err") is None
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_waiters(enable_cache):
+    """Cancelling the caller that started a fetch leaves it running for the other callers."""
+    cache = TTLCache("test", ttl=60, path="")
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "value"
+
+    first = asyncio.create_task(cache.get_or_fetch("k", fetch))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.get_or_fetch("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "value"
+    assert first.cancelled()
+    assert await cache.get("k") == "value"
+
+
+@pytest.mark.asyncio
+async def test_geocoding_uses_cache(monkeypatch, enable_cache):
+    """Single and batch geocoding only reach the API for uncached addresses."""
+    monkeypatch.setattr(cadastre, "geocode_cache", TTLCache("geocode", ttl=60, path=""))
+    known = {"1 rue A, Rennes": (48.1, -1.6), "2 rue B, Rennes": (48.2, -1.7)}
+
+    with APIAdresseStub(known) as stub:
+        monkeypatch.setattr(settings, "api_adresse_url", stub.url)
+        await geocode_address("1 rue A, Rennes")
+        await geocode_address("1 RUE A Rennes")
+        results = await geocode_addresses(["1 rue A, Rennes", "2 rue B, Rennes", "2 rue B Rennes"])
+
+    assert stub.requests[0].startswith("/search/?")
+    assert stub.requests[1:] == ["/search/csv/"]
+    assert [result["latitude"] for result in results] == [48.1, 48.2, 48.2]
@@ -0,0 +1,168 @@
+"""Tests for the local cadastral parcel store."""
+
+import gzip
+import json
+
+import pytest
+
+from backend.config import settings
+from backend.utils import cadastre_store as cadastre_store_module
+from backend.utils.cadastre import get_cadastral_parcel
+from backend.utils.cadastre_store import (
+    CadastreStore,
+    _iter_features,
+    distance_m,
+    get_local_parcels_within,
+)
+
+# About 22 m x 33 m at this latitude
+SIZE = 0.0003
+
+
+def _square(lat: float, lon: float, size: float = SIZE) -> list[list[float]]:
+    """Closed ring of a square whose south-west corner is (lat, lon)."""
+    return [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]
+
+
+def _parcel(parcel_id: str, geometry: dict) -> dict:
+    """Build one Etalab parcel feature."""
+    return {
+        "type": "Feature",
+        "id": parcel_id,
+        "geometry": geometry,
+        "properties": {
+            "id": parcel_id,
+            "commune": "35238",
+            "prefixe": "000",
+            "section": parcel_id[8:10],
+            "numero": parcel_id[10:].lstrip("0"),
+            "contenance": 700,
+        },
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Build a small store: a parcel with a courtyard (hole), its neighbour and a far parcel."""
+    monkeypatch.setattr(cadastre_store_module, "commune_index", _NoCommuneIndex())
+    features = [
+        _parcel(
+            "35238000AB0001",
+            {
+                "type": "Polygon",
+                "coordinates": [
+                    _square(48.1, -1.68),
+                    _square(48.1001, -1.6799, SIZE / 3),
+                ],
+            },
+        ),
+        _parcel("35238000AB0002", {"type": "Polygon", "coordinates": [_square(48.1, -1.6797)]}),
+        _parcel(
+            "35238000ZC0042",
+            {"type": "MultiPolygon", "coordinates": [[_square(48.11, -1.68)]]},
+        ),
+        _parcel("35238000ZC0043", {"type": "Polygon", "coordinates": []}),
+    ]
+    path = tmp_path / "cadastre-35238-parcelles.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        json.dump({"type": "FeatureCollection", "features": features}, handle)
+
+    cadastre_store = CadastreStore(str(tmp_path / "cadastre.sqlite"))
+    assert cadastre_store.ingest([str(path)]) == 3
+    # Files are only ingested once
+    assert cadastre_store.ingest([str(path)]) == 0
+    yield cadastre_store
+    cadastre_store.close()
+
+
+class _NoCommuneIndex:
+    """Commune index that was never built."""
+
+    def exists(self) -> bool:
+        return False
+
+
+def test_features_are_streamed(tmp_path):
+    """Features are decoded one by one whatever the chunk boundaries; truncation is an error."""
+    features = [
+        _parcel(
+            f"35238000AB{index:04d}", {"type": "Polygon", "coordinates": [_square(48.1, -1.68)]}
+        )
+        for index in range(5)
+    ]
+    document = {"type": "FeatureCollection", "name": "parcelles, [é]", "features": features}
+    path = tmp_path / "cadastre.json"
+    path.write_text(json.dumps(document, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for chunk_size in (1, 7, 4096):
+        assert list(_iter_features(str(path), chunk_size)) == features
+
+    path.write_text(json.dumps(document)[:-40], encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(_iter_features(str(path), 64))
+
+
+def test_point_lookup(store):
+    """A point resolves to the polygon containing it, holes excluded."""
+    inside = store.query_point(48.10005, -1.67995)
+    neighbour = store.query_point(48.10005, -1.67965)
+    in_courtyard = store.query_point(48.10015, -1.67985)
+
+    assert inside["parcel_id"] == "35238000AB0001"
+    assert inside["section"] == "AB"
+    assert inside["number"] == "1"
+    assert neighbour["parcel_id"] == "35238000AB0002"
+    assert in_courtyard is None
+    assert store.query_point(48.11015, -1.67985)["parcel_id"] == "35238000ZC0042"
+    assert store.query_point(48.2, -1.68) is None
+
+
+def test_radius_lookup(store):
+    """Parcels intersecting the circle are returned, closest first."""
+    rows = store.query_radius(48.10005, -1.67995, 50)
+
+    assert [row["parcel_id"] for row in rows] == ["35238000AB0001", "35238000AB0002"]
+    assert rows[0]["distance_m"] == 0.0
+    # The neighbour starts 0.0003° (~22 m) east of the parcel's west edge
+    assert rows[1]["distance_m"] == pytest.approx(18.6, abs=0.5)
+    assert len(store.query_radius(48.10005, -1.67995, 2_000)) == 3
+
+
+def test_distance_to_polygon():
+    """Distance is measured to the nearest edge, 0 inside."""
+    geometry = {"type": "Polygon", "coordinates": [_square(48.0, 2.0, 0.001)]}
+
+    assert distance_m(geometry, 48.0005, 2.0005) == 0.0
+    # 0.001° of latitude is ~111 m
+    assert distance_m(geometry, 48.002, 2.0005) == pytest.approx(111.2, abs=0.5)
+
+
+@pytest.mark.asyncio
+async def test_local_backend(store, monkeypatch):
+    """get_cadastral_parcel answers from the local store with the API structure."""
+    monkeypatch.setattr(settings, "cadastre_backend", "local")
+    monkeypatch.setattr(cadastre_store_module, "cadastre_store", store)
+
+    parcel = await get_cadastral_parcel(48.10005, -1.67965)
+    nearby = await get_local_parcels_within(48.10005, -1.67965, 30)
+
+    assert set(parcel) == {"parcel_id", "section", "number", "commune", "geometry"}
+    assert parcel["parcel_id"] == "35238000AB0002"
+    # Without the commune index the commune is its INSEE code
+    assert parcel["commune"] == "35238"
+    assert parcel["geometry"]["type"] == "Polygon"
+    assert [item["parcel_id"] for item in nearby] == ["35238000AB0002", "35238000AB0001"]
+    with pytest.raises(ValueError):
+        await get_cadastral_parcel(48.2, -1.68)
+
+
+@pytest.mark.asyncio
+async def test_local_backend_requires_store(tmp_path, monkeypatch):
+    """A missing local store is reported as a ValueError."""
+    monkeypatch.setattr(settings, "cadastre_backend", "local")
+    monkeypatch.setattr(
+        cadastre_store_module, "cadastre_store", CadastreStore(str(tmp_path / "missing.sqlite"))
+    )
+
+    with pytest.raises(ValueError, match="introuvable"):
+        await get_cadastral_parcel(48.1, -1.68)
@@ -0,0 +1,325 @@
+"""Tests for the /city-information endpoint and its per-commune cache."""
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator
+
+import httpx
+import pytest
+
+from backend.agents.city_information import agent as city_agent
+from backend.agents.city_information import cache as city_cache
+from backend.api.main import app
+from backend.config import settings
+from backend.utils import cadastre
+from backend.utils.cache import TTLCache
+from backend.utils.communes import CommuneIndex
+from backend.utils.http_client import http_clients
+from tests.stubs import APIAdresseStub
+
+CITY_INFORMATION = {
+    "situation": "Rennes, Ille-et-Vilaine",
+    "politique_color": "PS",
+    "qualitative_presentation": "Capitale bretonne.",
+}
+
+
+class SlowAgent:
+    """Block sub-agent answering after a fixed latency, like an LLM call."""
+
+    def __init__(self, block: str, latency: float):
+        """Initialize the agent."""
+        self.block = block
+        self.latency = latency
+        self.calls: list[str] = []
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, payload: dict) -> dict:
+        """Answer asynchronously, with a new block numbered after the call."""
+        city_name = payload["messages"][0].content
+        self.calls.append(city_name)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        if city_name == "Inconnu":
+            raise ValueError("Commune inconnue")
+        return {"structured_response": self._answer()}
+
+    async def astream(self, payload: dict, stream_mode: str) -> AsyncIterator[dict]:
+        """Stream a model call, a web search, then the structured answer."""
+        self.calls.append(payload["messages"][0].content)
+        yield {"model": {"messages": []}}
+        await asyncio.sleep(self.latency)
+        yield {"tools": {"messages": []}}
+        yield {"model": {"messages": [], "structured_response": self._answer()}}
+
+    def _answer(self) -> dict:
+        """Build the block, numbered after the call for the situation and political blocks."""
+        answer = dict(
+            CITY_INFORMATION,
+            politique_color=f"PS ({len(self.calls)})",
+            situation=f"Rennes ({len(self.calls)})",
+        )
+        return {self.block: answer[self.block]}
+
+
+def parse_sse(body: str) -> list[tuple[str, object]]:
+    """Parse a text/event-stream body into (event, data) pairs, skipping comments."""
+    events = []
+    for message in body.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in message.splitlines() if not line.startswith(":")
+        )
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """Point the API Adresse at a stub knowing two addresses in Rennes."""
+    known = {"1 rue A, Rennes": (48.11, -1.68), "2 rue B, Rennes": (48.12, -1.67)}
+    with APIAdresseStub(known) as stub:
+        monkeypatch.setattr(settings, "api_adresse_url", stub.url)
+        yield stub
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    """Replace the LLM sub-agents with slow fakes (and ignore any local commune index)."""
+    fakes = {block: SlowAgent(block, latency=0.2) for block in city_agent.BLOCKS}
+    monkeypatch.setattr(city_agent, "city_information_agents", fakes)
+    monkeypatch.setattr(city_cache, "commune_index", CommuneIndex("/nonexistent.npz"))
+    return fakes
+
+
+@pytest.fixture
+def agent(agents):
+    """The political block's fake, asked on every run."""
+    return agents["politique_color"]
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    """Enable the caches with fresh in-memory instances."""
+    monkeypatch.setattr(settings, "cache_enabled", True)
+    monkeypatch.setattr(
+        city_cache, "city_information_cache", TTLCache("city_information", ttl=60, path="")
+    )
+    monkeypatch.setattr(city_cache, "city_profile_cache", TTLCache("city_profile", 60, path=""))
+    monkeypatch.setattr(cadastre, "geocode_cache", TTLCache("geocode", 60, path=""))
+
+
+@pytest.mark.asyncio
+async def test_city_information_requests_run_concurrently(stub_api, agent):
+    """Concurrent requests overlap instead of queueing behind each other."""
+    # As in the app lifespan, so geocoding reuses pooled connections
+    http_clients.open()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(client.post("/city-information", json={"adress_in": f"{i}"}) for i in range(10))
+            )
+            elapsed = time.perf_counter() - start
+    finally:
+        await http_clients.aclose()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert responses[0].json()["city_information"]["qualitative_presentation"]
+    # Serialised requests would take 10 x 0.2 s
+    assert elapsed < 1.5
+
+
+@pytest.mark.asyncio
+async def test_addresses_of_a_commune_share_one_agent_run(stub_api, agent, caches):
+    """Concurrent requests for addresses of the same commune are coalesced."""
+    results = await asyncio.gather(
+        city_cache.get_cached_city_information("1 rue A, Rennes"),
+        city_cache.get_cached_city_information("2 rue B, Rennes"),
+        city_cache.get_cached_city_information("1 rue A, Rennes"),
+    )
+    again = await city_cache.get_cached_city_information("2 rue B, Rennes")
+
+    # The agent is asked about the commune, not the address
+    assert agent.calls == ["Rennes"]
+    assert results[0] == results[1] == results[2] == again
+
+
+@pytest.mark.asyncio
+async def test_expired_political_block_keeps_profile(stub_api, agent, caches):
+    """A refresh of the political block keeps the cached situation and presentation."""
+    first = await city_cache.get_cached_city_information("1 rue A, Rennes")
+    await city_cache.city_information_cache.invalidate()
+    second = await city_cache.get_cached_city_information("1 rue A, Rennes")
+
+    assert len(agent.calls) == 2
+    assert second["politique_color"] == "PS (2)"
+    assert second["situation"] == first["situation"] == "Rennes (1)"
+
+
+@pytest.mark.asyncio
+async def test_admin_invalidation(stub_api, agent, caches, monkeypatch):
+    """The admin endpoint needs the token and drops the commune entry."""
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    await city_cache.get_cached_city_information("1 rue A, Rennes")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        denied = await client.delete("/admin/city-information")
+        response = await client.delete(
+            "/admin/city-information",
+            params={"adresse": "2 rue B, Rennes"},
+            headers={"X-Admin-Token": "secret"},
+        )
+
+    assert denied.status_code == 403
+    assert response.json() == {"invalidated": "insee:35238"}
+    await city_cache.get_cached_city_information("1 rue A, Rennes")
+    assert len(agent.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_agent_steps_then_caches(stub_api, agent, caches):
+    """The stream yields each agent step, then serves the cached answer directly."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.post("/city-information/stream", json={"adress_in": "1 rue A, Rennes"})
+        second = await client.post(
+            "/city-information/stream", json={"adress_in": "2 rue B, Rennes"}
+        )
+
+    assert first.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(first.text)
+    assert [event for event, _ in events] == ["start", "commune", *["node"] * 9, "result"]
+    assert events[1][1] == {"key": "insee:35238", "commune": "Rennes"}
+    nodes = [data for event, data in events if event == "node"]
+    assert [node for node in nodes if node.startswith("politique_color:")] == [
+        "politique_color:model",
+        "politique_color:tools",
+        "politique_color:model",
+    ]
+    assert events[-1][1]["politique_color"] == "PS (1)"
+
+    assert [event for event, _ in parse_sse(second.text)] == ["start", "commune", "result"]
+    assert agent.calls == ["Rennes"]
+
+
+@pytest.mark.asyncio
+async def test_stream_joins_the_run_in_flight(stub_api, agent, caches, monkeypatch):
+    """A stream arriving during a run for its commune waits for it, with keepalives."""
+    monkeypatch.setattr(settings, "sse_poll_interval", 0.05)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        running = asyncio.create_task(city_cache.get_cached_city_information("1 rue A, Rennes"))
+        await asyncio.sleep(0.05)
+        response = await client.post(
+            "/city-information/stream", json={"adress_in": "2 rue B, Rennes"}
+        )
+        answer = await running
+
+    events = parse_sse(response.text)
+    assert [event for event, _ in events] == ["start", "commune", "result"]
+    assert events[-1][1] == answer
+    assert ": keepalive" in response.text
+    assert agent.calls == ["Rennes"]
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_errors(stub_api, monkeypatch):
+    """Failures after the response started are sent as an error event."""
+
+    class FailingAgent:
+        async def astream(self, payload: dict, stream_mode: str) -> AsyncIterator[dict]:
+            raise RuntimeError("quota dépassé")
+            yield
+
+    monkeypatch.setattr(
+        city_agent, "city_information_agents", dict.fromkeys(city_agent.BLOCKS, FailingAgent())
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/city-information/stream", json={"adress_in": "Rennes"})
+
+    assert parse_sse(response.text)[-1] == ("error", {"detail": "quota dépassé"})
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_agent_once_per_commune(stub_api, agent, monkeypatch):
+    """A batch groups addresses by commune and keeps input order and per-item errors."""
+    monkeypatch.setattr(settings, "city_information_batch_concurrency", 2)
+    addresses = ["1 rue A, Rennes", "Lyon", "2 rue B, Rennes", "Inconnu", "Paris", "Lyon"]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/city-information/batch",
+            json={"items": [{"adress_in": address} for address in addresses]},
+        )
+
+    body = response.json()
+    assert sorted(agent.calls) == ["Inconnu", "Lyon", "Paris", "Rennes"]
+    assert agent.peak == 2
+    assert body["nb_communes"] == 4
+    assert [item["adress_in"] for item in body["items"]] == addresses
+    assert [item["commune"] for item in body["items"]] == [
+        "Rennes",
+        "Lyon",
+        "Rennes",
+        "Inconnu",
+        "Paris",
+        "Lyon",
+    ]
+    assert body["items"][0]["commune_key"] == body["items"][2]["commune_key"] == "insee:35238"
+    assert body["items"][3] | {"commune_key": None} == {
+        "adress_in": "Inconnu",
+        "commune_key": None,
+        "commune": "Inconnu",
+        "city_information": None,
+        "error": "Commune inconnue",
+    }
+    assert body["items"][1]["city_information"]["qualitative_presentation"]
+    assert stub_api.requests.count("/search/csv/") == 1
+
+
+@pytest.mark.asyncio
+async def test_blocks_run_concurrently(stub_api, agents):
+    """The three sub-agents overlap: an answer takes as long as the slowest block."""
+    start = time.perf_counter()
+    information = await city_cache.get_cached_city_information("1 rue A, Rennes")
+    elapsed = time.perf_counter() - start
+
+    assert information == dict(CITY_INFORMATION, politique_color="PS (1)", situation="Rennes (1)")
+    assert all(fake.calls == ["Rennes"] for fake in agents.values())
+    # Three blocks in sequence would take 3 x 0.2 s
+    assert elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_failed_block_falls_back_and_is_not_cached(stub_api, agents, caches, monkeypatch):
+    """A block past its deadline gets the fallback text, and the answer is asked again."""
+    monkeypatch.setattr(settings, "city_politics_timeout", 0.05)
+
+    first = await city_cache.get_cached_city_information("1 rue A, Rennes")
+    monkeypatch.setattr(settings, "city_politics_timeout", 5.0)
+    second = await city_cache.get_cached_city_information("1 rue A, Rennes")
+
+    assert first["politique_color"] == city_agent.BLOCK_FALLBACK
+    assert first["qualitative_presentation"] == CITY_INFORMATION["qualitative_presentation"]
+    assert second["politique_color"] == "PS (2)"
+    # The profile blocks of the first (partial) answer were cached and are kept
+    assert second["situation"] == "Rennes (1)"
+    assert len(agents["situation"].calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_every_block_failing_raises(stub_api, agents):
+    """Without any block answered, the first error is raised."""
+    with pytest.raises(ValueError, match="Commune inconnue"):
+        await city_cache.get_cached_city_information("Inconnu")
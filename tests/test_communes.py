@@ -0,0 +1,154 @@
+"""Tests for the local commune reference index."""
+
+import pytest
+
+from backend.agents.city_information import agent as city_agent
+from backend.agents.city_information import cache as city_cache
+from backend.utils.communes import CommuneIndex, build_commune_index
+
+
+def _write(path, text: str) -> str:
+    """Write a CSV fixture and return its path."""
+    path.write_text(text.strip() + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path) -> CommuneIndex:
+    """Build an index of a few Breton and Loire communes plus Paris arrondissements."""
+    communes = _write(
+        tmp_path / "v_commune.csv",
+        """
+TYPECOM,COM,REG,DEP,CTCD,ARR,TNCC,NCC,NCCENR,LIBELLE,CAN,COMPARENT
+COM,35238,53,35,35D,352,0,RENNES,Rennes,Rennes,3599,
+COM,35047,53,35,35D,352,0,BRUZ,Bruz,Bruz,3504,
+COM,44109,52,44,44D,443,0,NANTES,Nantes,Nantes,4499,
+COM,75056,11,75,75C,751,0,PARIS,Paris,Paris,7599,
+ARM,75102,11,75,75C,751,0,PARIS 2E ARRONDISSEMENT,Paris 2e,Paris 2e Arrondissement,,75056
+COM,97411,04,974,974D,9741,0,SAINT DENIS,Saint-Denis,Saint-Denis,97499,
+COM,93066,11,93,93D,933,0,SAINT DENIS,Saint-Denis,Saint-Denis,9399,
+""",
+    )
+    departements = _write(
+        tmp_path / "v_departement.csv",
+        """
+DEP,REG,CHEFLIEU,TNCC,NCC,NCCENR,LIBELLE
+35,53,35238,1,ILLE ET VILAINE,Ille-et-Vilaine,Ille-et-Vilaine
+44,52,44109,3,LOIRE ATLANTIQUE,Loire-Atlantique,Loire-Atlantique
+75,11,75056,0,PARIS,Paris,Paris
+""",
+    )
+    regions = _write(
+        tmp_path / "v_region.csv",
+        """
+REG,CHEFLIEU,TNCC,NCC,NCCENR,LIBELLE
+53,35238,0,BRETAGNE,Bretagne,Bretagne
+52,44109,0,PAYS DE LA LOIRE,Pays de la Loire,Pays de la Loire
+11,75056,1,ILE DE FRANCE,Île-de-France,Île-de-France
+""",
+    )
+    centroids = _write(
+        tmp_path / "communes-france.csv",
+        """
+code_insee;latitude_centre;longitude_centre;population
+35238;48,1114;-1,6819;227830
+35047;48,0244;-1,7444;18826
+44109;47,2316;-1,5484;323204
+75056;48,8589;2,3470;2133111
+""",
+    )
+    epci = _write(
+        tmp_path / "epci.csv",
+        """
+CODGEO;LIBGEO;EPCI;LIBEPCI
+35238;Rennes;243500139;Rennes Métropole
+35047;Bruz;243500139;Rennes Métropole
+""",
+    )
+    path = str(tmp_path / "communes.npz")
+    count = build_commune_index(
+        communes, departements, regions, centroids, path, epci_path=epci, nearest=2
+    )
+    assert count == 6
+    return CommuneIndex(path)
+
+
+def test_lookup_by_code(index):
+    """Facts come from the COG tables, with the nearest large cities precomputed."""
+    facts = index.get("35047")
+
+    assert facts.nom == "Bruz"
+    assert (facts.departement, facts.departement_code, facts.region) == (
+        "Ille-et-Vilaine",
+        "35",
+        "Bretagne",
+    )
+    assert facts.intercommunalite == "Rennes Métropole"
+    assert facts.population == 18826
+    assert [name for name, _ in facts.grandes_villes] == ["Rennes", "Nantes"]
+    assert 9 < facts.grandes_villes[0][1] < 12
+    assert index.get("99999") is None
+
+
+def test_large_cities_exclude_themselves(index):
+    """A large city lists the other large cities, and arrondissements resolve to Paris."""
+    rennes = index.get("35238")
+    assert [name for name, _ in rennes.grandes_villes] == ["Nantes", "Paris"]
+    assert index.get("75102").nom == "Paris"
+
+
+def test_lookup_by_name(index):
+    """Names resolve only when unambiguous."""
+    assert index.find("NANTES").code == "44109"
+    assert index.find("Saint-Denis") is None
+    # Without centroid data, facts are partial
+    assert index.get("93066").grandes_villes == []
+    assert index.get("93066").population is None
+
+
+def test_situation_text(index):
+    """The situation block is built from the facts, in French."""
+    situation = index.get("35047").situation()
+
+    assert situation.startswith("Bruz (code INSEE 35047) est une commune du département")
+    assert "Ille-et-Vilaine (35), en région Bretagne" in situation
+    assert "Population : 18 826 habitants." in situation
+    assert "Rennes (11 km), Nantes (89 km)." in situation
+
+
+def test_reference_situation_lookup(index, monkeypatch):
+    """The city information cache finds the reference situation of known communes only."""
+    monkeypatch.setattr(city_cache, "commune_index", index)
+
+    assert city_cache.reference_situation("insee:35047", "Bruz").startswith("Bruz")
+    assert city_cache.reference_situation("nom:nantes", "Nantes").startswith("Nantes")
+    assert city_cache.reference_situation("insee:00000", "Nulle part") is None
+    monkeypatch.setattr(city_cache, "commune_index", CommuneIndex("/nonexistent.npz"))
+    assert city_cache.reference_situation("insee:35047", "Bruz") is None
+
+
+@pytest.mark.asyncio
+async def test_agent_reuses_reference_situation(index, monkeypatch):
+    """With a reference situation, only the political and presentation blocks are asked."""
+    received = []
+
+    class Agent:
+        async def ainvoke(self, payload: dict) -> dict:
+            received.append(payload["messages"][0].content)
+            return {
+                "structured_response": {
+                    "situation": "Situation inventée",
+                    "politique_color": "Divers",
+                    "qualitative_presentation": "Ville étudiante.",
+                }
+            }
+
+    monkeypatch.setattr(city_cache, "commune_index", index)
+    monkeypatch.setattr(
+        city_agent, "city_information_agents", dict.fromkeys(city_agent.BLOCKS, Agent())
+    )
+    information = await city_cache._fetch("insee:35047", "Bruz")
+
+    assert received == ["Bruz", "Bruz"]
+    assert information["situation"] == index.get("35047").situation()
+    assert information["politique_color"] == "Divers"
@@ -0,0 +1,139 @@
+"""Tests for the local DVF transaction store."""
+
+import csv
+import gzip
+
+import pytest
+
+from backend.config import settings
+from backend.utils import dvf_store as dvf_store_module
+from backend.utils.dvf import get_dvf_transactions
+from backend.utils.dvf_store import COLUMN_NAMES, DVFStore, haversine_m
+
+ORIGIN = (48.1145, -1.6795)
+
+
+def _row(id_mutation: str, lat: float, lon: float, **overrides) -> dict:
+    """Build one geo-dvf CSV row."""
+    row = dict.fromkeys(COLUMN_NAMES, "")
+    row.update(
+        id_mutation=id_mutation,
+        date_mutation="2023-05-12",
+        nature_mutation="Vente",
+        valeur_fonciere="250000.5",
+        adresse_numero="25",
+        adresse_nom_voie="RUE D'ANTRAIN",
+        code_postal="35700",
+        code_commune="35238",
+        nom_commune="Rennes",
+        code_departement="35",
+        code_type_local="2",
+        type_local="Appartement",
+        surface_reelle_bati="62",
+        nombre_pieces_principales="3",
+        latitude=str(lat),
+        longitude=str(lon),
+    )
+    row.update(overrides)
+    return row
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Build a small store from a gzip-compressed geo-dvf file."""
+    csv_dir = tmp_path / "2023"
+    csv_dir.mkdir()
+    csv_path = csv_dir / "full.csv.gz"
+    rows = [
+        _row("2023-1", ORIGIN[0], ORIGIN[1]),
+        _row("2023-2", ORIGIN[0] + 0.001, ORIGIN[1]),  # ~111 m north
+        _row("2023-3", ORIGIN[0] + 0.01, ORIGIN[1]),  # ~1.1 km north
+        _row("2023-5", ORIGIN[0], ORIGIN[1] + 0.05, code_departement="53"),  # ~3.7 km east
+        _row("2023-4", "", "", valeur_fonciere="oops"),  # not geolocated
+    ]
+    with gzip.open(csv_path, "wt", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=COLUMN_NAMES + ["lot1_numero"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    dvf_store = DVFStore(str(tmp_path / "dvf.sqlite"))
+    assert dvf_store.ingest([str(csv_path)]) == 4
+    # Ingesting the same file twice is a no-op
+    assert dvf_store.ingest([str(csv_path)]) == 0
+    yield dvf_store
+    dvf_store.close()
+
+
+def test_haversine():
+    """One thousandth of a degree of latitude is about 111 m."""
+    assert haversine_m(48.0, 2.0, 48.001, 2.0) == pytest.approx(111.2, abs=0.5)
+
+
+def test_query_radius_filters_exact_distance(store):
+    """Only mutations within the radius are returned, closest first, with typed columns."""
+    rows = store.query_radius(*ORIGIN, 200)
+    assert [row["id_mutation"] for row in rows] == ["2023-1", "2023-2"]
+    assert rows[0]["valeur_fonciere"] == 250000.5
+    assert rows[0]["nombre_pieces_principales"] == 3
+    assert rows[0]["code_postal"] == "35700"
+    assert rows[1]["distance_m"] == pytest.approx(111.2, abs=0.5)
+
+
+def test_query_radius_spans_departements(store):
+    """A radius overlapping two départements searches both spatial indexes."""
+    rows = store.query_radius(*ORIGIN, 5000)
+    assert [row["id_mutation"] for row in rows] == ["2023-1", "2023-2", "2023-3", "2023-5"]
+
+
+def test_query_nearest(store):
+    """The k nearest mutations are returned even when they are far away."""
+    far_point = (ORIGIN[0] + 0.1, ORIGIN[1])  # ~11 km north of every mutation
+    assert store.query_radius(*far_point, 200) == []
+
+    rows = store.query_nearest(*far_point, k=2)
+    assert [row["id_mutation"] for row in rows] == ["2023-3", "2023-2"]
+    assert store.query_nearest(*far_point, k=2, max_dist=1000) == []
+
+
+@pytest.mark.asyncio
+async def test_get_dvf_transactions_local_backend(store, monkeypatch):
+    """The local backend answers get_dvf_transactions with the usual structure."""
+    monkeypatch.setattr(settings, "dvf_backend", "local")
+    monkeypatch.setattr(dvf_store_module, "dvf_store", store)
+
+    result = await get_dvf_transactions(*ORIGIN, dist=2000)
+
+    assert result.count == 3
+    assert result.search_mode == "radius"
+    transaction = result.transactions[0]
+    assert transaction.type_local == "Appartement"
+    assert transaction.adresse == "25, RUE D'ANTRAIN, 35700, Rennes"
+    assert (transaction.lat, transaction.lon) == ORIGIN
+    assert transaction.raw_properties is None
+
+
+@pytest.mark.asyncio
+async def test_local_backend_falls_back_to_nearest(store, monkeypatch):
+    """An empty radius falls back to the nearest mutations."""
+    monkeypatch.setattr(settings, "dvf_backend", "local")
+    monkeypatch.setattr(settings, "dvf_nearest_fallback", 1)
+    monkeypatch.setattr(dvf_store_module, "dvf_store", store)
+
+    result = await get_dvf_transactions(ORIGIN[0] - 0.1, ORIGIN[1], dist=200)
+
+    assert result.search_mode == "nearest"
+    assert [transaction.lat for transaction in result.transactions] == [ORIGIN[0]]
+
+
+@pytest.mark.asyncio
+async def test_local_backend_as_table(store, monkeypatch):
+    """as_table returns a columnar table instead of transaction objects."""
+    monkeypatch.setattr(settings, "dvf_backend", "local")
+    monkeypatch.setattr(dvf_store_module, "dvf_store", store)
+
+    result = await get_dvf_transactions(*ORIGIN, dist=2000, as_table=True)
+
+    assert result.transactions == []
+    assert result.count == 3
+    assert result.table.valeur_fonciere.tolist() == [250000.5] * 3
+    assert result.table.id_mutation.tolist() == ["2023-1", "2023-2", "2023-3"]
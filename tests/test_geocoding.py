@@ -0,0 +1,68 @@
+"""Tests for batch geocoding through the API Adresse CSV endpoint."""
+
+import time
+
+import pytest
+
+from backend.config import settings
+from backend.utils import cadastre
+from backend.utils.cadastre import geocode_address, geocode_addresses
+from backend.utils.http_client import AsyncRateLimiter
+from tests.stubs import APIAdresseStub
+
+KNOWN = {
+    "25 Rue d'Antrain, 35700 Rennes": (48.1180, -1.6780),
+    "1 Place de la Mairie, 35000 Rennes": (48.1113, -1.6800),
+    "10 Rue de la Paix, 35000 Rennes": (48.1100, -1.6750),
+}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Point the API Adresse URL at a local stub server."""
+    with APIAdresseStub(KNOWN) as server:
+        monkeypatch.setattr(settings, "api_adresse_url", server.url)
+        monkeypatch.setattr(cadastre, "_csv_rate_limiter", AsyncRateLimiter(0))
+        yield server
+
+
+@pytest.mark.asyncio
+async def test_geocode_addresses_chunks_and_keeps_order(stub, monkeypatch):
+    """Results follow input order across chunks, with None for unknown addresses."""
+    monkeypatch.setattr(settings, "geocode_batch_size", 2)
+    addresses = list(KNOWN) + ["Adresse inconnue", "25 Rue d'Antrain, 35700 Rennes"]
+
+    results = await geocode_addresses(addresses)
+
+    assert stub.requests == ["/search/csv/"] * 3
+    assert [result and result["latitude"] for result in results] == [
+        48.1180,
+        48.1113,
+        48.1100,
+        None,
+        48.1180,
+    ]
+    assert results[3] is None
+
+
+@pytest.mark.asyncio
+async def test_geocode_addresses_matches_single_shape(stub):
+    """Batch results have the same keys and values as geocode_address."""
+    address = "25 Rue d'Antrain, 35700 Rennes"
+
+    single = await geocode_address(address)
+    (batch,) = await geocode_addresses([address])
+
+    assert batch.keys() == single.keys()
+    assert (batch["latitude"], batch["longitude"]) == (single["latitude"], single["longitude"])
+    assert batch["full_address"] == single["full_address"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_requests():
+    """The limiter delays acquisitions beyond the configured rate."""
+    limiter = AsyncRateLimiter(20)
+    start = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire()
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,253 @@
+"""Tests for the shared HTTP client registry, its upstream call policy and client injection."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.config import settings
+from backend.utils.cadastre import geocode_address, get_cadastral_parcel
+from backend.utils.dvf import get_dvf_transactions
+from backend.utils.http_client import (
+    API_ADRESSE,
+    API_CARTO,
+    DVF,
+    UPSTREAMS,
+    CircuitOpenError,
+    HTTPClientRegistry,
+    RetryBudget,
+    TokenBucket,
+)
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    """Answer API Adresse, API Carto and DVF requests with canned payloads."""
+    if request.url.path == "/search/":
+        return httpx.Response(
+            200,
+            json={
+                "features": [
+                    {
+                        "geometry": {"coordinates": [2.33, 48.86]},
+                        "properties": {"label": "Paris", "score": 0.9, "city": "Paris"},
+                    }
+                ]
+            },
+        )
+    if request.url.path == "/api/cadastre/parcelle":
+        return httpx.Response(
+            200,
+            json={"features": [{"properties": {"id": "75102000AB0001", "section": "AB"}}]},
+        )
+    return httpx.Response(200, json={"type": "Featurecollection", "features": []})
+
+
+@pytest.mark.asyncio
+async def test_utilities_use_injected_client():
+    """Utilities send their requests through the injected client."""
+    async with httpx.AsyncClient(transport=httpx.MockTransport(_handler)) as client:
+        address = await geocode_address("Paris", client=client)
+        parcel = await get_cadastral_parcel(48.86, 2.33, client=client)
+        dvf = await get_dvf_transactions(48.86, 2.33, client=client)
+
+    assert address["latitude"] == 48.86
+    assert parcel["parcel_id"] == "75102000AB0001"
+    assert dvf.count == 0
+
+
+@pytest.mark.asyncio
+async def test_registry_lifecycle():
+    """The registry opens one client per upstream and reuses it until closed."""
+    registry = HTTPClientRegistry()
+    assert registry.get(API_ADRESSE) is None
+
+    registry.open()
+    shared = registry.get(API_ADRESSE)
+    assert registry.is_open
+    assert all(registry.get(upstream) is not None for upstream in UPSTREAMS)
+
+    async with registry.client(API_ADRESSE) as client:
+        assert client is shared
+
+    await registry.aclose()
+    assert not registry.is_open
+    assert shared.is_closed
+
+
+@pytest.mark.asyncio
+async def test_registry_falls_back_to_one_shot_client():
+    """A closed registry yields a short-lived client closed on exit."""
+    registry = HTTPClientRegistry()
+    async with registry.client(API_ADRESSE) as client:
+        one_shot = client
+    assert one_shot.is_closed
+
+
+@pytest.mark.asyncio
+async def test_raw_payloads_are_opt_in():
+    """Raw API payloads are only kept with include_raw."""
+    async with httpx.AsyncClient(transport=httpx.MockTransport(_handler)) as client:
+        compact = await geocode_address("Paris", client=client)
+        raw = await geocode_address("Paris", client=client, include_raw=True)
+        parcel = await get_cadastral_parcel(48.86, 2.33, client=client, include_raw=True)
+        dvf = await get_dvf_transactions(48.86, 2.33, client=client, include_raw=True)
+
+    assert "raw_response" not in compact
+    assert raw["raw_response"]["properties"]["label"] == "Paris"
+    assert parcel["raw_response"]["properties"]["section"] == "AB"
+    assert dvf.raw_response["type"] == "Featurecollection"
+
+
+class _Upstream:
+    """MockTransport handler answering with a scripted sequence of statuses."""
+
+    def __init__(self, *statuses: int, headers: dict[str, str] | None = None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        status = self.statuses[min(self.calls, len(self.statuses) - 1)]
+        self.calls += 1
+        if status == 0:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(status, headers=self.headers if status == 429 else {})
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    """Retry without waiting."""
+    monkeypatch.setattr(settings, "http_retry_base_delay", 0.001)
+
+
+@pytest.mark.asyncio
+async def test_send_retries_transient_failures(fast_retries):
+    """Network errors and 5xx are retried; other client errors are not."""
+    registry = HTTPClientRegistry()
+    upstream = _Upstream(0, 503, 200)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+        response = await registry.send(API_CARTO, client, "GET", "http://carto/parcelle")
+        assert response.status_code == 200
+        assert upstream.calls == 3
+
+        not_found = _Upstream(404)
+        client._transport = httpx.MockTransport(not_found)
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry.send(API_CARTO, client, "GET", "http://carto/parcelle")
+        assert not_found.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_send_gives_up_after_max_retries(fast_retries, monkeypatch):
+    """The last failure is raised once retries are exhausted."""
+    monkeypatch.setattr(settings, "http_max_retries", 1)
+    registry = HTTPClientRegistry()
+    upstream = _Upstream(502)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry.send(DVF, client, "GET", "http://dvf/dvf")
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_slow_down(fast_retries, monkeypatch):
+    """A 429 halves the bucket rate; a Retry-After beyond the maximum delay is not waited."""
+    monkeypatch.setattr(settings, "http_retry_max_delay", 0.5)
+    registry = HTTPClientRegistry()
+    upstream = _Upstream(429, 200, headers={"retry-after": "0.05"})
+    async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+        start = time.monotonic()
+        await registry.send(API_ADRESSE, client, "GET", "http://adresse/search/")
+        assert time.monotonic() - start >= 0.05
+        assert registry.policy(API_ADRESSE).bucket.rate == pytest.approx(
+            settings.api_adresse_rate_limit * 0.55
+        )
+
+        patient = _Upstream(429, headers={"retry-after": "60"})
+        client._transport = httpx.MockTransport(patient)
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry.send(API_ADRESSE, client, "GET", "http://adresse/search/")
+        assert patient.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_limits_amplification(fast_retries, monkeypatch):
+    """Once the budget is spent, failing requests are sent only once."""
+    monkeypatch.setattr(settings, "http_circuit_failure_threshold", 1_000)
+    monkeypatch.setattr(settings, "http_retry_budget_ratio", 0.0)
+    registry = HTTPClientRegistry()
+    upstream = _Upstream(503)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+        for _ in range(20):
+            with pytest.raises(httpx.HTTPStatusError):
+                await registry.send(DVF, client, "GET", "http://dvf/dvf")
+
+    # The reserve of 10 extra attempts is spent by the first five requests
+    assert upstream.calls == 20 + 10
+
+
+def test_token_bucket_and_budget():
+    """The bucket allows a burst then refills at its rate; the budget caps extra attempts."""
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    bucket.throttle()
+    assert bucket.rate == 5
+    bucket.recover()
+    assert bucket.rate == 5.5
+
+    budget = RetryBudget(ratio=0.5, reserve=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_and_probes(monkeypatch):
+    """Consecutive failures open the circuit; after the timeout one probe may close it."""
+    monkeypatch.setattr(settings, "http_max_retries", 0)
+    monkeypatch.setattr(settings, "http_circuit_failure_threshold", 2)
+    monkeypatch.setattr(settings, "http_circuit_reset_timeout", 0.05)
+    registry = HTTPClientRegistry()
+    upstream = _Upstream(500, 500, 200)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await registry.send(API_CARTO, client, "GET", "http://carto/parcelle")
+        with pytest.raises(CircuitOpenError):
+            await registry.send(API_CARTO, client, "GET", "http://carto/parcelle")
+        assert upstream.calls == 2
+
+        await asyncio.sleep(0.06)
+        breaker = registry.policy(API_CARTO).breaker
+        assert breaker.state == "half_open"
+        await registry.send(API_CARTO, client, "GET", "http://carto/parcelle")
+        assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_slow_requests_are_hedged(monkeypatch):
+    """A GET outlasting the p95 latency is sent again and the first answer wins."""
+    monkeypatch.setattr(settings, "http_hedging_enabled", True)
+    monkeypatch.setattr(settings, "http_hedge_min_delay", 0.01)
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        # The first attempt hangs, the hedge answers right away
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+        return httpx.Response(200, json={"attempt": len(calls)})
+
+    registry = HTTPClientRegistry()
+    registry.policy(DVF).latencies.extend([0.01] * 50)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        start = time.monotonic()
+        response = await registry.send(DVF, client, "GET", "http://dvf/dvf")
+
+    assert response.json() == {"attempt": 2}
+    assert time.monotonic() - start < 1
+    assert len(calls) == 2
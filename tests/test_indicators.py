@@ -0,0 +1,97 @@
+"""Tests for the columnar DVF table and vectorised price indicators."""
+
+import numpy as np
+import pytest
+
+from backend.utils.dvf_models import DVFResult, DVFTransaction
+from backend.utils.dvf_table import DVFTable
+from backend.utils.indicators import compute_price_indicators, grouped_quantiles
+
+
+def _table(rows: list[tuple]) -> DVFTable:
+    """Build a table from (id_mutation, date, type_local, valeur, surface, pieces) tuples."""
+    names = (
+        "id_mutation",
+        "date_mutation",
+        "type_local",
+        "valeur_fonciere",
+        "surface_reelle_bati",
+        "nombre_pieces_principales",
+    )
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+    columns.update(surface_terrain=[None] * len(rows), lat=[None] * len(rows))
+    columns["lon"] = columns["lat"]
+    return DVFTable.from_columns(columns)
+
+
+def test_grouped_quantiles_match_numpy():
+    """Grouped statistics equal numpy's per-group mean and quantiles."""
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 7, 5000)
+    values = rng.normal(4000, 800, 5000)
+
+    groups, counts, means, values_q = grouped_quantiles(keys, values)
+
+    for group, count, mean, row in zip(groups, counts, means, values_q):
+        selected = values[keys == group]
+        assert count == len(selected)
+        assert mean == pytest.approx(selected.mean())
+        np.testing.assert_allclose(row, np.quantile(selected, [0.25, 0.5, 0.75]))
+
+
+def test_table_from_transactions_round_trip():
+    """Transactions convert to typed columns and back to JSON-friendly lists."""
+    transaction = DVFTransaction(
+        date_mutation="2021-06-30",
+        nature_mutation="Vente",
+        valeur_fonciere=300000.0,
+        type_local="Maison",
+        code_type_local=1,
+        surface_reelle_bati=100.0,
+        nombre_pieces_principales=None,
+        surface_terrain=None,
+        adresse="",
+        lat=48.1,
+        lon=-1.6,
+    )
+    result = DVFResult(source="", derniere_maj="", licence="", transactions=[transaction])
+
+    table = result.to_table()
+
+    assert len(table) == 1
+    assert table.year.tolist() == [2021]
+    assert np.isnan(table.nombre_pieces_principales[0])
+    assert table.to_dict()["type_local"] == ["Maison"]
+    assert table.to_dict()["nombre_pieces_principales"] == [None]
+
+
+def test_compute_price_indicators():
+    """Indicators use single-dwelling sales, drop outliers and split by segment."""
+    rows = [(f"m{i}", "2022-03-01", "Appartement", 4000.0 * 50 + i, 50.0, 2) for i in range(9)]
+    rows += [
+        ("m9", "2023-03-01", "Appartement", 4000.0 * 60, 60.0, 6),
+        ("out", "2023-03-01", "Appartement", 100_000.0 * 50, 50.0, 2),  # outlier
+        ("multi", "2023-03-01", "Appartement", 900_000.0, 50.0, 2),  # two dwellings sold
+        ("multi", "2023-03-01", "Appartement", 900_000.0, 40.0, 2),
+        ("h1", "2023-01-01", "Maison", 300_000.0, 100.0, 4),
+        ("dep", "2023-01-01", "Dépendance", 10_000.0, 10.0, 0),
+        ("nosurf", "2023-01-01", "Maison", 300_000.0, None, 4),
+    ]
+
+    indicators = compute_price_indicators(_table(rows))
+
+    assert indicators["nb_transactions"] == len(rows)
+    assert indicators["nb_ventes_retenues"] == 11
+    assert indicators["nb_outliers"] == 1
+    assert indicators["par_type_local"]["Maison"]["mediane"] == 3000.0
+    assert indicators["par_type_local"]["Appartement"]["nb_ventes"] == 10
+    assert indicators["par_nombre_pieces"]["Appartement"]["5+"]["nb_ventes"] == 1
+    assert indicators["par_annee"]["Appartement"]["2022"]["nb_ventes"] == 9
+    assert indicators["prix_m2_median"] == pytest.approx(4000.0, abs=1)
+
+
+def test_compute_price_indicators_empty():
+    """An empty table yields empty indicators."""
+    indicators = compute_price_indicators(_table([]))
+    assert indicators["prix_m2_moyen"] is None
+    assert indicators["par_type_local"] == {}
@@ -0,0 +1,38 @@
+"""Tests that heavy dependencies are only loaded when needed."""
+
+import subprocess
+import sys
+
+from backend.agents.city_information import agent as city_agent
+
+HEAVY_MODULES = ("matplotlib", "plotly", "reportlab", "langgraph.graph", "langchain.agents")
+
+
+def test_api_import_skips_heavy_modules():
+    """Importing the API loads neither the chart, PDF nor agent stacks."""
+    statement = (
+        "import sys, backend.api.main, backend.utils, backend.agents; "
+        f"print([name for name in {HEAVY_MODULES!r} if name in sys.modules])"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", statement], capture_output=True, text=True, check=True
+    )
+    assert completed.stdout.strip() == "[]"
+
+
+def test_lazy_exports_resolve():
+    """Lazily exported names resolve to the module attributes."""
+    import backend.utils
+    from backend.utils import plotting
+
+    assert backend.utils.render_charts is plotting.render_charts
+    assert "render_charts" in dir(backend.utils)
+
+
+def test_agent_is_built_once(monkeypatch):
+    """get_agent returns the sub-agent already assigned instead of building a new one."""
+    fake = object()
+    monkeypatch.setattr(city_agent, "city_information_agents", {"politique_color": fake})
+
+    assert city_agent.get_agent("politique_color") is fake
+    assert city_agent.get_agent("politique_color") is fake
@@ -0,0 +1,62 @@
+"""Tests for the combined location lookup."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.config import settings
+from backend.utils.location import get_location_bundle
+
+DELAY = 0.2
+
+
+def _client(dvf_status: int = 200) -> httpx.AsyncClient:
+    """Build a client whose parcel and DVF responses each take DELAY seconds."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/search/":
+            return httpx.Response(
+                200,
+                json={
+                    "features": [{"geometry": {"coordinates": [-1.68, 48.11]}, "properties": {}}]
+                },
+            )
+        await asyncio.sleep(DELAY)
+        if request.url.path == "/api/cadastre/parcelle":
+            return httpx.Response(200, json={"features": [{"properties": {"id": "P1"}}]})
+        return httpx.Response(dvf_status, json={"type": "Featurecollection", "features": []})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_parcel_and_dvf_run_concurrently():
+    """Parcel and DVF requests overlap instead of running one after the other."""
+    async with _client() as client:
+        start = time.perf_counter()
+        bundle = await get_location_bundle("Rennes", client=client)
+        elapsed = time.perf_counter() - start
+
+    assert bundle["parcel"]["parcel_id"] == "P1"
+    assert bundle["dvf"].count == 0
+    assert bundle["errors"] == {}
+    assert elapsed < 2 * DELAY
+
+
+@pytest.mark.asyncio
+async def test_partial_results_on_failure_and_timeout(monkeypatch):
+    """A failing or slow source is reported in errors while the other is returned."""
+    async with _client(dvf_status=500) as client:
+        bundle = await get_location_bundle("Rennes", client=client)
+    assert bundle["parcel"]["parcel_id"] == "P1"
+    assert bundle["dvf"] is None
+    assert "500" in bundle["errors"]["dvf"]
+
+    monkeypatch.setattr(settings, "location_parcel_timeout", DELAY / 4)
+    async with _client() as client:
+        bundle = await get_location_bundle("Rennes", client=client)
+    assert bundle["parcel"] is None
+    assert bundle["errors"] == {"parcel": f"Délai dépassé ({DELAY / 4:g} s)"}
+    assert bundle["dvf"].count == 0
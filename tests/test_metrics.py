@@ -0,0 +1,133 @@
+"""Tests for the latency metrics and the /metrics endpoint."""
+
+import uuid
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from backend.agents.callbacks import MetricsCallbackHandler
+from backend.api.main import app
+from backend.config import settings
+from backend.utils import cadastre
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import MetricsRegistry, metrics, timed
+from tests.stubs import APIAdresseStub
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    """Start every test from an empty registry."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_render_prometheus_format():
+    """Histograms are cumulative per bucket and label values are escaped."""
+    registry = MetricsRegistry()
+    registry.observe("upstream_request", 0.02, upstream="api_carto")
+    registry.observe("upstream_request", 3.0, upstream="api_carto")
+    registry.observe("upstream_request", 500.0, upstream="api_carto")
+    registry.increment("llm_tokens", 12, type='in"put')
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE agentimmo_upstream_request_seconds histogram" in lines
+    bucket = 'agentimmo_upstream_request_seconds_bucket{upstream="api_carto",le="%s"} %d'
+    assert bucket % ("0.01", 0) in lines
+    assert bucket % ("0.025", 1) in lines
+    assert bucket % ("5.0", 2) in lines
+    assert bucket % ("+Inf", 3) in lines
+    assert 'agentimmo_upstream_request_seconds_count{upstream="api_carto"} 3' in lines
+    assert 'agentimmo_llm_tokens_total{type="in\\"put"} 12' in lines
+
+
+def test_render_keeps_each_family_contiguous():
+    """Samples of a metric family follow its TYPE line, even when collectors interleave them."""
+    registry = MetricsRegistry()
+    registry.observe("stage", 0.1, node="dvf")
+    registry.increment("stage_errors", node="dvf", error="ValueError")
+    registry.observe("stage", 0.2, node="parcel")
+    registry.register_collector(
+        lambda: [
+            ("cache_hits_total", {"namespace": "geocode"}, 1),
+            ("cache_size", {"namespace": "geocode"}, 2),
+            ("cache_hits_total", {"namespace": "dvf"}, 3),
+        ]
+    )
+    registry.register_collector(lambda: [("cache_size", {"namespace": "dvf"}, 4)])
+
+    families: list[str] = []
+    for line in registry.render().splitlines():
+        if line.startswith("# TYPE "):
+            families.append(line.split()[2])
+            continue
+        name = line.split("{")[0].split()[0]
+        if not name.startswith(families[-1]):
+            families.append(name)
+
+    assert len(families) == len(set(families))
+    assert families == [
+        "agentimmo_stage_seconds",
+        "agentimmo_stage_errors_total",
+        "agentimmo_cache_hits_total",
+        "agentimmo_cache_size",
+    ]
+
+
+def test_timed_counts_errors_and_can_be_disabled(monkeypatch):
+    """A failing block is timed and counted by exception type; nothing is kept when disabled."""
+    with pytest.raises(ValueError):
+        with timed("stage", node="dvf"):
+            raise ValueError("boom")
+
+    assert metrics.histogram("stage", node="dvf")["count"] == 1
+    assert metrics.counter("stage_errors", node="dvf", error="ValueError") == 1
+
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    with timed("stage", node="dvf"):
+        pass
+    assert metrics.histogram("stage", node="dvf")["count"] == 1
+
+
+def test_callback_handler_times_model_and_tool_calls():
+    """Model calls, tool calls and token usage reported by LangChain are recorded."""
+    handler = MetricsCallbackHandler("city_information")
+    model_run, tool_run = uuid.uuid4(), uuid.uuid4()
+    message = AIMessage(
+        "", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}
+    )
+
+    handler.on_chat_model_start({}, [[]], run_id=model_run)
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=model_run)
+    handler.on_tool_start({"name": "duckduckgo_search"}, "Rennes", run_id=tool_run)
+    handler.on_tool_error(TimeoutError(), run_id=tool_run)
+
+    assert metrics.histogram("llm_request", agent="city_information")["count"] == 1
+    assert metrics.counter("llm_tokens", agent="city_information", type="input") == 120
+    assert metrics.counter("llm_tokens", agent="city_information", type="output") == 30
+    labels = {"agent": "city_information", "tool": "duckduckgo_search"}
+    assert metrics.histogram("tool_call", **labels)["count"] == 1
+    assert metrics.counter("tool_call_errors", error="TimeoutError", **labels) == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_upstream_calls(monkeypatch):
+    """Upstream requests and cache counters show up on GET /metrics."""
+    monkeypatch.setattr(settings, "cache_enabled", True)
+    monkeypatch.setattr(cadastre, "geocode_cache", TTLCache("geocode", 60, path=""))
+    transport = httpx.ASGITransport(app=app)
+    with APIAdresseStub({"1 rue A, Rennes": (48.11, -1.68)}) as stub:
+        monkeypatch.setattr(settings, "api_adresse_url", stub.url)
+        await cadastre.geocode_address("1 rue A, Rennes")
+        await cadastre.geocode_address("1 rue A, Rennes")
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'agentimmo_upstream_request_seconds_count{upstream="api_adresse"} 1' in response.text
+    assert 'agentimmo_cache_hits_total{namespace="geocode"} 1' in response.text
+    assert 'agentimmo_cache_misses_total{namespace="geocode"} 1' in response.text
@@ -0,0 +1,98 @@
+"""Tests for PDF report generation and the report endpoint."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from backend.api.main import app
+from backend.utils.indicators import compute_price_indicators
+from backend.utils.pdf_generator import build_pdf_report, generate_pdf_report
+from backend.utils.plotting import generate_price_chart, generate_trend_chart
+from backend.utils.process_pool import shutdown_process_pool
+from backend.workflow_store import InMemoryWorkflowStore, get_workflow_store
+from tests.stubs import build_dvf_table
+
+
+@pytest.fixture(scope="module")
+def indicators() -> dict:
+    """Indicators of a small synthetic commune."""
+    return compute_price_indicators(build_dvf_table(2_000))
+
+
+@pytest.fixture(scope="module")
+def images(indicators) -> dict:
+    """PNG charts of the synthetic commune."""
+    return {
+        "price_chart": generate_price_chart(indicators),
+        "trend_chart": generate_trend_chart(indicators),
+    }
+
+
+def test_report_embeds_png_images(indicators, images):
+    """PNG bytes are embedded as PDF images; other image values are ignored."""
+    without_images = build_pdf_report(indicators, {"map": "<html></html>"})
+    with_images = build_pdf_report(indicators, images, title="1 rue de Rivoli, Paris")
+
+    assert with_images.startswith(b"%PDF")
+    assert b"/Subtype /Image" in with_images
+    assert b"/Subtype /Image" not in without_images
+    assert build_pdf_report({}, {}).startswith(b"%PDF")
+
+
+def test_concurrent_reports_get_their_own_file(indicators, tmp_path):
+    """Concurrent generations write one complete file each."""
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(
+            executor.map(
+                lambda index: generate_pdf_report(
+                    indicators, {}, workflow_id=f"wf-{index}", output_dir=str(tmp_path)
+                ),
+                range(4),
+            )
+        )
+    anonymous = generate_pdf_report(indicators, {}, output_dir=str(tmp_path))
+
+    assert len(set(paths + [anonymous])) == 5
+    assert paths[0] == os.path.join(tmp_path, "rapport_wf-0.pdf")
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(path) for path in paths + [anonymous]
+    )
+    for path in paths:
+        with open(path, "rb") as file:
+            assert file.read().startswith(b"%PDF")
+
+
+@pytest.mark.asyncio
+async def test_report_endpoint_streams_pdf(indicators, tmp_path):
+    """GET /reports/{id} streams the stored report, or builds it from the indicators."""
+    stored_path = generate_pdf_report(indicators, {}, "wf-3", str(tmp_path))
+    store = InMemoryWorkflowStore()
+    store.create("wf-1", "Paris")
+    store.create("wf-2", "Lyon")
+    store.create("wf-3", "Lille")
+    store.set_result("wf-1", "indicators", indicators)
+    store.set_result("wf-3", "indicators", indicators)
+    store.set_result("wf-3", "report", {"pdf_path": stored_path})
+    app.dependency_overrides[get_workflow_store] = lambda: store
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/reports/wf-1")
+            stored = await client.get("/reports/wf-3")
+            pending = await client.get("/reports/wf-2")
+            missing = await client.get("/reports/missing")
+    finally:
+        app.dependency_overrides.clear()
+        shutdown_process_pool()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert "rapport_wf-1.pdf" in response.headers["content-disposition"]
+    assert response.content.startswith(b"%PDF")
+    assert b"/Subtype /Image" in response.content
+    with open(stored_path, "rb") as file:
+        assert stored.content == file.read()
+    assert pending.status_code == 409
+    assert missing.status_code == 404
@@ -0,0 +1,68 @@
+"""Tests for chart rendering and the chart cache."""
+
+import matplotlib.pyplot as plt
+import pytest
+
+from backend.config import settings
+from backend.utils import plotting
+from backend.utils.cache import TTLCache
+from backend.utils.indicators import compute_price_indicators
+from backend.utils.plotting import (
+    chart_key,
+    generate_price_chart,
+    generate_trend_chart,
+    render_charts,
+)
+from backend.utils.process_pool import shutdown_process_pool
+from tests.stubs import build_dvf_table
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture(scope="module")
+def indicators() -> dict:
+    """Indicators of a small synthetic commune."""
+    return compute_price_indicators(build_dvf_table(2_000))
+
+
+def test_charts_are_png_bytes_without_leaking_figures(indicators):
+    """Charts render to PNG bytes, with or without data, and leave no pyplot figure."""
+    for generate in (generate_price_chart, generate_trend_chart):
+        assert generate(indicators).startswith(PNG_SIGNATURE)
+        assert generate({}).startswith(PNG_SIGNATURE)
+    assert plt.get_fignums() == []
+
+
+def test_price_chart_falls_back_to_types(indicators):
+    """Without room statistics, the price chart shows one bar per type."""
+    png = generate_price_chart({"par_type_local": indicators["par_type_local"]})
+    assert png.startswith(PNG_SIGNATURE)
+
+
+def test_chart_key_hashes_only_the_chart_inputs(indicators):
+    """Keys ignore unrelated indicators and key order, but not the chart data."""
+    key = chart_key("trend_chart", indicators)
+
+    assert key == chart_key("trend_chart", dict(reversed(indicators.items())))
+    assert key == chart_key("trend_chart", dict(indicators, nb_transactions=0))
+    assert key != chart_key("trend_chart", dict(indicators, par_annee={}))
+    assert key != chart_key("price_chart", indicators)
+
+
+@pytest.mark.asyncio
+async def test_render_charts_in_pool_once(indicators, monkeypatch):
+    """Charts are rendered in the process pool once, then served from the cache."""
+    monkeypatch.setattr(settings, "cache_enabled", True)
+    cache = TTLCache("charts", ttl=60, path="")
+    monkeypatch.setattr(plotting, "chart_cache", cache)
+    try:
+        first = await render_charts(indicators)
+        second = await render_charts(dict(indicators, nb_transactions=1))
+    finally:
+        shutdown_process_pool()
+
+    assert set(first) == {"price_chart", "trend_chart"}
+    assert first == second
+    assert first["price_chart"] == generate_price_chart(indicators)
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,288 @@
+"""Tests for the LangGraph analysis pipeline and its orchestration."""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import httpx
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+
+from backend.agents import graph as graph_module
+from backend.api.main import app
+from backend.config import settings
+from backend.utils.dvf_models import DVFResult
+from backend.utils.indicators import compute_price_indicators
+from backend.utils.process_pool import shutdown_process_pool
+from backend.workflow import WorkflowOrchestrator
+from backend.workflow_scheduler import WorkflowScheduler, get_scheduler
+from backend.workflow_store import InMemoryWorkflowStore
+from tests.stubs import build_dvf_table
+
+BRANCHES = ("parcel", "dvf", "city_information")
+
+
+class Sources:
+    """Stub data sources counting their calls; the three branches wait for each other."""
+
+    def __init__(self, failing_dvf_calls: int = 0, failing_chart_calls: int = 0):
+        self.calls: Counter[str] = Counter()
+        self.failing_dvf_calls = failing_dvf_calls
+        self.failing_chart_calls = failing_chart_calls
+        self._started = 0
+        self._all_started = asyncio.Event()
+
+    async def _branch(self, name: str) -> None:
+        """Record a branch call and wait until the three branches are running together."""
+        self.calls[name] += 1
+        self._started += 1
+        if self._started == len(BRANCHES):
+            self._all_started.set()
+        await asyncio.wait_for(self._all_started.wait(), timeout=2)
+
+    async def geocode_address(self, address: str) -> dict:
+        self.calls["geocode"] += 1
+        return {"latitude": 48.86, "longitude": 2.35, "full_address": address, "citycode": "75056"}
+
+    async def get_cadastral_parcel(self, lat: float, lon: float) -> dict:
+        await self._branch("parcel")
+        return {"parcel_id": "75056000AB0001"}
+
+    async def get_dvf_transactions(self, lat: float, lon: float, dist: int, as_table: bool):
+        await self._branch("dvf")
+        if self.calls["dvf"] <= self.failing_dvf_calls:
+            raise ConnectionError("DVF indisponible")
+        return DVFResult(source="test", derniere_maj="", licence="", table=build_dvf_table(500))
+
+    async def get_cached_city_information(self, adress_in: str) -> dict:
+        await self._branch("city_information")
+        return {"situation": "Paris", "politique_color": "", "qualitative_presentation": ""}
+
+    async def render_charts(self, indicators: dict) -> dict:
+        self.calls["charts"] += 1
+        if self.calls["charts"] <= self.failing_chart_calls:
+            raise RuntimeError("Pool de rendu arrêté")
+        return {}
+
+
+async def _inline(func, *args):
+    """Run a process pool job in the test process."""
+    return func(*args)
+
+
+@pytest.fixture
+def sources(request, monkeypatch, tmp_path):
+    """Replace the data sources of the graph nodes and write reports to tmp_path."""
+    sources = Sources(**getattr(request, "param", {}))
+    for name in (
+        "geocode_address",
+        "get_cadastral_parcel",
+        "get_dvf_transactions",
+        "get_cached_city_information",
+        "render_charts",
+    ):
+        monkeypatch.setattr(graph_module, name, getattr(sources, name))
+    monkeypatch.setattr(graph_module, "run_in_process", _inline)
+    monkeypatch.setattr(settings, "reports_dir", str(tmp_path))
+    return sources
+
+
+def _orchestrator() -> WorkflowOrchestrator:
+    """Build an orchestrator with its own graph and store."""
+    return WorkflowOrchestrator(
+        InMemoryWorkflowStore(), graph=graph_module.create_agent(InMemorySaver())
+    )
+
+
+async def _checkpoint(orchestrator: WorkflowOrchestrator, workflow_id: str) -> dict:
+    """Return the checkpointed state of a workflow."""
+    config = {"configurable": {"thread_id": workflow_id}}
+    return (await orchestrator.graph.aget_state(config)).values
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sources", [{"failing_chart_calls": 1}], indirect=True)
+async def test_failed_run_resumes_from_incomplete_nodes(sources, tmp_path):
+    """Branches run in parallel; a failed run resumes without re-running completed nodes."""
+    orchestrator = _orchestrator()
+    store = orchestrator.store
+    workflow_id = orchestrator.create_workflow("1 rue de Rivoli, Paris")
+    try:
+        with pytest.raises(RuntimeError):
+            await orchestrator.run_workflow(workflow_id)
+        failed = store.get(workflow_id)
+
+        await orchestrator.run_workflow(workflow_id)
+    finally:
+        orchestrator.shutdown()
+    workflow = store.get(workflow_id)
+
+    assert failed["status"] == "failed"
+    assert failed["error"] == "Pool de rendu arrêté"
+    assert set(failed["results"]) == {"address", "parcel", "city_information", "indicators"}
+    assert sources.calls == Counter(geocode=1, parcel=1, city_information=1, dvf=1, charts=2)
+    assert workflow["status"] == "completed"
+    assert workflow["progress"] == 1.0
+    assert workflow["error"] is None
+    assert workflow["finished_at"] is not None
+    assert workflow["results"]["indicators"]["nb_transactions"] == 500
+    assert workflow["results"]["report"]["pdf_path"] == str(tmp_path / f"rapport_{workflow_id}.pdf")
+    # The checkpoint of a completed workflow is released
+    assert await _checkpoint(orchestrator, workflow_id) == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sources", [{"failing_dvf_calls": 1}], indirect=True)
+async def test_failed_branch_is_reported_without_failing(sources):
+    """A failing source is recorded in errors and the report is built without it."""
+    orchestrator = _orchestrator()
+    workflow_id = orchestrator.create_workflow("1 rue de Rivoli, Paris")
+    try:
+        await orchestrator.run_workflow(workflow_id)
+    finally:
+        orchestrator.shutdown()
+    workflow = orchestrator.store.get(workflow_id)
+
+    assert workflow["status"] == "completed"
+    assert workflow["results"]["errors"] == {"dvf": "DVF indisponible"}
+    assert workflow["results"]["indicators"]["nb_transactions"] == 0
+    assert workflow["results"]["parcel"] == {"parcel_id": "75056000AB0001"}
+    assert "pdf_path" in workflow["results"]["report"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sources", [{"failing_chart_calls": 1}], indirect=True)
+async def test_failed_run_checkpoints_expire(sources, monkeypatch):
+    """Checkpoints of failed runs are released once workflow_ttl has passed."""
+    orchestrator = _orchestrator()
+    failed_id = orchestrator.create_workflow("1 rue de Rivoli, Paris")
+    try:
+        with pytest.raises(RuntimeError):
+            await orchestrator.run_workflow(failed_id)
+        assert await _checkpoint(orchestrator, failed_id) != {}
+
+        monkeypatch.setattr(settings, "workflow_ttl", 0)
+        await orchestrator.run_workflow(orchestrator.create_workflow("Lyon"))
+    finally:
+        orchestrator.shutdown()
+
+    assert await _checkpoint(orchestrator, failed_id) == {}
+
+
+@pytest.mark.asyncio
+async def test_report_is_written_to_configured_dir_by_pool_worker(monkeypatch, tmp_path):
+    """The spawned PDF worker writes to the reports_dir of the parent process."""
+    monkeypatch.setattr(settings, "reports_dir", str(tmp_path))
+    state = {
+        "adress_in": "1 rue de Rivoli, Paris",
+        "address": {"full_address": "1 Rue de Rivoli 75001 Paris"},
+        "indicators": compute_price_indicators(build_dvf_table(500)),
+        "images": {},
+    }
+    try:
+        update = await graph_module.report(state, {"configurable": {"thread_id": "wf-pool"}})
+    finally:
+        shutdown_process_pool()
+
+    assert update["report"]["pdf_path"] == str(tmp_path / "rapport_wf-pool.pdf")
+    assert (tmp_path / "rapport_wf-pool.pdf").read_bytes().startswith(b"%PDF")
+
+
+class ThreadRecordingStore(InMemoryWorkflowStore):
+    """In-memory store recording the threads its writes run in."""
+
+    def __init__(self):
+        super().__init__()
+        self.write_threads: set[str] = set()
+
+    def update(self, workflow_id: str, **fields) -> None:
+        self.write_threads.add(threading.current_thread().name)
+        super().update(workflow_id, **fields)
+
+    def set_result(self, workflow_id: str, key: str, value) -> None:
+        self.write_threads.add(threading.current_thread().name)
+        super().set_result(workflow_id, key, value)
+
+
+@pytest.mark.asyncio
+async def test_store_writes_run_off_the_event_loop(sources):
+    """Every progress and result write of a run happens in the orchestrator executor."""
+    store = ThreadRecordingStore()
+    orchestrator = WorkflowOrchestrator(store, graph=graph_module.create_agent(InMemorySaver()))
+    workflow_id = orchestrator.create_workflow("1 rue de Rivoli, Paris")
+    try:
+        await orchestrator.run_workflow(workflow_id)
+    finally:
+        orchestrator.shutdown()
+
+    assert store.get(workflow_id)["status"] == "completed"
+    assert store.write_threads
+    assert all(name.startswith("workflow") for name in store.write_threads)
+
+
+class SlowProgressStore(InMemoryWorkflowStore):
+    """In-memory store whose progress writes from executor threads are slow."""
+
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+
+    def update(self, workflow_id: str, **fields) -> None:
+        if threading.current_thread().name.startswith("workflow") and "progress" in fields:
+            self.writing.set()
+            time.sleep(0.1)
+        super().update(workflow_id, **fields)
+
+
+@pytest.mark.asyncio
+async def test_cancel_is_not_overwritten_by_a_running_write(sources):
+    """A progress write in flight when a run is cancelled lands before the cancelled status."""
+    store = SlowProgressStore()
+    orchestrator = WorkflowOrchestrator(store, graph=graph_module.create_agent(InMemorySaver()))
+    scheduler = WorkflowScheduler(orchestrator.run_workflow, store, workers=1)
+    workflow_id = orchestrator.create_workflow("1 rue de Rivoli, Paris")
+    try:
+        scheduler.submit(workflow_id)
+        assert await asyncio.to_thread(store.writing.wait, 2)
+        assert await scheduler.cancel(workflow_id)
+        await asyncio.sleep(0.2)
+    finally:
+        await scheduler.aclose()
+        orchestrator.shutdown()
+
+    workflow = store.get(workflow_id)
+    assert workflow["status"] == "cancelled"
+    assert workflow["finished_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_resume_endpoint_requeues_failed_workflows():
+    """POST /workflows/{id}/resume queues failed workflows only."""
+    resumed: list[str] = []
+
+    async def run(workflow_id: str) -> None:
+        resumed.append(workflow_id)
+        scheduler.store.update(workflow_id, status="completed")
+
+    scheduler = WorkflowScheduler(run, InMemoryWorkflowStore(), workers=1, max_queue=10)
+    scheduler.store.create("wf-1", "Paris")
+    scheduler.store.update("wf-1", status="failed", error="DVF indisponible")
+    app.dependency_overrides[get_scheduler] = lambda: scheduler
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/workflows/wf-1/resume")
+            await scheduler.join()
+            finished = await client.post("/workflows/wf-1/resume")
+            missing = await client.post("/workflows/missing/resume")
+    finally:
+        app.dependency_overrides.clear()
+        await scheduler.aclose()
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+    assert response.json()["error"] is None
+    assert resumed == ["wf-1"]
+    assert finished.status_code == 409
+    assert missing.status_code == 404
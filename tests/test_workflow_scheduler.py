@@ -0,0 +1,300 @@
+"""Tests for the workflow job queue and the analysis endpoints."""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from backend.api.main import app
+from backend.config import settings
+from backend.workflow_scheduler import QueueFullError, WorkflowScheduler, get_scheduler
+from backend.workflow_store import InMemoryWorkflowStore, get_workflow_store
+from tests.test_city_information import parse_sse
+
+
+class FakeRunner:
+    """Workflow runner recording the execution order and the peak concurrency."""
+
+    def __init__(self, store: InMemoryWorkflowStore):
+        """Initialize the runner."""
+        self.store = store
+        self.order: list[str] = []
+        self.active = 0
+        self.peak = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, workflow_id: str) -> None:
+        """Run a workflow, waiting for release to be set."""
+        self.order.append(workflow_id)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            await self.release.wait()
+            self.store.update(workflow_id, status="completed", progress=1.0)
+        finally:
+            self.active -= 1
+
+
+def _scheduler(**kwargs) -> tuple[WorkflowScheduler, FakeRunner]:
+    """Build a scheduler around a fake runner and an in-memory store."""
+    store = InMemoryWorkflowStore()
+    runner = FakeRunner(store)
+    return WorkflowScheduler(runner, store, **kwargs), runner
+
+
+def _submit(scheduler: WorkflowScheduler, workflow_id: str, priority: int = 0) -> None:
+    """Register and queue a workflow."""
+    scheduler.store.create(workflow_id, "Paris")
+    scheduler.submit(workflow_id, priority=priority)
+
+
+@pytest.mark.asyncio
+async def test_worker_count_bounds_concurrency():
+    """No more than `workers` workflows run at once."""
+    scheduler, runner = _scheduler(workers=2)
+    for index in range(6):
+        _submit(scheduler, f"wf-{index}")
+    await scheduler.join()
+
+    assert runner.peak == 2
+    assert all(scheduler.store.get(f"wf-{index}")["status"] == "completed" for index in range(6))
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_runs_first():
+    """Waiting workflows run by decreasing priority, then in submission order."""
+    scheduler, runner = _scheduler(workers=1)
+    runner.release.clear()
+    _submit(scheduler, "blocker")
+    await asyncio.sleep(0)
+    _submit(scheduler, "low", priority=0)
+    _submit(scheduler, "high", priority=5)
+    _submit(scheduler, "low-2", priority=0)
+    runner.release.set()
+    await scheduler.join()
+
+    assert runner.order == ["blocker", "high", "low", "low-2"]
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_submissions():
+    """Submissions beyond max_queue waiting workflows raise QueueFullError."""
+    scheduler, runner = _scheduler(workers=1, max_queue=2)
+    runner.release.clear()
+    _submit(scheduler, "running")
+    await asyncio.sleep(0)
+    _submit(scheduler, "queued-1")
+    _submit(scheduler, "queued-2")
+
+    assert scheduler.is_full()
+    with pytest.raises(QueueFullError):
+        _submit(scheduler, "rejected")
+    runner.release.set()
+    await scheduler.join()
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_and_running_workflows():
+    """Cancelled workflows are marked cancelled and queued ones never start."""
+    scheduler, runner = _scheduler(workers=1)
+    runner.release.clear()
+    _submit(scheduler, "running")
+    _submit(scheduler, "queued")
+    await asyncio.sleep(0.02)
+
+    assert await scheduler.cancel("queued")
+    assert await scheduler.cancel("running")
+    assert not await scheduler.cancel("unknown")
+    await scheduler.join()
+
+    assert runner.order == ["running"]
+    assert scheduler.store.get("running")["status"] == "cancelled"
+    assert scheduler.store.get("queued")["status"] == "cancelled"
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_workers_stop_when_cancelled_with_their_workflow():
+    """Cancelling a worker together with its workflow task (loop shutdown) stops the worker."""
+    scheduler, runner = _scheduler(workers=1)
+    runner.release.clear()
+    _submit(scheduler, "running")
+    await asyncio.sleep(0.02)
+
+    scheduler._running["running"].cancel()
+    for task in scheduler._worker_tasks:
+        task.cancel()
+    await asyncio.wait_for(
+        asyncio.gather(*scheduler._worker_tasks, return_exceptions=True), timeout=1
+    )
+
+    assert all(task.done() for task in scheduler._worker_tasks)
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancel_from_another_process(monkeypatch):
+    """Workflows owned by another scheduler are marked cancelling, then stopped by their owner."""
+    monkeypatch.setattr(settings, "workflow_cancel_poll_interval", 0.01)
+    owner, runner = _scheduler(workers=1)
+    other = WorkflowScheduler(runner, owner.store)
+    runner.release.clear()
+    _submit(owner, "running")
+    _submit(owner, "queued")
+    await asyncio.sleep(0.02)
+
+    assert await other.cancel("running")
+    assert await other.cancel("queued")
+    assert owner.store.get("queued")["status"] == "cancelling"
+    await owner.join()
+
+    assert runner.order == ["running"]
+    assert owner.store.get("running")["status"] == "cancelled"
+    assert owner.store.get("queued")["status"] == "cancelled"
+    assert not await other.cancel("running")
+    await owner.aclose()
+
+
+class LoopCheckingStore(InMemoryWorkflowStore):
+    """In-memory store recording whether it was called from the event loop thread."""
+
+    def __init__(self):
+        super().__init__()
+        self.loop_calls: list[str] = []
+
+    def _check(self, name: str) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.loop_calls.append(name)
+
+    def get(self, workflow_id: str):
+        self._check("get")
+        return super().get(workflow_id)
+
+    def update(self, workflow_id: str, **fields) -> None:
+        self._check("update")
+        super().update(workflow_id, **fields)
+
+
+@pytest.mark.asyncio
+async def test_store_calls_run_off_the_event_loop(monkeypatch):
+    """Cancellation, cancel polling and shutdown never call the store on the event loop."""
+    monkeypatch.setattr(settings, "workflow_cancel_poll_interval", 0.01)
+    store = LoopCheckingStore()
+    runner = FakeRunner(store)
+    owner = WorkflowScheduler(runner, store, workers=1)
+    other = WorkflowScheduler(runner, store)
+    runner.release.clear()
+    for workflow_id in ("remote", "running", "queued", "left"):
+        store.create(workflow_id, "Paris")
+        owner.submit(workflow_id)
+    await asyncio.sleep(0.02)
+
+    assert await other.cancel("remote")
+    await asyncio.sleep(0.05)
+    assert await owner.cancel("queued")
+    await owner.aclose()
+
+    assert store.loop_calls == []
+    assert store.get("remote")["status"] == "cancelled"
+    assert store.get("left")["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_analyze_endpoint_applies_backpressure():
+    """POST /analyze queues workflows and answers 429 once the queue is full."""
+    scheduler, runner = _scheduler(workers=1, max_queue=1)
+    runner.release.clear()
+    app.dependency_overrides[get_scheduler] = lambda: scheduler
+    app.dependency_overrides[get_workflow_store] = lambda: scheduler.store
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/analyze", json={"adresse": "Paris"})
+            await asyncio.sleep(0)
+            second = await client.post("/analyze", json={"adresse": "Lyon", "priority": 1})
+            rejected = await client.post("/analyze", json={"adresse": "Lille"})
+
+            workflow_id = second.json()["workflow_id"]
+            cancelled = await client.delete(f"/workflows/{workflow_id}")
+            status = await client.get(f"/status/{workflow_id}")
+            runner.release.set()
+            await scheduler.join()
+            finished = await client.delete(f"/workflows/{first.json()['workflow_id']}")
+    finally:
+        app.dependency_overrides.clear()
+        await scheduler.aclose()
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"]
+    assert cancelled.json()["status"] == "cancelled"
+    assert status.json()["status"] == "cancelled"
+    assert finished.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_store_publishes_changes_from_threads():
+    """Updates made in executor threads reach subscribers on the event loop."""
+    store = InMemoryWorkflowStore()
+    store.create("wf-1", "Paris")
+    changes = store.subscribe("wf-1")
+
+    thread = threading.Thread(target=store.update, args=("wf-1",), kwargs={"progress": 0.5})
+    thread.start()
+    thread.join()
+    store.set_result("wf-1", "dataset", {})
+
+    assert await asyncio.wait_for(changes.get(), 1) == {"progress": 0.5}
+    assert await asyncio.wait_for(changes.get(), 1) == {"result": "dataset"}
+    store.unsubscribe("wf-1", changes)
+    store.update("wf-1", progress=0.6)
+    assert changes.empty()
+
+
+@pytest.mark.asyncio
+async def test_status_stream_follows_transitions(monkeypatch):
+    """GET /status/{id}/stream sends each transition, then the final state."""
+    monkeypatch.setattr(settings, "sse_poll_interval", 0.05)
+    store = LoopCheckingStore()
+    store.create("wf-1", "Paris")
+    app.dependency_overrides[get_workflow_store] = lambda: store
+
+    async def run() -> None:
+        for status, progress in (("collecting", 0.25), ("analyzing", 0.5)):
+            await asyncio.sleep(0.1)
+            store.update("wf-1", status=status, progress=progress)
+        store.set_result("wf-1", "dataset", {"lat": 48.86})
+        await asyncio.sleep(0.1)
+        store.update("wf-1", status="completed", progress=1.0)
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            runner = asyncio.create_task(run())
+            response = await client.get("/status/wf-1/stream")
+            missing = await client.get("/status/missing/stream")
+            await runner
+    finally:
+        app.dependency_overrides.clear()
+
+    events = parse_sse(response.text)
+    assert [(event, data["status"]) for event, data in events] == [
+        ("progress", "pending"),
+        ("progress", "collecting"),
+        ("progress", "analyzing"),
+        ("end", "completed"),
+    ]
+    assert events[-2][1]["results"] == ["dataset"]
+    assert missing.status_code == 404
+    # The stream reads the store in threads
+    assert "get" not in store.loop_calls
@@ -0,0 +1,129 @@
+"""Tests for the workflow state stores."""
+
+import os
+import threading
+
+import pytest
+
+from backend.workflow_store import InMemoryWorkflowStore, PostgresWorkflowStore, WorkflowStore
+
+
+def test_in_memory_lifecycle():
+    """A workflow is created pending, then updated and completed."""
+    store = InMemoryWorkflowStore()
+    created = store.create("wf-1", "1 rue de Rivoli, Paris")
+    assert created["status"] == "pending"
+    assert created["finished_at"] is None
+
+    store.update("wf-1", status="collecting", progress=0.25)
+    store.set_result("wf-1", "dataset", {"lat": 48.86})
+    store.update("wf-1", status="completed", progress=1.0)
+
+    workflow = store.get("wf-1")
+    assert workflow["status"] == "completed"
+    assert workflow["progress"] == 1.0
+    assert workflow["results"] == {"dataset": {"lat": 48.86}}
+    assert workflow["finished_at"] is not None
+    assert store.get("missing") is None
+
+
+def test_in_memory_returns_snapshots():
+    """Mutating a returned workflow does not change the stored state."""
+    store = InMemoryWorkflowStore()
+    store.create("wf-1", "Paris")
+    store.get("wf-1")["results"]["dataset"] = "tampered"
+    assert store.get("wf-1")["results"] == {}
+
+
+def test_in_memory_rejects_invalid_updates():
+    """Unknown workflows raise KeyError and non-updatable fields raise ValueError."""
+    store = InMemoryWorkflowStore()
+    store.create("wf-1", "Paris")
+    with pytest.raises(KeyError):
+        store.update("missing", status="failed")
+    with pytest.raises(KeyError):
+        store.set_result("missing", "dataset", {})
+    with pytest.raises(ValueError):
+        store.update("wf-1", adresse="Lyon")
+
+
+def test_in_memory_evicts_finished_workflows():
+    """Finished workflows older than the TTL are evicted, running ones are kept."""
+    store = InMemoryWorkflowStore(ttl=-1)
+    store.create("running", "Paris")
+    store.create("done", "Lyon")
+    store.update("done", status="failed", error="boom")
+
+    assert store.get("done") is None
+    assert store.get("running") is not None
+    assert store.evict_expired() == 0
+
+
+def test_in_memory_concurrent_results():
+    """Concurrent set_result calls from several threads are all kept."""
+    store = InMemoryWorkflowStore()
+    store.create("wf-1", "Paris")
+
+    def worker(index: int) -> None:
+        for step in range(100):
+            store.set_result("wf-1", f"{index}-{step}", step)
+            store.update("wf-1", progress=step / 100)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store.get("wf-1")["results"]) == 800
+
+
+class RecordingPostgresStore(PostgresWorkflowStore):
+    """PostgreSQL store recording its statements instead of running them."""
+
+    def __init__(self, ttl: float):
+        WorkflowStore.__init__(self, ttl)
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = 0.0
+        self.queries: list[str] = []
+
+    def _execute(self, query: str, params: tuple = (), fetch: bool = False):
+        self.queries.append(query.split()[0])
+        return [] if fetch else 1
+
+
+def test_postgres_evicts_expired_workflows_periodically():
+    """Creating workflows deletes the expired ones at most once a minute."""
+    store = RecordingPostgresStore(ttl=3600)
+    for index in range(3):
+        store.create(f"wf-{index}", "Paris")
+
+    assert store.queries.count("DELETE") == 1
+
+    store._next_sweep = 0.0
+    store.create("wf-3", "Paris")
+    assert store.queries.count("DELETE") == 2
+
+
+def test_postgres_lifecycle():
+    """The PostgreSQL store merges results atomically (needs TEST_DATABASE_URL)."""
+    pytest.importorskip("psycopg2")
+    dsn = os.environ.get("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    store = PostgresWorkflowStore(dsn=dsn)
+    try:
+        store.create("wf-pg", "Paris")
+        store.set_result("wf-pg", "dataset", {"lat": 48.86})
+        store.set_result("wf-pg", "indicators", {"prix": 10_000})
+        store.update("wf-pg", status="completed", progress=1.0)
+
+        workflow = store.get("wf-pg")
+        assert workflow["status"] == "completed"
+        assert workflow["results"] == {"dataset": {"lat": 48.86}, "indicators": {"prix": 10_000}}
+        with pytest.raises(KeyError):
+            store.update("missing", status="failed")
+    finally:
+        store._execute("DELETE FROM workflows WHERE workflow_id = %s", ("wf-pg",))
+        store.close()